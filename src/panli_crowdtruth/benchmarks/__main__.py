@@ -0,0 +1,117 @@
+"""Command line interface of the benchmarks.
+
+Examples::
+
+    python -m panli_crowdtruth.benchmarks run --sizes 1e3 1e4 1e5
+    python -m panli_crowdtruth.benchmarks compare 4d34b9d 6035827
+    python -m panli_crowdtruth.benchmarks generate --judgments 1e6 data/01_raw/synthetic
+    python -m panli_crowdtruth.benchmarks startup --pipelines selection
+"""
+
+import argparse
+import logging
+import sys
+
+import pandas as pd
+
+from panli_crowdtruth.benchmarks.startup import STARTUP_BUDGET, check_startup
+from panli_crowdtruth.benchmarks.suite import (
+    RESULTS_PATH,
+    SIZES,
+    STAGES,
+    compare_benchmarks,
+    run_benchmarks,
+)
+from panli_crowdtruth.benchmarks.synthetic import SyntheticStudy, write_study
+
+
+def _size(value: str) -> int:
+    return int(float(value))
+
+
+def _limit(value: str):
+    stage, _, size = value.rpartition("=")
+    if stage not in {stage.name for stage in STAGES}:
+        raise argparse.ArgumentTypeError(f"Unknown stage: {stage}")
+    return stage, _size(size)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m panli_crowdtruth.benchmarks")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run = commands.add_parser("run", help="time the pipeline stages")
+    run.add_argument("--sizes", nargs="+", type=_size, default=SIZES)
+    run.add_argument("--stages", nargs="+", choices=[stage.name for stage in STAGES])
+    run.add_argument("--repeats", type=int, default=1)
+    run.add_argument(
+        "--max-judgments",
+        nargs="+",
+        type=_limit,
+        default=[],
+        metavar="STAGE=N",
+        help="largest study to run a stage on",
+    )
+    run.add_argument("--spam-rate", type=float, default=SyntheticStudy.spam_rate)
+    run.add_argument("--results", default=RESULTS_PATH)
+
+    compare = commands.add_parser("compare", help="compare the timings of commits")
+    compare.add_argument("base")
+    compare.add_argument("head")
+    compare.add_argument("--results", default=RESULTS_PATH)
+
+    generate = commands.add_parser("generate", help="write a synthetic study")
+    generate.add_argument("output_dir")
+    generate.add_argument("--judgments", type=_size, default=10**4)
+    generate.add_argument(
+        "--workers-per-unit", type=int, default=SyntheticStudy.workers_per_unit
+    )
+    generate.add_argument("--labels", nargs="+", default=SyntheticStudy.labels)
+    generate.add_argument("--spam-rate", type=float, default=SyntheticStudy.spam_rate)
+    generate.add_argument("--seed", type=int, default=SyntheticStudy.seed)
+
+    startup = commands.add_parser(
+        "startup", help="check the import time of the pipelines against a budget"
+    )
+    startup.add_argument("--pipelines", nargs="+")
+    startup.add_argument("--budget", type=float, default=STARTUP_BUDGET)
+    startup.add_argument("--repeats", type=int, default=5)
+    startup.add_argument("--project-path", default=".")
+
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+
+    with pd.option_context("display.width", 160, "display.max_rows", None):
+        if args.command == "run":
+            results = run_benchmarks(
+                args.sizes,
+                args.stages,
+                args.repeats,
+                dict(args.max_judgments),
+                args.results,
+                spam_rate=args.spam_rate,
+            )
+            print(results.drop(columns=["commit", "timestamp"]).to_string())
+        elif args.command == "compare":
+            print(compare_benchmarks(args.base, args.head, args.results).to_string())
+        elif args.command == "startup":
+            results = check_startup(
+                args.pipelines, args.budget, args.repeats, args.project_path
+            )
+            print(results.to_string())
+            if not results["ok"].all():
+                sys.exit(1)
+        else:
+            study = SyntheticStudy.with_judgments(
+                args.judgments,
+                workers_per_unit=args.workers_per_unit,
+                labels=tuple(args.labels),
+                spam_rate=args.spam_rate,
+                seed=args.seed,
+            )
+            for path in write_study(study, args.output_dir):
+                print(path)
+
+
+if __name__ == "__main__":
+    main()
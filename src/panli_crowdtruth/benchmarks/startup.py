@@ -0,0 +1,138 @@
+"""Startup time of the pipelines, measured with ``python -X importtime``.
+
+Every ``kedro run`` builds all registered pipelines, which imports the modules
+of every node function. The node functions therefore import their heavy
+dependencies (CrowdTruth, Plotly Express and its figure factory, SciPy) when
+they run, and a selection-only run never loads them.
+
+The startup of a pipeline is measured in a fresh interpreter that does what
+``kedro run --pipeline <name>`` does before its first node: it creates a
+session, which loads ``settings.py`` with the hooks, creates the catalog and
+selects the pipeline from the registry. As all pipelines are built by every
+run, their startup is the same, and a single budget applies to all of them.
+The startup has to stay within it, and must not import any of
+``DEFERRED_MODULES``.
+"""
+
+import os
+import re
+import subprocess
+import sys
+from typing import Iterable, List, Optional
+
+import pandas as pd
+
+# Seconds, measured on a single CPU: about 1.1s, of which pandas takes 0.45s
+STARTUP_BUDGET = 1.3
+PIPELINES = ["__default__"]
+DEFERRED_MODULES = [
+    "crowdtruth",
+    "plotly.express",
+    "plotly.figure_factory",
+    "scipy",
+    "statsmodels",
+]
+
+_IMPORT_TIME = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \| (\s*)(\S+)$")
+
+
+def import_times(pipeline: str, project_path: str = ".") -> pd.DataFrame:
+    """Starts a Kedro session and selects a pipeline in a fresh interpreter,
+    and reads the import times of all modules.
+
+    Args:
+        pipeline: Name of the registered pipeline.
+        project_path: Root directory of the Kedro project.
+
+    Returns:
+        The module, its own and cumulative import time (in seconds) and its
+        nesting level, in import order.
+    """
+    code = (
+        "from pathlib import Path; "
+        "from kedro.framework.project import pipelines; "
+        "from kedro.framework.session import KedroSession; "
+        "from kedro.framework.startup import bootstrap_project; "
+        "bootstrap_project(Path.cwd()); "
+        "session = KedroSession.create(); "
+        "session.load_context().catalog; "
+        f"pipelines[{pipeline!r}]"
+    )
+    process = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        capture_output=True,
+        text=True,
+        check=True,
+        cwd=project_path,
+        env={**os.environ, "KEDRO_DISABLE_TELEMETRY": "1"},
+    )
+
+    rows = []
+    for line in process.stderr.splitlines():
+        match = _IMPORT_TIME.match(line)
+        if match:
+            own, cumulative, indent, module = match.groups()
+            rows.append(
+                {
+                    "module": module,
+                    "seconds": int(own) / 1e6,
+                    "cumulative_seconds": int(cumulative) / 1e6,
+                    "level": len(indent) // 2,
+                }
+            )
+    return pd.DataFrame(rows)
+
+
+def check_startup(
+    pipelines: Optional[Iterable[str]] = None,
+    budget: float = STARTUP_BUDGET,
+    repeats: int = 5,
+    project_path: str = ".",
+) -> pd.DataFrame:
+    """Measures the startup time of pipelines against the budget.
+
+    Args:
+        pipelines: Names of the pipelines, defaults to ``PIPELINES``.
+        budget: Startup budget in seconds.
+        repeats: Number of measurements; the fastest is kept.
+        project_path: Root directory of the Kedro project.
+
+    Returns:
+        Per pipeline, the import time, its budget, the slowest imports one
+        level below the top and the deferred modules that were imported.
+    """
+    rows = []
+    for pipeline in pipelines or PIPELINES:
+        runs = [import_times(pipeline, project_path) for _ in range(repeats)]
+        times = min(
+            runs,
+            key=lambda times: times.loc[times.level == 0, "cumulative_seconds"].sum(),
+        )
+        seconds = times.loc[times.level == 0, "cumulative_seconds"].sum()
+        deferred = _imported(times["module"], DEFERRED_MODULES)
+        rows.append(
+            {
+                "pipeline": pipeline,
+                "seconds": seconds,
+                "budget": budget,
+                "ok": seconds <= budget and not deferred,
+                "slowest": ", ".join(
+                    f"{row.module} {row.cumulative_seconds:.2f}s"
+                    for row in times[times.level == 1]
+                    .nlargest(3, "cumulative_seconds")
+                    .itertuples()
+                ),
+                "deferred_imported": ", ".join(deferred),
+            }
+        )
+    return pd.DataFrame(rows)
+
+
+def _imported(modules: Iterable[str], packages: List[str]) -> List[str]:
+    return [
+        package
+        for package in packages
+        if any(
+            module == package or module.startswith(f"{package}.") for module in modules
+        )
+    ]
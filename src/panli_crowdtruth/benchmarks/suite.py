@@ -0,0 +1,474 @@
+"""Benchmarks of the pipeline stages on synthetic studies.
+
+Every stage is timed on studies of increasing size, and the timings are
+appended to a CSV file together with the commit they were measured on, so
+they can be compared across commits with ``compare_benchmarks``.
+
+Stages that are too slow for a size are skipped (see ``Stage.max_judgments``),
+as are the stages whose inputs were not computed. Notably, the CrowdTruth
+preprocessing (``crowdtruth.load``) takes several milliseconds per judgment,
+so it only runs on the smaller studies. For the larger ones, its results are
+built directly from the synthetic study, untimed, so the metrics and analyses
+still run on every size.
+"""
+
+import logging
+import os
+import subprocess
+import tempfile
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+import pandas as pd
+
+from panli_crowdtruth.benchmarks.synthetic import (
+    SyntheticStudy,
+    crowdtruth_results,
+    generate_study,
+)
+from panli_crowdtruth.datasets import CrowdTruthParquetDataset
+from panli_crowdtruth.pipelines.analysis.annotations import analyse_annotations
+from panli_crowdtruth.pipelines.analysis.facts import build_judgment_facts
+from panli_crowdtruth.pipelines.analysis.units import (
+    analyse_units,
+    analyse_uqs_per_type,
+    preprocess_units,
+    regress_uqs_on_similarity,
+)
+from panli_crowdtruth.pipelines.analysis.workers_demographics import (
+    analyse_demographics,
+)
+from panli_crowdtruth.pipelines.analysis.workers_performance import analyse_performance
+from panli_crowdtruth.pipelines.compute_crowdtruth_metrics.bootstrap import (
+    bootstrap_crowdtruth_metrics,
+)
+from panli_crowdtruth.pipelines.compute_crowdtruth_metrics.compute_metrics import (
+    compute_crowdtruth_metrics,
+)
+from panli_crowdtruth.pipelines.compute_crowdtruth_metrics.ingestion import (
+    ingest_prolific_annotations,
+)
+from panli_crowdtruth.pipelines.compute_crowdtruth_metrics.preprocessing import (
+    prepare_crowdtruth_judgments,
+)
+from panli_crowdtruth.pipelines.selection.nodes import balance_number_of_workers
+from panli_crowdtruth.text_store import split_texts
+
+logger = logging.getLogger(__name__)
+
+RESULTS_PATH = "data/08_reporting/benchmarks/benchmarks.csv"
+SIZES = [10**3, 10**4, 10**5, 10**6, 10**7]
+RESULT_NAMES = ["units", "workers", "annotations", "judgments", "jobs"]
+BOOTSTRAP_REPLICATES = 20
+# Largest study that is preprocessed with ``crowdtruth.load`` by default
+CROWDTRUTH_LOAD_MAX_JUDGMENTS = 10**4
+
+
+@dataclass
+class Stage:
+    """A benchmarked pipeline stage.
+
+    Attributes:
+        name: Name of the stage, usually the name of its node.
+        run: Runs the stage on the state of the benchmark (the outputs of
+            previous stages) and returns its outputs. Only this is timed.
+        inputs: Names of the outputs of previous stages that are needed.
+        max_judgments: Largest study the stage is run on, ``None`` for all.
+        setup: Prepares the arguments of ``run`` from the state, untimed.
+    """
+
+    name: str
+    run: Callable[..., Dict[str, Any]]
+    inputs: List[str]
+    max_judgments: Optional[int] = None
+    setup: Optional[Callable[[Dict[str, Any]], Dict[str, Any]]] = None
+
+
+def _ingest(csv_path: str) -> Dict[str, Any]:
+    chunks = ingest_prolific_annotations(csv_path)
+    return {"annotations_ingested": pd.concat(chunks, ignore_index=True)}
+
+
+def _write_csv(state: Dict[str, Any]) -> Dict[str, Any]:
+    csv_path = os.path.join(state["tmp_dir"], "prolific_annotations_all.csv")
+    state["annotations"].to_csv(csv_path, index=False)
+    return {"csv_path": csv_path}
+
+
+def _prepare(annotations: pd.DataFrame) -> Dict[str, Any]:
+    data, config = prepare_crowdtruth_judgments(annotations, 3, "synthetic")
+    return {"crowdtruth_input": data, "config": config}
+
+
+def _synthetic_crowdtruth_input(annotations: pd.DataFrame) -> Dict[str, Any]:
+    data, config = crowdtruth_results(annotations, 3, "synthetic")
+    return {"crowdtruth_input": data, "config": config}
+
+
+def _copy_input(state: Dict[str, Any]) -> Dict[str, Any]:
+    # The engines add their scores to the input frames
+    data = {name: df.copy() for name, df in state["crowdtruth_input"].items()}
+    return {"data": data, "config": state["config"]}
+
+
+def _metrics(engine: str) -> Callable[..., Dict[str, Any]]:
+    def run(data, config) -> Dict[str, Any]:
+        results = compute_crowdtruth_metrics(data, config, metrics_engine=engine)
+        names = [f"crowdtruth_{name}" for name in RESULT_NAMES + ["convergence"]]
+        return dict(zip(names, results))
+
+    return run
+
+
+def _store_results(tmp_dir: str, **results) -> Dict[str, Any]:
+    # Round trip through the catalog's dataset, so the later stages get the
+    # results as they are loaded in the pipeline
+    loaded = {}
+    for name, df in results.items():
+        dataset = CrowdTruthParquetDataset(os.path.join(tmp_dir, f"{name}.parquet"))
+        dataset.save(df)
+        loaded[name] = dataset.load()
+    return loaded
+
+
+def _bootstrap(**inputs) -> Dict[str, Any]:
+    bootstrap_crowdtruth_metrics(
+        inputs["crowdtruth_units"],
+        inputs["crowdtruth_workers"],
+        inputs["crowdtruth_annotations"],
+        inputs["crowdtruth_judgments"],
+        inputs["config"],
+        {"n_replicates": BOOTSTRAP_REPLICATES},
+    )
+    return {}
+
+
+def _balance(**inputs) -> Dict[str, Any]:
+    balance_number_of_workers(
+        inputs["judgment_facts"],
+        inputs["annotations"],
+        inputs["prolific_workers"],
+    )
+    return {}
+
+
+STAGES = [
+    Stage(
+        "ingest_prolific_annotations",
+        _ingest,
+        ["annotations"],
+        max_judgments=10**6,
+        setup=_write_csv,
+    ),
+    Stage(
+        "prepare_crowdtruth_judgments",
+        _prepare,
+        ["annotations"],
+        max_judgments=CROWDTRUTH_LOAD_MAX_JUDGMENTS,
+    ),
+    Stage(
+        "compute_crowdtruth_metrics[crowdtruth]",
+        _metrics("crowdtruth"),
+        ["crowdtruth_input"],
+        max_judgments=10**4,
+        setup=_copy_input,
+    ),
+    Stage(
+        "compute_crowdtruth_metrics[sharded]",
+        _metrics("sharded"),
+        ["crowdtruth_input"],
+        setup=_copy_input,
+    ),
+    # Last, so the analyses run on the results of the vectorized engine
+    Stage(
+        "compute_crowdtruth_metrics[vectorized]",
+        _metrics("vectorized"),
+        ["crowdtruth_input"],
+        setup=_copy_input,
+    ),
+    Stage(
+        "split_unit_texts",
+        lambda crowdtruth_units: dict(
+            zip(
+                ["crowdtruth_units", "crowdtruth_unit_texts"],
+                split_texts(crowdtruth_units),
+            )
+        ),
+        ["crowdtruth_units"],
+    ),
+    Stage(
+        "store_crowdtruth_results",
+        _store_results,
+        ["tmp_dir"] + [f"crowdtruth_{name}" for name in RESULT_NAMES],
+    ),
+    Stage(
+        "bootstrap_crowdtruth_metrics",
+        _bootstrap,
+        [
+            "crowdtruth_units",
+            "crowdtruth_workers",
+            "crowdtruth_annotations",
+            "crowdtruth_judgments",
+            "config",
+        ],
+        max_judgments=10**6,
+    ),
+    Stage(
+        "preprocess_units",
+        lambda crowdtruth_units: {
+            "units_preprocessed": preprocess_units(crowdtruth_units)
+        },
+        ["crowdtruth_units"],
+    ),
+    Stage(
+        "build_judgment_facts",
+        lambda **inputs: {
+            "judgment_facts": build_judgment_facts(
+                inputs["crowdtruth_judgments"],
+                inputs["units_preprocessed"],
+                inputs["crowdtruth_workers"],
+            )
+        },
+        [
+            "crowdtruth_judgments",
+            "units_preprocessed",
+            "crowdtruth_workers",
+        ],
+    ),
+    Stage(
+        "balance_number_of_workers",
+        _balance,
+        ["judgment_facts", "annotations", "prolific_workers"],
+    ),
+    Stage(
+        "analyse_demographics",
+        lambda prolific_workers: {
+            "images_demographics": analyse_demographics(prolific_workers)
+        },
+        ["prolific_workers"],
+    ),
+    Stage(
+        "analyse_performance",
+        lambda **inputs: {
+            "images_performance": analyse_performance(
+                inputs["prolific_workers"],
+                inputs["judgment_facts"],
+                inputs["crowdtruth_workers"],
+            )
+        },
+        ["prolific_workers", "judgment_facts", "crowdtruth_workers"],
+    ),
+    Stage(
+        "analyse_annotations",
+        lambda judgment_facts: {
+            "images_annotations": analyse_annotations(judgment_facts)
+        },
+        ["judgment_facts"],
+    ),
+    Stage(
+        "analyse_units",
+        lambda units_preprocessed: {"images_units": analyse_units(units_preprocessed)},
+        ["units_preprocessed"],
+    ),
+    Stage(
+        "regress_uqs_on_similarity",
+        lambda units_preprocessed: {
+            "uqs_similarity_trendlines": regress_uqs_on_similarity(units_preprocessed)
+        },
+        ["units_preprocessed"],
+    ),
+    Stage(
+        "analyse_uqs_per_type",
+        lambda units_preprocessed: {
+            "images_uqs_per_type": analyse_uqs_per_type(units_preprocessed)
+        },
+        ["units_preprocessed"],
+    ),
+]
+
+
+def current_commit() -> str:
+    """Short hash of the checked out commit, with ``-dirty`` if there are
+    uncommitted changes."""
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+        dirty = subprocess.run(
+            ["git", "diff", "--quiet", "HEAD", "--", "src"], check=False
+        ).returncode
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+    return f"{commit}-dirty" if dirty else commit
+
+
+def run_stage(
+    stage: Stage,
+    state: Dict[str, Any],
+    n_judgments: int,
+    repeats: int = 1,
+    max_judgments: Optional[int] = None,
+) -> Dict[str, Any]:
+    """Times a stage on the state of the benchmark and adds its outputs.
+    Stages that raise an error are recorded as failed.
+
+    Args:
+        stage: Stage to time.
+        state: Outputs of the previous stages.
+        n_judgments: Number of judgments of the study.
+        repeats: Number of runs; the fastest is kept.
+        max_judgments: Overrides ``stage.max_judgments``.
+
+    Returns:
+        Record of the timing.
+    """
+    missing = [name for name in stage.inputs if name not in state]
+    max_judgments = max_judgments or stage.max_judgments
+    if max_judgments is not None and n_judgments > max_judgments:
+        return {"stage": stage.name, "status": "skipped: too large"}
+    if missing:
+        return {"stage": stage.name, "status": "skipped: missing inputs"}
+
+    timings = []
+    for _ in range(repeats):
+        if stage.setup is not None:
+            kwargs = stage.setup(state)
+        else:
+            kwargs = {name: state[name] for name in stage.inputs}
+        start = time.perf_counter()
+        try:
+            outputs = stage.run(**kwargs)
+        except Exception as error:  # noqa: B902, a failing stage is a result too
+            logger.exception(f"{stage.name} failed on {n_judgments} judgments")
+            return {"stage": stage.name, "status": f"failed: {error!r}"}
+        timings.append(time.perf_counter() - start)
+
+    state.update(outputs)
+    seconds = min(timings)
+    logger.info(f"{stage.name}: {seconds:.3f}s for {n_judgments} judgments")
+    return {
+        "stage": stage.name,
+        "status": "ok",
+        "seconds": seconds,
+        "judgments_per_s": n_judgments / seconds if seconds > 0 else None,
+    }
+
+
+def run_benchmarks(
+    sizes: Iterable[int] = SIZES,
+    stages: Optional[Iterable[str]] = None,
+    repeats: int = 1,
+    max_judgments: Optional[Dict[str, int]] = None,
+    results_path: Optional[str] = RESULTS_PATH,
+    **study_kwargs,
+) -> pd.DataFrame:
+    """Times the pipeline stages on synthetic studies of several sizes.
+
+    Args:
+        sizes: Numbers of judgments of the studies.
+        stages: Names of the stages to time, defaults to all. Stages whose
+            inputs are computed by a stage that is not selected are skipped.
+        repeats: Number of times every stage is run; the fastest is kept.
+        max_judgments: Largest study per stage name, overriding the defaults.
+        results_path: CSV file the timings are appended to, or ``None``.
+        **study_kwargs: Parameters of ``SyntheticStudy``, e.g. ``spam_rate``.
+
+    Returns:
+        Timings of the stages, one row per stage and size.
+    """
+    selected = [
+        stage for stage in STAGES if stages is None or stage.name in set(stages)
+    ]
+    max_judgments = max_judgments or {}
+    max_load_judgments = max_judgments.get(
+        "prepare_crowdtruth_judgments", CROWDTRUTH_LOAD_MAX_JUDGMENTS
+    )
+    commit = current_commit()
+    timestamp = datetime.now().isoformat(timespec="seconds")
+
+    records = []
+    for n_judgments in sizes:
+        study = SyntheticStudy.with_judgments(int(n_judgments), **study_kwargs)
+        start = time.perf_counter()
+        annotations, workers = generate_study(study)
+        logger.info(f"Generated the study in {time.perf_counter() - start:.1f}s")
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            state = {
+                "annotations": annotations,
+                "prolific_workers": workers,
+                "tmp_dir": tmp_dir,
+            }
+            if study.n_judgments > max_load_judgments:
+                start = time.perf_counter()
+                state.update(_synthetic_crowdtruth_input(annotations))
+                logger.info(
+                    "Built the CrowdTruth input without crowdtruth.load in "
+                    f"{time.perf_counter() - start:.1f}s"
+                )
+            for stage in selected:
+                record = run_stage(
+                    stage,
+                    state,
+                    study.n_judgments,
+                    repeats,
+                    max_judgments.get(stage.name),
+                )
+                records.append(
+                    {
+                        "commit": commit,
+                        "timestamp": timestamp,
+                        "judgments": study.n_judgments,
+                        "units": study.n_units,
+                        "workers": study.n_workers,
+                        **record,
+                    }
+                )
+        del state, annotations, workers
+
+    results = pd.DataFrame(records)
+    if results_path is not None:
+        os.makedirs(os.path.dirname(results_path), exist_ok=True)
+        exists = os.path.exists(results_path)
+        results.to_csv(results_path, mode="a", header=not exists, index=False)
+        logger.info(f"Appended the timings to {results_path}")
+    return results
+
+
+def compare_benchmarks(
+    base: str, head: str, results_path: str = RESULTS_PATH
+) -> pd.DataFrame:
+    """Compares the timings of two commits.
+
+    If a commit was benchmarked several times, its latest timings are used.
+
+    Args:
+        base: Commit to compare to.
+        head: Commit to compare.
+        results_path: CSV file with the timings.
+
+    Returns:
+        Seconds per stage and size for both commits, and their ratio
+        (head / base, below 1 is faster).
+    """
+    results = pd.read_csv(results_path, dtype={"commit": str})
+    results = results[results["status"] == "ok"]
+    latest = (
+        results.sort_values("timestamp")
+        .groupby(["commit", "stage", "judgments"])["seconds"]
+        .last()
+    )
+
+    comparison = pd.DataFrame(
+        {
+            base: latest.loc[base] if base in latest.index else None,
+            head: latest.loc[head] if head in latest.index else None,
+        }
+    )
+    comparison["ratio"] = comparison[head] / comparison[base]
+    return comparison.round(3)
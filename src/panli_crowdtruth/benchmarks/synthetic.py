@@ -0,0 +1,453 @@
+"""Synthetic PANLI-like studies for benchmarks.
+
+The generated annotations have the columns of ``BaseConfig.inputColumns``,
+``customPlatformColumns`` and ``outputColumns``, and the workers the columns
+of the Prolific export. The study is laid out like the real one: units are
+grouped in lists that are each annotated by ``workers_per_unit`` workers, who
+annotate exactly one list, and lists are grouped in batches.
+
+Every unit has a distribution over the labels that is concentrated on one
+label, reliable workers sample from it and spammers answer uniformly. All
+columns are generated with vectorized numpy operations, and ids, texts and
+times are stored compactly (categorical, Arrow strings and datetimes), so
+studies of 10^7 judgments fit in memory. Writing them as CSV takes minutes.
+"""
+
+import logging
+import os
+from collections import Counter
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+from panli_crowdtruth.pipelines.compute_crowdtruth_metrics.configuration import (
+    BaseConfig,
+)
+from panli_crowdtruth.pipelines.compute_crowdtruth_metrics.preprocessing import (
+    FOUR_LABELS,
+    get_loaded_config,
+    to_crowdtruth_frame,
+)
+
+if TYPE_CHECKING:
+    from crowdtruth.configuration import DefaultConfig
+
+logger = logging.getLogger(__name__)
+
+AUTHOR = "John (the author)"
+SOURCES = ["I", "who", "he", "the CDC", "doctors", "she", "they", "experts"]
+PREDICATES = ["avoid", "say", "believe", "claim", "delay", "recommend", "know"]
+STATUSES = ["APPROVED", "RETURNED", "TIMED-OUT", "REJECTED"]
+COUNTRIES = ["United Kingdom", "United States", "Canada", "Ireland", "Australia"]
+EMPLOYMENT = [
+    "Full-Time",
+    "Part-Time",
+    "Unemployed (and job seeking)",
+    "Not in paid work (e.g. homemaker', 'retired or disabled)",
+    "Other",
+]
+LANGUAGES = ["English", "English, French", "English, Spanish", "English, German"]
+
+
+@dataclass
+class SyntheticStudy:
+    """Size and noise of a synthetic study.
+
+    Attributes:
+        n_units: Number of units (statement-source pairs).
+        workers_per_unit: Number of workers that annotate every unit.
+        units_per_list: Number of units in a list, i.e. judgments per worker.
+        lists_per_batch: Number of lists in a batch.
+        labels: Possible answers.
+        spam_rate: Fraction of workers that answer uniformly at random.
+        ambiguity: Probability mass of a unit's distribution that is not on
+            its dominant label.
+        units_per_sentence: Average number of units per source sentence.
+        seed: Seed of the random generator.
+    """
+
+    n_units: int = 1000
+    workers_per_unit: int = 10
+    units_per_list: int = 37
+    lists_per_batch: int = 10
+    labels: Tuple[str, ...] = tuple(FOUR_LABELS)
+    spam_rate: float = 0.05
+    ambiguity: float = 0.3
+    units_per_sentence: float = 6.5
+    seed: int = 0
+
+    @classmethod
+    def with_judgments(cls, n_judgments: int, **kwargs) -> "SyntheticStudy":
+        """Study with about ``n_judgments`` judgments."""
+        workers_per_unit = kwargs.get("workers_per_unit", cls.workers_per_unit)
+        n_units = max(1, round(n_judgments / workers_per_unit))
+        return cls(n_units=n_units, **kwargs)
+
+    @property
+    def n_lists(self) -> int:
+        return -(-self.n_units // self.units_per_list)
+
+    @property
+    def n_workers(self) -> int:
+        return self.n_lists * self.workers_per_unit
+
+    @property
+    def n_judgments(self) -> int:
+        return self.n_units * self.workers_per_unit
+
+
+def _categorical(codes: np.ndarray, categories: List[str]) -> pd.Categorical:
+    return pd.Categorical.from_codes(codes, categories=categories)
+
+
+def _choice(codes: np.ndarray, values: List[str]) -> np.ndarray:
+    return np.array(values, dtype=object)[codes]
+
+
+def _ids(prefix: str, n: int) -> List[str]:
+    return [f"{prefix}{i}" for i in range(n)]
+
+
+def _hex_ids(rng: np.random.Generator, n: int) -> np.ndarray:
+    """Random ids like those of Prolific, e.g. ``5f5de7148b72aa638ec70b01``."""
+    hexes = rng.bytes(12 * n).hex()
+    return np.array([hexes[i : i + 24] for i in range(0, 24 * n, 24)])
+
+
+def generate_units(study: SyntheticStudy, rng: np.random.Generator) -> pd.DataFrame:
+    """Generates the input columns of the units."""
+    n = study.n_units
+    unit = np.arange(n)
+    list_id = unit // study.units_per_list
+
+    # Units share source sentences; intra-sentence units are about a statement
+    # in the sentence itself, inter-sentence ones about another sentence
+    n_sentences = max(1, round(n / study.units_per_sentence))
+    sent = rng.integers(n_sentences, size=n)
+    statement_sent = np.where(
+        rng.random(n) < 0.8, sent, rng.integers(n_sentences, size=n)
+    )
+    sent_ids = _ids("synthetic_", n_sentences)
+
+    n_sources = rng.choice(4, size=n, p=[0.66, 0.26, 0.07, 0.01])
+    source_index = np.minimum(
+        n_sources, rng.choice(4, size=n, p=[0.82, 0.15, 0.025, 0.005])
+    )
+    source = rng.integers(len(SOURCES), size=n)
+    source_texts = [AUTHOR] + SOURCES
+    sources = [AUTHOR] + [f"{AUTHOR}_{source}" for source in SOURCES]
+
+    predicate = rng.integers(len(PREDICATES), size=n)
+
+    return pd.DataFrame(
+        {
+            "question_id": _categorical(unit, _ids("unit_", n)),
+            "batch_id": list_id // study.lists_per_batch,
+            "list_id": list_id,
+            "pair_id": unit,
+            "sent_id": _categorical(sent, sent_ids),
+            "statement_sent_ids": _categorical(
+                statement_sent, [f"['{sent_id}']" for sent_id in sent_ids]
+            ),
+            "n_sources": n_sources,
+            "sources": _categorical(np.where(n_sources > 0, source + 1, 0), sources),
+            "sentence_predicate": _categorical(predicate, PREDICATES),
+            "sentence": _categorical(
+                sent, [f"Sentence {i} ." for i in range(n_sentences)]
+            ),
+            "sentence_statement": _categorical(
+                statement_sent,
+                [f"statement of sentence {i}" for i in range(n_sentences)],
+            ),
+            "statement": _categorical(unit, _ids("statement ", n)),
+            "sim": rng.random(n),
+            "source_index": source_index,
+            "source_text": _categorical(
+                np.where(source_index > 0, source + 1, 0), source_texts
+            ),
+            "true_answer": pd.Categorical(
+                np.where(rng.random(n) < 0.027, "agree", None), categories=["agree"]
+            ),
+        }
+    )
+
+
+def generate_annotations(
+    study: SyntheticStudy, units: pd.DataFrame, rng: np.random.Generator
+) -> Tuple[pd.DataFrame, np.ndarray]:
+    """Generates one judgment per unit and worker of its list.
+
+    Returns:
+        The annotations and the ids of the workers.
+    """
+    n_labels = len(study.labels)
+    list_id = units["list_id"].to_numpy()
+
+    # Worker k of a list is worker list_id * workers_per_unit + k
+    unit_idx = np.repeat(np.arange(study.n_units), study.workers_per_unit)
+    worker_idx = list_id[unit_idx] * study.workers_per_unit + np.tile(
+        np.arange(study.workers_per_unit), study.n_units
+    )
+    worker_ids = _hex_ids(rng, study.n_workers)
+
+    # Answers: the unit's dominant label, another label (ambiguity) or noise
+    dominant = rng.integers(n_labels, size=study.n_units)[unit_idx]
+    other = (
+        dominant + rng.integers(1, max(n_labels, 2), size=len(unit_idx))
+    ) % n_labels
+    answer = np.where(rng.random(len(unit_idx)) < study.ambiguity, other, dominant)
+    spammer = rng.random(study.n_workers) < study.spam_rate
+    answer = np.where(
+        spammer[worker_idx], rng.integers(n_labels, size=len(unit_idx)), answer
+    )
+
+    # Every worker starts their list at some point in the study and spends
+    # about 20 seconds per unit
+    start = pd.Timestamp("2020-09-07") + pd.to_timedelta(
+        rng.integers(14 * 24 * 3600, size=study.n_workers)[worker_idx], unit="s"
+    )
+    position = unit_idx % study.units_per_list
+    started = start + pd.to_timedelta(position * 20, unit="s")
+    submitted = started + pd.to_timedelta(rng.gamma(4, 5, size=len(unit_idx)), unit="s")
+
+    annotations = units.iloc[unit_idx].reset_index(drop=True)
+    annotations.insert(
+        0,
+        "judgment_id",
+        pd.array(_ids("judgment_", len(unit_idx)), dtype="string[pyarrow]"),
+    )
+    annotations.insert(2, "worker_id", _categorical(worker_idx, list(worker_ids)))
+    annotations.insert(3, "started_time", started)
+    annotations.insert(4, "submitted_time", submitted.round("ms"))
+    annotations["answer_value"] = _categorical(answer, list(study.labels))
+
+    columns = BaseConfig.customPlatformColumns + BaseConfig.inputColumns
+    return annotations[columns + BaseConfig.outputColumns], worker_ids
+
+
+def generate_workers(
+    study: SyntheticStudy, worker_ids: np.ndarray, rng: np.random.Generator
+) -> pd.DataFrame:
+    """Generates the Prolific export of the workers. The columns have the
+    dtypes of the CSV export as read by pandas."""
+    n = len(worker_ids)
+    started = pd.Timestamp("2020-09-07") + pd.to_timedelta(
+        rng.integers(14 * 24 * 3600, size=n), unit="s"
+    )
+    time_taken = rng.gamma(4, study.units_per_list * 5, size=n)
+    country = _choice(
+        rng.choice(len(COUNTRIES), size=n, p=[0.65, 0.15, 0.1, 0.05, 0.05]), COUNTRIES
+    )
+
+    return pd.DataFrame(
+        {
+            "session_id": _hex_ids(rng, n),
+            "worker_id": worker_ids,
+            "status": _choice(
+                rng.choice(4, size=n, p=[0.87, 0.085, 0.033, 0.012]), STATUSES
+            ),
+            "started_datetime": started.astype(str),
+            "completed_date_time": (
+                started + pd.to_timedelta(time_taken, unit="s")
+            ).astype(str),
+            "time_taken": time_taken.round(3),
+            "age": rng.integers(18, 75, size=n).astype(float),
+            "num_approvals": rng.integers(0, 1000, size=n),
+            "num_rejections": rng.geometric(0.5, size=n) - 1,
+            "prolific_score": np.clip(100 - rng.geometric(0.6, size=n) + 1, 80, 100),
+            "reviewed_at_datetime": (started + pd.Timedelta(days=2)).astype(str),
+            "entered_code": "SYNTHETIC",
+            "Country of Birth": country,
+            "Current Country of Residence": country,
+            "Employment Status": _choice(
+                rng.integers(len(EMPLOYMENT), size=n), EMPLOYMENT
+            ),
+            "First Language": "English",
+            "First language": "English",
+            "Fluent languages": _choice(
+                rng.choice(len(LANGUAGES), size=n, p=[0.85, 0.05, 0.05, 0.05]),
+                LANGUAGES,
+            ),
+            "Nationality": country,
+            "Sex": _choice(rng.choice(2, size=n, p=[0.6, 0.4]), ["Female", "Male"]),
+            "Student Status": _choice(
+                rng.choice(2, size=n, p=[0.74, 0.26]), ["No", "Yes"]
+            ),
+        }
+    )
+
+
+def generate_study(study: SyntheticStudy) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """Generates the annotations and workers of a synthetic study.
+
+    Args:
+        study: Size and noise of the study.
+
+    Returns:
+        Annotations and workers, like ``prolific_annotations_all`` and
+        ``prolific_workers_all``.
+    """
+    rng = np.random.default_rng(study.seed)
+    units = generate_units(study, rng)
+    annotations, worker_ids = generate_annotations(study, units, rng)
+    workers = generate_workers(study, worker_ids, rng)
+    logger.info(
+        f"Generated {len(annotations)} judgments of {study.n_units} units by "
+        f"{study.n_workers} workers"
+    )
+    return annotations, workers
+
+
+def crowdtruth_results(
+    annotations: pd.DataFrame, n_classes: int, job_name: str
+) -> Tuple[Dict[str, pd.DataFrame], "DefaultConfig"]:
+    """Builds the results of ``crowdtruth.load`` for a synthetic study.
+
+    ``crowdtruth.load`` takes several milliseconds per judgment, so the
+    benchmarks only run it on small studies. For larger studies, its results
+    dictionary is built here with vectorized operations instead, including
+    the order of the labels in the annotation vectors. This relies on the
+    synthetic annotations having an answer for every judgment and at least
+    two judgments per unit, so ``crowdtruth.load`` drops none of them.
+
+    Args:
+        annotations: Annotations of a synthetic study.
+        n_classes: Number of classes (3 or 4) in PANLI dataset.
+        job_name: Name of the CrowdTruth job.
+
+    Returns:
+        Results dictionary and configuration, like those of
+        ``prepare_crowdtruth_judgments``.
+    """
+    config = get_loaded_config(annotations, n_classes)
+    col = config.output["answer_value"]
+    labels = list(config.annotation_vector)
+    n_labels = len(labels)
+
+    # Answer of every judgment as a position in the annotation vector
+    answers = annotations["answer_value"].cat
+    mapped = config.processJudgments(
+        pd.DataFrame({"answer_value": answers.categories.astype(object)})
+    )["answer_value"]
+    answer = np.array([labels.index(label) for label in mapped])[answers.codes]
+
+    # Units are sorted by their id, like in a groupby of the id strings
+    question = annotations["question_id"].cat.remove_unused_categories()
+    unit_ids = pd.Index(question.cat.categories.astype(object)).sort_values()
+    unit_idx = unit_ids.get_indexer(question.cat.categories)[question.cat.codes]
+    worker = annotations["worker_id"].astype(object)
+    started = annotations["started_time"]
+    submitted = annotations["submitted_time"]
+    duration = (submitted - started).dt.seconds.astype("int64")
+
+    # A judgment vector has its answer first, the other labels with 0 after
+    templates = [
+        {
+            labels[label]: int(label == first)
+            for label in [first] + list(range(n_labels))
+        }
+        for first in range(n_labels)
+    ]
+    judgments = pd.DataFrame(
+        {
+            col: [Counter(templates[label]) for label in answer],
+            f"{col}.count": 1,
+            f"{col}.unique": n_labels,
+            "unit": annotations["question_id"].astype(object),
+            "worker": worker,
+            "started": started,
+            "submitted": submitted,
+            "duration": duration,
+            "job": job_name,
+        },
+    )
+    judgments.index = pd.Index(
+        annotations["judgment_id"].astype(object), name="judgment"
+    )
+
+    # A unit vector has the labels in the order they are first answered, then
+    # the labels without answers
+    counts = np.zeros((len(unit_ids), n_labels), dtype=int)
+    np.add.at(counts, (unit_idx, answer), 1)
+    first_answer = np.full((len(unit_ids), n_labels), len(answer))
+    np.minimum.at(first_answer, (unit_idx, answer), np.arange(len(answer)))
+    order = np.argsort(first_answer, axis=1, kind="stable")
+
+    units = to_crowdtruth_frame(
+        annotations.drop_duplicates("question_id").set_index("question_id")
+    )[list(config.input)]
+    units = units.rename(columns=config.input).reindex(unit_ids)
+    # The first value of a unit without any is None in CrowdTruth
+    text_cols = units.columns[units.dtypes == object]
+    units[text_cols] = units[text_cols].where(units[text_cols].notna(), None)
+    units.index = unit_ids.rename("unit")
+    units[col] = [
+        Counter({labels[label]: int(counts[unit, label]) for label in order[unit]})
+        for unit in range(len(unit_ids))
+    ]
+    units["job"] = job_name
+    units["worker"] = np.bincount(unit_idx)
+    units["duration"] = np.bincount(unit_idx, weights=duration) / units["worker"]
+    units[f"{col}.unique_annotations"] = (counts > 0).sum(axis=1)
+    units[f"{col}.annotations"] = counts.sum(axis=1)
+    units = units.reindex(sorted(units.columns), axis=1)
+
+    workers = (
+        pd.DataFrame({"worker": worker, "unit": unit_idx, "duration": duration})
+        .groupby("worker")
+        .agg(
+            unit=("unit", "nunique"),
+            judgment=("unit", "size"),
+            duration=("duration", "mean"),
+        )
+    )
+    workers.insert(2, "job", 1)
+
+    # Every judgment vector has all the labels
+    annotations_count = pd.DataFrame({col: len(answer)}, index=pd.Index(sorted(labels)))
+
+    runtime = submitted.max() - started.min()
+    jobs = pd.DataFrame(
+        {
+            "duration": duration.mean(),
+            "judgment": len(judgments),
+            "judgments.per.worker": len(judgments) / len(workers),
+            f"{col}.annotations": units[f"{col}.annotations"].mean(),
+            f"{col}.unique_annotations": units[f"{col}.unique_annotations"].mean(),
+            "runtime": runtime,
+            "runtime.per_unit": runtime / len(units),
+            "unit": len(units),
+            "worker": len(workers),
+        },
+        index=pd.Index([job_name], name="job"),
+    )
+
+    results = {
+        "jobs": jobs,
+        "units": units,
+        "workers": workers,
+        "judgments": judgments,
+        "annotations": annotations_count,
+    }
+    return results, config
+
+
+def write_study(study: SyntheticStudy, output_dir: str) -> Tuple[str, str]:
+    """Writes a synthetic study as Prolific CSV files.
+
+    Args:
+        study: Size and noise of the study.
+        output_dir: Directory to write the CSV files to.
+
+    Returns:
+        Paths to the annotations and workers CSV files.
+    """
+    annotations, workers = generate_study(study)
+    os.makedirs(output_dir, exist_ok=True)
+    annotations_path = os.path.join(output_dir, "prolific_annotations_all.csv")
+    workers_path = os.path.join(output_dir, "prolific_workers_all.csv")
+    annotations.to_csv(annotations_path, index=False)
+    workers.to_csv(workers_path, index=False)
+    return annotations_path, workers_path
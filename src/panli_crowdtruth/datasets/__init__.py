@@ -0,0 +1,2 @@
+from .chunked_parquet_dataset import ChunkedParquetDataset  # NOQA
+from .crowdtruth_parquet_dataset import CrowdTruthParquetDataset  # NOQA
@@ -0,0 +1,111 @@
+from collections.abc import Iterable
+from copy import deepcopy
+from pathlib import PurePosixPath
+from typing import Any, Dict, Union
+
+import fsspec
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from kedro.io.core import AbstractDataset, get_filepath_str, get_protocol_and_path
+
+
+def _normalize_schema(schema: pa.Schema) -> pa.Schema:
+    """Uses the same dictionary index type for all chunks, whatever the number
+    of categories in a chunk."""
+    fields = [
+        (
+            field.with_type(pa.dictionary(pa.int32(), field.type.value_type))
+            if pa.types.is_dictionary(field.type)
+            else field
+        )
+        for field in schema
+    ]
+    return pa.schema(fields, metadata=schema.metadata)
+
+
+class ChunkedParquetDataset(
+    AbstractDataset[Union[pd.DataFrame, Iterable], pd.DataFrame]
+):
+    """Saves a DataFrame, or an iterable of DataFrame chunks, as a Parquet
+    file and loads it as a single DataFrame.
+
+    Chunks are written one row group at a time, so saving the chunks of a
+    ``pd.read_csv(..., chunksize=...)`` reader needs memory for only one chunk.
+    All chunks must have the same columns and dtypes; categorical columns may
+    have different categories in every chunk.
+
+    Example catalog entry:
+
+    .. code-block:: yaml
+
+        prolific_annotations_ingested:
+          type: panli_crowdtruth.datasets.ChunkedParquetDataset
+          filepath: data/02_intermediate/prolific_annotations.parquet
+    """
+
+    DEFAULT_LOAD_ARGS: Dict[str, Any] = {}
+    DEFAULT_SAVE_ARGS: Dict[str, Any] = {"compression": "zstd"}
+
+    def __init__(
+        self,
+        filepath: str,
+        load_args: Dict[str, Any] = None,
+        save_args: Dict[str, Any] = None,
+        metadata: Dict[str, Any] = None,
+    ):
+        """Creates a new instance of ``ChunkedParquetDataset``.
+
+        Args:
+            filepath: Path to the Parquet file.
+            load_args: Options passed to ``pyarrow.parquet.read_table``.
+            save_args: Options passed to ``pyarrow.parquet.ParquetWriter``.
+            metadata: Any arbitrary metadata, ignored by Kedro.
+        """
+        protocol, path = get_protocol_and_path(filepath)
+        self._protocol = protocol
+        self._filepath = PurePosixPath(path)
+        self._fs = fsspec.filesystem(self._protocol)
+        self._load_args = {**self.DEFAULT_LOAD_ARGS, **(load_args or {})}
+        self._save_args = {**self.DEFAULT_SAVE_ARGS, **(save_args or {})}
+        self.metadata = metadata
+
+    def _load(self) -> pd.DataFrame:
+        load_path = get_filepath_str(self._filepath, self._protocol)
+
+        with self._fs.open(load_path, mode="rb") as f:
+            table = pq.read_table(f, **deepcopy(self._load_args))
+
+        return table.to_pandas()
+
+    def _save(self, data: Union[pd.DataFrame, Iterable]) -> None:
+        save_path = get_filepath_str(self._filepath, self._protocol)
+        chunks = [data] if isinstance(data, pd.DataFrame) else data
+
+        writer = None
+        with self._fs.open(save_path, mode="wb") as f:
+            try:
+                for chunk in chunks:
+                    table = pa.Table.from_pandas(chunk, preserve_index=False)
+                    if writer is None:
+                        schema = _normalize_schema(table.schema)
+                        writer = pq.ParquetWriter(f, schema, **self._save_args)
+                    writer.write_table(table.cast(writer.schema))
+            finally:
+                if writer is not None:
+                    writer.close()
+
+        if writer is None:
+            raise ValueError(f"No data to save to {save_path}")
+
+    def _exists(self) -> bool:
+        load_path = get_filepath_str(self._filepath, self._protocol)
+        return self._fs.exists(load_path)
+
+    def _describe(self) -> Dict[str, Any]:
+        return {
+            "filepath": self._filepath,
+            "protocol": self._protocol,
+            "load_args": self._load_args,
+            "save_args": self._save_args,
+        }
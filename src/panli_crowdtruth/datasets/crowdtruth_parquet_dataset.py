@@ -0,0 +1,243 @@
+import json
+from collections import Counter
+from collections.abc import Mapping
+from copy import deepcopy
+from pathlib import PurePosixPath
+from typing import Any, Dict, List, Tuple
+
+import fsspec
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from kedro.io.core import AbstractDataset, get_filepath_str, get_protocol_and_path
+
+METADATA_KEY = b"panli_crowdtruth"
+ORDER_SUFFIX = "#order"
+
+
+def _label_column(col: str, label: str) -> str:
+    return f"{col}[{label}]"
+
+
+def _first_valid(series: pd.Series) -> Any:
+    index = series.first_valid_index()
+    return None if index is None else series[index]
+
+
+def encode_columns(df: pd.DataFrame) -> Tuple[pd.DataFrame, Dict[str, Any]]:
+    """Converts a CrowdTruth results DataFrame into Parquet-friendly columns.
+
+    - Counter and dict columns are expanded into one float column per label,
+      plus an integer column with the label order of every row: the index of
+      the order, as positions in the labels, in the distinct orders stored
+      in the metadata.
+    - Text columns are dictionary-encoded (categorical).
+
+    Args:
+        df: DataFrame with CrowdTruth results.
+
+    Returns:
+        The encoded DataFrame and the metadata to decode it.
+    """
+    columns = {}
+    metadata = {"counters": {}, "text": [], "lists": []}
+
+    for col in df.columns:
+        series = df[col]
+        if series.dtype != object:
+            columns[col] = series
+            continue
+
+        first = _first_valid(series)
+        if isinstance(first, Mapping):
+            labels = list(dict.fromkeys(label for x in series for label in x))
+            for label in labels:
+                columns[_label_column(col, label)] = np.fromiter(
+                    (x.get(label, np.nan) for x in series), float, count=len(series)
+                )
+            positions = {label: i for i, label in enumerate(labels)}
+            codes, orders = pd.factorize(
+                pd.Series([tuple(positions[label] for label in x) for x in series])
+            )
+            columns[col + ORDER_SUFFIX] = codes.astype(np.int32)
+            is_integer = all(
+                isinstance(value, (int, np.integer))
+                for x in series
+                for value in x.values()
+            )
+            metadata["counters"][col] = {
+                "labels": labels,
+                "orders": [list(order) for order in orders],
+                "dtype": "int64" if is_integer else "float64",
+            }
+        elif isinstance(first, str):
+            columns[col] = series.astype("category")
+            metadata["text"].append(col)
+        elif isinstance(first, list):
+            columns[col] = series
+            metadata["lists"].append(col)
+        else:
+            columns[col] = series
+
+    return pd.DataFrame(columns, index=df.index), metadata
+
+
+def decode_columns(df: pd.DataFrame, metadata: Dict[str, Any]) -> pd.DataFrame:
+    """Restores the columns encoded by ``encode_columns``.
+
+    Counter and dict columns are restored as ``Counter`` objects in their
+    original label order. Only the columns present in ``df`` are decoded.
+
+    Args:
+        df: Encoded DataFrame (possibly a subset of the columns).
+        metadata: Metadata returned by ``encode_columns``.
+
+    Returns:
+        The decoded DataFrame.
+    """
+    physical_to_counter = {}
+    for col, counter in metadata["counters"].items():
+        for label in counter["labels"]:
+            physical_to_counter[_label_column(col, label)] = col
+        physical_to_counter[col + ORDER_SUFFIX] = col
+
+    columns = {}
+    for col in df.columns:
+        if col in physical_to_counter:
+            counter_col = physical_to_counter[col]
+            if counter_col not in columns:
+                columns[counter_col] = _decode_counter(
+                    df, counter_col, metadata["counters"][counter_col]
+                )
+        elif col in metadata["text"]:
+            columns[col] = df[col].astype(object).where(df[col].notna(), np.nan)
+        elif col in metadata["lists"]:
+            columns[col] = df[col].map(
+                lambda x: list(x) if isinstance(x, np.ndarray) else x
+            )
+        else:
+            columns[col] = df[col]
+
+    return pd.DataFrame(columns, index=df.index)
+
+
+def _decode_counter(
+    df: pd.DataFrame, col: str, counter: Dict[str, Any]
+) -> List[Counter]:
+    to_value = int if counter["dtype"] == "int64" else float
+    values = {
+        label: df[_label_column(col, label)].to_numpy() for label in counter["labels"]
+    }
+    orders = df[col + ORDER_SUFFIX]
+    if "orders" in counter:
+        distinct = [
+            [counter["labels"][position] for position in order]
+            for order in counter["orders"]
+        ]
+        orders = [distinct[code] for code in orders]
+    else:
+        # Files written before stored the comma-joined labels of every row
+        orders = [order.split(",") if order else [] for order in orders.astype(str)]
+    return [
+        Counter({label: to_value(values[label][row]) for label in order})
+        for row, order in enumerate(orders)
+    ]
+
+
+class CrowdTruthParquetDataset(AbstractDataset[pd.DataFrame, pd.DataFrame]):
+    """Loads and saves CrowdTruth results as a columnar Parquet file.
+
+    Counter and dict columns (e.g. ``unit_annotation_score`` or
+    ``output.answer_value``) are stored as fixed per-label float columns, and
+    text columns are dictionary-encoded, so that a load can read only the
+    columns a node needs.
+
+    Example catalog entry:
+
+    .. code-block:: yaml
+
+        crowdtruth_units:
+          type: panli_crowdtruth.datasets.CrowdTruthParquetDataset
+          filepath: data/03_results/crowdtruth/units.parquet
+          load_args:
+            columns: [uqs, relation]
+    """
+
+    DEFAULT_LOAD_ARGS: Dict[str, Any] = {}
+    DEFAULT_SAVE_ARGS: Dict[str, Any] = {"compression": "zstd"}
+
+    def __init__(
+        self,
+        filepath: str,
+        load_args: Dict[str, Any] = None,
+        save_args: Dict[str, Any] = None,
+        metadata: Dict[str, Any] = None,
+    ):
+        """Creates a new instance of ``CrowdTruthParquetDataset``.
+
+        Args:
+            filepath: Path to the Parquet file.
+            load_args: Options for loading. ``columns`` selects the (logical)
+                columns to read; the index is always read.
+            save_args: Options passed to ``pyarrow.parquet.write_table``.
+            metadata: Any arbitrary metadata, ignored by Kedro.
+        """
+        protocol, path = get_protocol_and_path(filepath)
+        self._protocol = protocol
+        self._filepath = PurePosixPath(path)
+        self._fs = fsspec.filesystem(self._protocol)
+        self._load_args = {**self.DEFAULT_LOAD_ARGS, **(load_args or {})}
+        self._save_args = {**self.DEFAULT_SAVE_ARGS, **(save_args or {})}
+        self.metadata = metadata
+
+    def _load(self) -> pd.DataFrame:
+        load_path = get_filepath_str(self._filepath, self._protocol)
+        load_args = deepcopy(self._load_args)
+
+        with self._fs.open(load_path, mode="rb") as f:
+            parquet_file = pq.ParquetFile(f)
+            metadata = json.loads(parquet_file.schema_arrow.metadata[METADATA_KEY])
+
+            columns = load_args.pop("columns", None)
+            if columns is not None:
+                columns = self._physical_columns(columns, metadata)
+            table = parquet_file.read(columns=columns, use_pandas_metadata=True)
+
+        return decode_columns(table.to_pandas(), metadata)
+
+    def _save(self, data: pd.DataFrame) -> None:
+        save_path = get_filepath_str(self._filepath, self._protocol)
+
+        encoded, metadata = encode_columns(data)
+        table = pa.Table.from_pandas(encoded)
+        table = table.replace_schema_metadata(
+            {**table.schema.metadata, METADATA_KEY: json.dumps(metadata)}
+        )
+
+        with self._fs.open(save_path, mode="wb") as f:
+            pq.write_table(table, f, **self._save_args)
+
+    def _exists(self) -> bool:
+        load_path = get_filepath_str(self._filepath, self._protocol)
+        return self._fs.exists(load_path)
+
+    def _describe(self) -> Dict[str, Any]:
+        return {
+            "filepath": self._filepath,
+            "protocol": self._protocol,
+            "load_args": self._load_args,
+            "save_args": self._save_args,
+        }
+
+    @staticmethod
+    def _physical_columns(columns: List[str], metadata: Dict[str, Any]) -> List[str]:
+        physical = []
+        for col in columns:
+            if col in metadata["counters"]:
+                labels = metadata["counters"][col]["labels"]
+                physical.extend(_label_column(col, label) for label in labels)
+                physical.append(col + ORDER_SUFFIX)
+            else:
+                physical.append(col)
+        return physical
@@ -0,0 +1,513 @@
+"""Project hooks."""
+
+import gc
+import json
+import logging
+import os
+import resource
+import sys
+import threading
+import time
+import tracemalloc
+import weakref
+from collections import Counter
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import pandas as pd
+from kedro.framework.hooks import hook_impl
+from kedro.pipeline import Pipeline
+from kedro.pipeline.node import Node
+
+logger = logging.getLogger(__name__)
+
+REPORT_DIR = "data/08_reporting/pipeline_timing"
+MEMORY_REPORT_DIR = "data/08_reporting/pipeline_memory"
+MB = 1024**2
+
+
+def count_rows(data: Any) -> Optional[int]:
+    """Counts the rows of a DataFrame, or of the DataFrames in a dict, list or
+    tuple. Returns ``None`` if there are no DataFrames."""
+    if isinstance(data, (pd.DataFrame, pd.Series)):
+        return len(data)
+    if isinstance(data, dict):
+        data = list(data.values())
+    if isinstance(data, (list, tuple)):
+        counts = [count_rows(item) for item in data]
+        counts = [count for count in counts if count is not None]
+        return sum(counts) if counts else None
+    return None
+
+
+def _cpu_time() -> float:
+    """CPU time of this process and its finished child processes (e.g. the
+    process pools of the metrics and rendering nodes)."""
+    times = os.times()
+    return times.user + times.system + times.children_user + times.children_system
+
+
+class PipelineTimingHooks:
+    """Records the wall time, CPU time and rows in and out of every node,
+    dataset load and dataset save of a run.
+
+    At the end of the run, a summary table is logged and a JSON report is
+    written to ``<report_dir>/<run start>.json``. CPU time is measured for the
+    whole process, so it is only per node with the sequential runner.
+    """
+
+    def __init__(self, report_dir: str = REPORT_DIR):
+        self._report_dir = report_dir
+        self._records: List[Dict[str, Any]] = []
+        self._started: Dict[Tuple[str, str, str], Tuple[float, float]] = {}
+        self._rows_in: Dict[str, Optional[int]] = {}
+        self._run_start: Optional[datetime] = None
+        self._run_params: Dict[str, Any] = {}
+
+    def _start(self, kind: str, name: str, node: Optional[Node] = None) -> None:
+        key = (kind, name, node.name if node is not None else None)
+        self._started[key] = (time.perf_counter(), _cpu_time())
+
+    def _stop(self, kind: str, name: str, node: Optional[Node] = None, **rows):
+        key = (kind, name, node.name if node is not None else None)
+        wall_start, cpu_start = self._started.pop(key)
+        self._records.append(
+            {
+                "kind": kind,
+                "name": name,
+                "node": node.name if node is not None else None,
+                "wall_time": time.perf_counter() - wall_start,
+                "cpu_time": _cpu_time() - cpu_start,
+                **rows,
+            }
+        )
+
+    @hook_impl
+    def before_pipeline_run(self, run_params: Dict[str, Any]) -> None:
+        self._records = []
+        self._started = {}
+        self._rows_in = {}
+        self._run_start = datetime.now()
+        self._run_params = {
+            key: run_params.get(key)
+            for key in ["session_id", "pipeline_name", "runner", "env"]
+        }
+        self._start("pipeline", "run")
+
+    @hook_impl
+    def before_node_run(self, node: Node, inputs: Dict[str, Any]) -> None:
+        self._rows_in[node.name] = count_rows(inputs)
+        self._start("node", node.name, node)
+
+    @hook_impl
+    def after_node_run(self, node: Node, outputs: Dict[str, Any]) -> None:
+        self._stop(
+            "node",
+            node.name,
+            node,
+            rows_in=self._rows_in.pop(node.name, None),
+            rows_out=count_rows(outputs),
+        )
+
+    @hook_impl
+    def before_dataset_loaded(self, dataset_name: str, node: Node) -> None:
+        self._start("load", dataset_name, node)
+
+    @hook_impl
+    def after_dataset_loaded(self, dataset_name: str, data: Any, node: Node) -> None:
+        self._stop("load", dataset_name, node, rows_out=count_rows(data))
+
+    @hook_impl
+    def before_dataset_saved(self, dataset_name: str, node: Node) -> None:
+        self._start("save", dataset_name, node)
+
+    @hook_impl
+    def after_dataset_saved(self, dataset_name: str, data: Any, node: Node) -> None:
+        self._stop("save", dataset_name, node, rows_in=count_rows(data))
+
+    @hook_impl
+    def after_pipeline_run(self) -> None:
+        self._report(status="completed")
+
+    @hook_impl
+    def on_pipeline_error(self, error: Exception) -> None:
+        self._report(status=f"failed: {error!r}")
+
+    def _report(self, status: str) -> None:
+        self._stop("pipeline", "run")
+        report = {
+            **self._run_params,
+            "start": self._run_start.isoformat(timespec="seconds"),
+            "status": status,
+            "records": self._records,
+        }
+
+        os.makedirs(self._report_dir, exist_ok=True)
+        path = os.path.join(
+            self._report_dir, f"{self._run_start:%Y-%m-%dT%H.%M.%S}.json"
+        )
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+        logger.info(
+            f"Pipeline timing ({status}), report in {path}:\n"
+            f"{summary_table(self._records).to_string()}"
+        )
+
+
+def summary_table(records: List[Dict[str, Any]]) -> pd.DataFrame:
+    """Summarizes timing records per node: its own run time plus the time
+    spent loading its inputs and saving its outputs.
+
+    Args:
+        records: Records of ``PipelineTimingHooks``.
+
+    Returns:
+        Table with one row per node, slowest first, and a total row.
+    """
+    df = pd.DataFrame(records)
+    df = df[df["kind"] != "pipeline"]
+    if df.empty:
+        return df
+
+    for col in ["rows_in", "rows_out"]:
+        if col not in df.columns:
+            df[col] = None
+    nodes = df[df["kind"] == "node"].set_index("node")
+
+    table = pd.DataFrame(
+        {
+            "run_s": nodes["wall_time"],
+            "cpu_s": nodes["cpu_time"],
+            "load_s": df[df["kind"] == "load"].groupby("node")["wall_time"].sum(),
+            "save_s": df[df["kind"] == "save"].groupby("node")["wall_time"].sum(),
+            "rows_in": nodes["rows_in"],
+            "rows_out": nodes["rows_out"],
+        }
+    ).fillna({"load_s": 0.0, "save_s": 0.0})
+    table["total_s"] = table["run_s"] + table["load_s"] + table["save_s"]
+    # Nodes that ran in no measurable time have no rate, rather than inf
+    table["rows_per_s"] = table["rows_in"] / table["run_s"].where(table["run_s"] > 0)
+    table = table.sort_values("total_s", ascending=False)
+
+    table.loc["TOTAL"] = table[["run_s", "cpu_s", "load_s", "save_s", "total_s"]].sum()
+    return table.round(3)
+
+
+def current_rss() -> int:
+    """Resident set size of this process in bytes.
+
+    Falls back to the peak resident set size where ``/proc`` is not available.
+    """
+    try:
+        with open("/proc/self/statm", encoding="utf-8") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return max_rss if sys.platform == "darwin" else max_rss * 1024
+
+
+def iter_frames(name: str, data: Any) -> Iterator[Tuple[str, pd.DataFrame]]:
+    """Finds the DataFrames in a dataset, e.g. in the results dictionaries of
+    CrowdTruth, with their name."""
+    if isinstance(data, (pd.DataFrame, pd.Series)):
+        yield name, data
+    elif isinstance(data, dict):
+        for key, value in data.items():
+            yield from iter_frames(f"{name}[{key!r}]", value)
+    elif isinstance(data, (list, tuple)):
+        for i, value in enumerate(data):
+            yield from iter_frames(f"{name}[{i}]", value)
+
+
+def frame_mb(df: pd.DataFrame, deep: bool) -> float:
+    """Memory of a DataFrame or Series in MB. Without `deep`, the strings
+    and other objects in object columns are not included."""
+    usage = df.memory_usage(deep=deep)
+    return (usage.sum() if isinstance(df, pd.DataFrame) else usage) / MB
+
+
+class MemoryBudgetExceeded(MemoryError):
+    """The memory of a run exceeded the configured budget."""
+
+
+class _RSSSampler(threading.Thread):
+    """Samples the resident set size in the background and keeps its peak."""
+
+    def __init__(self, interval: float):
+        super().__init__(name="rss-sampler", daemon=True)
+        self.interval = interval
+        self.peak = current_rss()
+        self._stopped = threading.Event()
+
+    def reset(self) -> int:
+        """Restarts the peak from the current RSS and returns the old peak."""
+        peak, self.peak = self.peak, current_rss()
+        return max(peak, self.peak)
+
+    def run(self) -> None:
+        while not self._stopped.wait(self.interval):
+            self.peak = max(self.peak, current_rss())
+
+    def stop(self) -> None:
+        self._stopped.set()
+        self.join()
+
+
+class PipelineMemoryHooks:
+    """Tracks the peak memory of every node and the largest DataFrames of a
+    run, and enforces an optional memory budget.
+
+    The resident set size (RSS) of the process is sampled in a background
+    thread, so the peak of a node includes the copies made inside it, e.g. by
+    CrowdTruth. Optionally, ``tracemalloc`` additionally measures the peak of
+    the memory allocated by Python itself, at a considerable slowdown. Worker
+    processes, e.g. of the sharded metrics engine, are not included.
+
+    The settings are read from the ``memory`` parameters:
+
+    - ``budget_mb``: Maximum RSS in MB, or ``null`` for no budget.
+    - ``on_budget_exceeded``: ``fail`` raises ``MemoryBudgetExceeded`` at the
+      first node or dataset boundary over the budget, naming the node and the
+      largest DataFrames. ``release`` instead frees every ``MemoryDataset``
+      that no remaining node needs and only fails if that is not enough.
+    - ``release_early``: Whether to always release MemoryDatasets as
+      soon as no remaining node needs them. Kedro only releases them after
+      the node that loaded them last has saved its outputs. Pipeline outputs
+      are kept, as the run returns them, unless the budget is exceeded.
+    - ``tracemalloc``: Whether to also trace Python allocations.
+    - ``sample_interval_s``: Time between RSS samples.
+    - ``top_frames``: Number of largest DataFrames to report.
+    - ``deep_frame_sizes``: Whether to measure the objects in the DataFrames
+      after every node, which takes long for large string columns. By
+      default, only the frames that are still in memory are measured deeply,
+      when the budget is exceeded or the report is written.
+
+    At the end of the run, a summary is logged and a JSON report is written to
+    ``<report_dir>/<run start>.json``.
+    """
+
+    DEFAULT_SETTINGS: Dict[str, Any] = {
+        "budget_mb": None,
+        "on_budget_exceeded": "fail",
+        "release_early": False,
+        "tracemalloc": False,
+        "sample_interval_s": 0.05,
+        "top_frames": 5,
+        "deep_frame_sizes": False,
+    }
+
+    def __init__(self, report_dir: str = MEMORY_REPORT_DIR):
+        self._report_dir = report_dir
+        self._settings = dict(self.DEFAULT_SETTINGS)
+        self._sampler: Optional[_RSSSampler] = None
+        self._records: List[Dict[str, Any]] = []
+        self._frames: Dict[str, Dict[str, Any]] = {}
+        self._frame_refs: Dict[str, weakref.ref] = {}
+        self._catalog = None
+        self._memory_datasets: set = set()
+        self._saved: set = set()
+        self._load_counts: Counter = Counter()
+        self._free_outputs: set = set()
+        self._released: List[str] = []
+        self._run_start: Optional[datetime] = None
+        self._node_start_rss = 0
+
+    @property
+    def _budget(self) -> Optional[int]:
+        budget_mb = self._settings["budget_mb"]
+        return None if budget_mb is None else int(budget_mb * MB)
+
+    @hook_impl
+    def after_context_created(self, context) -> None:
+        settings = context.params.get("memory") or {}
+        unknown = set(settings) - set(self.DEFAULT_SETTINGS)
+        if unknown:
+            raise ValueError(f"Unknown memory settings: {unknown}")
+        self._settings = {**self.DEFAULT_SETTINGS, **settings}
+        if self._settings["on_budget_exceeded"] not in ("fail", "release"):
+            raise ValueError(
+                "on_budget_exceeded must be 'fail' or 'release', not "
+                f"{self._settings['on_budget_exceeded']!r}"
+            )
+
+    @hook_impl
+    def before_pipeline_run(self, pipeline: Pipeline, catalog) -> None:
+        self._records = []
+        self._frames = {}
+        self._frame_refs = {}
+        self._released = []
+        self._saved = set()
+        self._run_start = datetime.now()
+        self._catalog = catalog
+
+        # Datasets that are not in the catalog are created as MemoryDatasets
+        self._memory_datasets = {
+            name
+            for name in pipeline.datasets()
+            if name not in catalog.list() and not name.startswith("param")
+        }
+        self._load_counts = Counter(
+            name for node in pipeline.nodes for name in node.inputs
+        )
+        self._free_outputs = pipeline.outputs()
+
+        if self._settings["tracemalloc"]:
+            tracemalloc.start()
+        self._sampler = _RSSSampler(self._settings["sample_interval_s"])
+        self._sampler.start()
+
+    @hook_impl
+    def before_node_run(self, node: Node) -> None:
+        self._check_budget(node, "before the run")
+        self._sampler.reset()
+        if tracemalloc.is_tracing():
+            tracemalloc.reset_peak()
+        self._node_start_rss = current_rss()
+
+    @hook_impl
+    def after_node_run(
+        self, node: Node, inputs: Dict[str, Any], outputs: Dict[str, Any]
+    ) -> None:
+        record = {
+            "node": node.name,
+            "rss_start_mb": self._node_start_rss / MB,
+            "rss_peak_mb": self._sampler.reset() / MB,
+            "rss_end_mb": current_rss() / MB,
+        }
+        if tracemalloc.is_tracing():
+            record["python_peak_mb"] = tracemalloc.get_traced_memory()[1] / MB
+        self._records.append(record)
+
+        deep = self._settings["deep_frame_sizes"]
+        for dataset_name, data in {**inputs, **outputs}.items():
+            for name, df in iter_frames(dataset_name, data):
+                self._frames[name] = {
+                    "frame": name,
+                    "node": node.name,
+                    "rows": len(df),
+                    "mb": frame_mb(df, deep),
+                    "deep": deep,
+                }
+                # Kept without keeping the frame alive, to measure it later
+                self._frame_refs[name] = weakref.ref(df)
+
+        for name in node.inputs:
+            self._load_counts[name] -= 1
+        if self._settings["release_early"]:
+            self._release(name for name in node.inputs if self._unused(name))
+        self._check_budget(node, "after the run")
+
+    @hook_impl
+    def after_dataset_saved(self, dataset_name: str, node: Node) -> None:
+        self._saved.add(dataset_name)
+        if self._settings["release_early"] and self._unused(dataset_name):
+            self._release([dataset_name])
+        self._check_budget(node, f"after saving {dataset_name}")
+
+    @hook_impl
+    def after_pipeline_run(self) -> None:
+        self._report(status="completed")
+
+    @hook_impl
+    def on_pipeline_error(self, error: Exception) -> None:
+        self._report(status=f"failed: {error!r}")
+
+    def _unused(self, name: str, include_outputs: bool = False) -> bool:
+        """Whether a dataset is a MemoryDataset that no remaining node needs.
+        Pipeline outputs are only included on request, as they are returned
+        by the run."""
+        if name in self._free_outputs and not include_outputs:
+            return False
+        return (
+            name in self._memory_datasets
+            and name in self._saved
+            and self._load_counts[name] < 1
+        )
+
+    def _release(self, names) -> None:
+        for name in names:
+            self._catalog.release(name)
+            self._memory_datasets.discard(name)
+            self._released.append(name)
+            logger.debug(f"Released MemoryDataset {name}")
+        gc.collect()
+
+    def _check_budget(self, node: Node, moment: str) -> None:
+        budget = self._budget
+        if budget is None or current_rss() <= budget:
+            return
+
+        if self._settings["on_budget_exceeded"] == "release":
+            unused = [
+                name
+                for name in self._memory_datasets
+                if self._unused(name, include_outputs=True)
+            ]
+            self._release(unused)
+            rss = current_rss()
+            if rss <= budget:
+                logger.warning(
+                    f"Memory over budget {moment} node {node.name}; released "
+                    f"{len(unused)} MemoryDatasets, now {rss / MB:.0f} MB"
+                )
+                return
+
+        largest_frames = self._largest_frames()
+        raise MemoryBudgetExceeded(
+            f"Memory over the budget of {budget / MB:.0f} MB {moment} of node "
+            f"{node.name}: {current_rss() / MB:.0f} MB. Largest DataFrames:\n"
+            + (largest_frames.to_string() if len(largest_frames) else "none yet")
+        )
+
+    def _largest_frames(self) -> pd.DataFrame:
+        # Measures the frames that are still in memory deeply, once
+        for name, record in self._frames.items():
+            df = None if record["deep"] else self._frame_refs[name]()
+            if df is not None:
+                record.update(mb=frame_mb(df, deep=True), deep=True)
+
+        frames = pd.DataFrame(
+            list(self._frames.values()),
+            columns=["frame", "node", "rows", "mb", "deep"],
+        )
+        return (
+            frames.sort_values("mb", ascending=False)
+            .head(self._settings["top_frames"])
+            .set_index("frame")
+            .round(1)
+        )
+
+    def _report(self, status: str) -> None:
+        if self._sampler is None:
+            return
+        self._sampler.stop()
+        self._sampler = None
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+        nodes = pd.DataFrame(self._records)
+        largest_frames = self._largest_frames()
+        report = {
+            "start": self._run_start.isoformat(timespec="seconds"),
+            "status": status,
+            "settings": self._settings,
+            "nodes": self._records,
+            "largest_frames": largest_frames.reset_index().to_dict("records"),
+            "released": self._released,
+        }
+
+        os.makedirs(self._report_dir, exist_ok=True)
+        path = os.path.join(
+            self._report_dir, f"{self._run_start:%Y-%m-%dT%H.%M.%S}.json"
+        )
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+        if not nodes.empty:
+            nodes = nodes.set_index("node").sort_values("rss_peak_mb", ascending=False)
+        logger.info(
+            f"Pipeline memory ({status}), report in {path}:\n"
+            f"{nodes.round(1).to_string()}\n"
+            f"Largest DataFrames:\n{largest_frames.to_string()}"
+        )
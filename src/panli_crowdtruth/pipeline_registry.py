@@ -2,23 +2,12 @@
 
 from typing import Dict
 
-from kedro.framework.project import find_pipelines
 from kedro.pipeline import Pipeline
 
 from .pipelines.analysis import pipeline as analysis
 from .pipelines.compute_crowdtruth_metrics import pipeline as compute_crowdtruth_metrics
 from .pipelines.selection import pipeline as selection
 
-# def register_pipelines() -> Dict[str, Pipeline]:
-#     """Register the project's pipelines.
-
-#     Returns:
-#         A mapping from pipeline names to ``Pipeline`` objects.
-#     """
-#     pipelines = find_pipelines()
-#     pipelines["__default__"] = sum(pipelines.values())
-#     return pipelines
-
 
 def register_pipelines() -> Dict[str, Pipeline]:
     """Register the project's pipelines.
@@ -26,13 +15,16 @@ def register_pipelines() -> Dict[str, Pipeline]:
     Returns:
         A mapping from pipeline names to ``Pipeline`` objects.
     """
-    # Load all pipelines from the project
-    pipelines = find_pipelines()
-
-    # Create individual pipelines
+    # Create individual pipelines. They are not discovered with
+    # find_pipelines(), which would build every pipeline a second time
     compute_crowdtruth_metrics_pipeline = compute_crowdtruth_metrics.create_pipeline()
+    compute_crowdtruth_metrics_incremental_pipeline = (
+        compute_crowdtruth_metrics.create_incremental_pipeline()
+    )
     selection_pipeline = selection.create_pipeline()
+    selection_sweep_pipeline = selection.create_sweep_pipeline()
     analysis_pipeline = analysis.create_pipeline()
+    judgment_facts_pipeline = analysis.create_facts_pipeline()
 
     # Define the full pipeline by combining the individual pipelines
     full_pipeline = Pipeline(
@@ -44,14 +36,17 @@ def register_pipelines() -> Dict[str, Pipeline]:
     )
 
     # Add the pipelines to the registry
-    pipelines.update(
-        {
-            "__default__": full_pipeline,
-            "auto": sum(pipelines.values()),
-            "compute_crowdtruth_metrics": compute_crowdtruth_metrics_pipeline,
-            "selection": selection_pipeline,
-            "analysis": analysis_pipeline,
-        }
-    )
+    pipelines = {
+        "__default__": full_pipeline,
+        "auto": full_pipeline,
+        "compute_crowdtruth_metrics": compute_crowdtruth_metrics_pipeline,
+        "compute_crowdtruth_metrics_incremental": (
+            compute_crowdtruth_metrics_incremental_pipeline
+        ),
+        "selection": selection_pipeline,
+        "selection_sweep": selection_sweep_pipeline,
+        "analysis": analysis_pipeline,
+        "judgment_facts": judgment_facts_pipeline,
+    }
 
     return pipelines
@@ -2,50 +2,72 @@ from typing import Dict
 
 import numpy as np
 import pandas as pd
-import plotly.figure_factory as ff
 from plotly.graph_objects import Figure
 
-from .config_plotly import DIR_IMAGES
+
+def label_count_matrix(df_judgment_facts: pd.DataFrame) -> pd.DataFrame:
+    """
+    Count the judgments per answer of every unit.
+
+    The unit and answer codes of every judgment are combined into a single
+    integer, so all counts are accumulated by one `np.bincount` into a dense
+    unit x label matrix.
+
+    Args:
+        df_judgment_facts: DataFrame containing the judgment facts.
+            Must contain categorical columns 'unit' and 'answer', and a
+            'relation' column.
+
+    Returns:
+        pd.DataFrame: Number of judgments per unit (rows, only units with a
+            relation) and answer (columns, only answers that were given).
+            Labels nobody picked are left out, as an all-zero column has no
+            correlation with the others.
+    """
+    # Judgments of units without relation are left out, like by a groupby
+    df = df_judgment_facts[df_judgment_facts["relation"].notna()]
+    units = df["unit"].cat.categories
+    labels = df["answer"].cat.categories
+
+    unit_codes = df["unit"].cat.codes.to_numpy(dtype=np.int64)
+    answer_codes = df["answer"].cat.codes.to_numpy(dtype=np.int64)
+    counts = np.bincount(
+        unit_codes * len(labels) + answer_codes, minlength=len(units) * len(labels)
+    ).reshape(len(units), len(labels))
+
+    observed_units = counts.sum(axis=1) > 0
+    observed_labels = counts.sum(axis=0) > 0
+    return pd.DataFrame(
+        counts[np.ix_(observed_units, observed_labels)],
+        index=pd.Index(units[observed_units], name="unit"),
+        columns=pd.Index(labels[observed_labels], name="answer"),
+    )
 
 
-def heatmap_correlation_labels(
-    df_crowdtruth_judgments: pd.DataFrame, df_crowdtruth_units: pd.DataFrame
-) -> Figure:
+def heatmap_correlation_labels(df_judgment_facts: pd.DataFrame) -> Figure:
     """
     Create a heatmap of pairwise Pearson correlation coefficients between answers.
-    The heatmap is based on the output.answer_value of the crowdtruth_judgments
-    DataFrame.
+    The heatmap is based on the number of judgments per answer of every unit.
 
     Args:
-        df_crowdtruth_judgments: DataFrame containing crowdtruth judgments.
-            Must contain columns 'unit', 'output.answer_value', and 'relation'.
-        df_crowdtruth_units: DataFrame containing crowdtruth units.
-            Must contain a 'relation' column.
+        df_judgment_facts: DataFrame containing the judgment facts.
+            Must contain columns 'unit', 'relation' and 'answer'.
 
     Returns:
         ff._figure.Figure: A Plotly figure object containing the heatmap.
     """
-    # Merge the crowdtruth judgments with the units to get the relation
-    df_crowdtruth_judgments = df_crowdtruth_judgments.merge(
-        df_crowdtruth_units[["relation"]].reset_index(), on="unit", how="left"
-    )
+    import plotly.figure_factory as ff
 
-    # Group by unit and relation, count the occurrences of each answer value
-    df = (
-        df_crowdtruth_judgments.groupby(["unit", "relation"])["output.answer_value"]
-        .value_counts()
-        .to_frame("answer_count")
-    )
-    df = df.pivot_table("answer_count", "unit", "output.answer_value").fillna(0)
+    # Count the occurrences of each answer value per unit
+    df = label_count_matrix(df_judgment_facts)
 
     # Get correlation matrix
     df_corr = df.corr()
-    df_lt = df.corr().where(np.tril(np.ones(df.corr().shape)).astype(np.bool))
 
     # Create heatmap
     z = df_corr.values.tolist()
     z_text = np.around(z, decimals=2)  # Only show rounded value (full value on hover)
-    labels = df_lt.columns.tolist()
+    labels = df_corr.columns.tolist()
 
     fig = ff.create_annotated_heatmap(
         z,
@@ -78,34 +100,20 @@ def heatmap_correlation_labels(
     return fig
 
 
-def analyse_annotations(
-    df_crowdtruth_judgments: pd.DataFrame, df_crowdtruth_units: pd.DataFrame
-) -> Dict[str, Figure]:
+def analyse_annotations(df_judgment_facts: pd.DataFrame) -> Dict[str, Figure]:
     """
     Analyse annotations by creating a heatmap of pairwise Pearson correlation
     coefficients.
 
     Args:
-        df_crowdtruth_judgments: DataFrame containing crowdtruth judgments.
-            Must contain columns 'unit', 'output.answer_value', and 'relation'.
-        df_crowdtruth_units: DataFrame containing crowdtruth units.
-            Must contain a 'relation' column.
+        df_judgment_facts: DataFrame containing the judgment facts.
+            Must contain columns 'unit', 'relation' and 'answer'.
 
     Returns:
         ff._figure.Figure: A Plotly figure object containing the heatmap.
     """
     figs_annotations = {
-        "heatmap_correlation_labels": heatmap_correlation_labels(
-            df_crowdtruth_judgments, df_crowdtruth_units
-        )
+        "heatmap_correlation_labels": heatmap_correlation_labels(df_judgment_facts)
     }
 
-    for key, fig in figs_annotations.items():
-        # Save the figure as an image
-        fig.write_image(
-            f"{DIR_IMAGES}/annotations_{key}.png",
-            width=800,
-            height=600,
-        )
-
     return figs_annotations
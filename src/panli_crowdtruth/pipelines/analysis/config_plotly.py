@@ -1,6 +1,6 @@
-import plotly.express as px
+from plotly.colors import qualitative
 
-PLOTLY_COLORS = px.colors.qualitative.T10
+PLOTLY_COLORS = qualitative.T10
 DIR_IMAGES = "data/04_images"
 
 CATEGORY_ORDERS = {
@@ -0,0 +1,70 @@
+import numpy as np
+import pandas as pd
+
+from panli_crowdtruth.pipelines.analysis.units import annotation_score_matrix
+
+UNIT_FACTS = {
+    "relation": "relation",
+    "input.batch_id": "batch_id",
+    "dominant_answer": "dominant_answer",
+}
+
+
+def build_judgment_facts(
+    df_crowdtruth_judgments: pd.DataFrame,
+    df_crowdtruth_units: pd.DataFrame,
+    df_crowdtruth_workers: pd.DataFrame,
+) -> pd.DataFrame:
+    """
+    Build the judgment facts: one row per judgment with the attributes of its
+    unit and worker that the analyses and the selection need. The units and
+    workers are joined once here, instead of in every node.
+
+    The unit, worker and label columns are categorical, with the units and
+    workers in the order of their tables. The judgment index keeps its strings.
+
+    Args:
+        df_crowdtruth_judgments: DataFrame containing crowdtruth judgments.
+            Must contain 'unit', 'worker' and 'output.answer_value' columns.
+        df_crowdtruth_units: DataFrame containing crowdtruth units, preprocessed
+            with `preprocess_units`. Must contain 'relation', 'input.batch_id'
+            and 'dominant_answer' columns.
+        df_crowdtruth_workers: DataFrame containing crowdtruth workers.
+            Must contain a 'wqs' column.
+
+    Returns:
+        pd.DataFrame: Judgment facts indexed by judgment, with the columns
+            'unit', 'worker', 'answer', 'relation', 'batch_id',
+            'dominant_answer' and 'wqs'.
+    """
+    # The answer of a judgment is the label it picked
+    scores, _, labels = annotation_score_matrix(
+        df_crowdtruth_judgments["output.answer_value"]
+    )
+    answer = pd.Categorical.from_codes(np.argmax(scores, axis=1), categories=labels)
+
+    units = df_crowdtruth_units[list(UNIT_FACTS)].rename(columns=UNIT_FACTS)
+    units = units.reindex(df_crowdtruth_judgments["unit"])
+    workers = df_crowdtruth_workers["wqs"].reindex(df_crowdtruth_judgments["worker"])
+
+    df_facts = pd.DataFrame(
+        {
+            "unit": pd.Categorical(
+                df_crowdtruth_judgments["unit"], categories=df_crowdtruth_units.index
+            ),
+            "worker": pd.Categorical(
+                df_crowdtruth_judgments["worker"],
+                categories=df_crowdtruth_workers.index,
+            ),
+            "answer": answer,
+            "relation": pd.Categorical(units["relation"]),
+            "batch_id": units["batch_id"].to_numpy(),
+            "dominant_answer": pd.Categorical(
+                units["dominant_answer"], categories=labels
+            ),
+            "wqs": workers.to_numpy(),
+        },
+        index=df_crowdtruth_judgments.index,
+    )
+
+    return df_facts
@@ -0,0 +1,192 @@
+"""Content-addressed cache of exported figures.
+
+Artifacts are stored under ``<dir_images>/.cache/<key>.<format>``, where the
+key is a hash of the figure spec (``fig.to_json()``) and the export
+parameters. A JSON manifest keeps track of the size and last use of every
+artifact, so the cache can be evicted by age and by total size.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import shutil
+import time
+from typing import Any, Callable, Dict
+
+logger = logging.getLogger(__name__)
+
+CACHE_DIR = ".cache"
+MANIFEST_FILE = "manifest.json"
+
+
+def figure_key(fig_json: str, fmt: str, width: int = None, height: int = None) -> str:
+    """Returns the cache key of a figure exported with the given parameters."""
+    digest = hashlib.sha256(fig_json.encode("utf-8"))
+    digest.update(f"|{fmt}|{width}|{height}".encode("utf-8"))
+    return digest.hexdigest()
+
+
+class FigureCache:
+    """Cache of exported figures, keyed on their spec and export parameters.
+
+    Example:
+
+    .. code-block:: python
+
+        cache = FigureCache("data/04_images", max_size_mb=500)
+        key = figure_key(fig.to_json(), "png", 800, 600)
+        if not cache.restore(key, path):
+            fig.write_image(path, width=800, height=600)
+            cache.add(key, path)
+        cache.evict()
+        cache.save()
+    """
+
+    def __init__(
+        self,
+        dir_images: str,
+        max_age_days: float = None,
+        max_size_mb: float = None,
+    ):
+        """Creates a new instance of ``FigureCache``.
+
+        Args:
+            dir_images: Directory with the images; the cache lives in its
+                ``.cache`` subdirectory.
+            max_age_days: Artifacts not used for longer than this are evicted.
+            max_size_mb: Least recently used artifacts are evicted until the
+                cache is at most this size.
+        """
+        self._dir = os.path.join(dir_images, CACHE_DIR)
+        self._manifest_path = os.path.join(self._dir, MANIFEST_FILE)
+        self._max_age_days = max_age_days
+        self._max_size_mb = max_size_mb
+
+        os.makedirs(self._dir, exist_ok=True)
+        self._entries = self._load_manifest()
+
+    def _load_manifest(self) -> Dict[str, Dict[str, Any]]:
+        if not os.path.exists(self._manifest_path):
+            return {}
+        try:
+            with open(self._manifest_path, encoding="utf-8") as f:
+                entries = json.load(f)
+        except (OSError, ValueError):
+            logger.warning(f"Ignoring unreadable figure cache manifest in {self._dir}")
+            return {}
+
+        # Drop entries whose artifact was removed from disk
+        return {
+            key: entry
+            for key, entry in entries.items()
+            if os.path.exists(os.path.join(self._dir, entry["file"]))
+        }
+
+    def _artifact_path(self, key: str) -> str:
+        return os.path.join(self._dir, self._entries[key]["file"])
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._entries
+
+    def restore(self, key: str, path: str) -> bool:
+        """Copies a cached artifact to ``path``.
+
+        The copy is skipped if ``path`` already holds the artifact.
+
+        Args:
+            key: Cache key of the figure.
+            path: Output path of the figure.
+
+        Returns:
+            Whether the artifact was in the cache.
+        """
+        if key not in self._entries:
+            return False
+
+        entry = self._entries[key]
+        entry["last_used"] = time.time()
+        if not (
+            os.path.exists(path)
+            and os.path.getsize(path) == entry["size"]
+            and entry.get("path") == path
+        ):
+            shutil.copyfile(self._artifact_path(key), path)
+            entry["path"] = path
+        return True
+
+    def add(self, key: str, path: str) -> None:
+        """Stores the artifact that was just written to ``path``.
+
+        Args:
+            key: Cache key of the figure.
+            path: Output path of the figure.
+        """
+        file = key + os.path.splitext(path)[1]
+        shutil.copyfile(path, os.path.join(self._dir, file))
+        self._entries[key] = {
+            "file": file,
+            "path": path,
+            "size": os.path.getsize(path),
+            "last_used": time.time(),
+        }
+
+    def write(self, key: str, path: str, export: Callable[[str], None]) -> bool:
+        """Restores a figure from the cache, or exports and stores it.
+
+        Args:
+            key: Cache key of the figure.
+            path: Output path of the figure.
+            export: Function that exports the figure to a path.
+
+        Returns:
+            Whether the figure was restored from the cache.
+        """
+        if self.restore(key, path):
+            return True
+        export(path)
+        self.add(key, path)
+        return False
+
+    def evict(self) -> int:
+        """Removes artifacts that are too old, then the least recently used
+        ones until the cache fits in its maximum size.
+
+        Returns:
+            Number of evicted artifacts.
+        """
+        now = time.time()
+        by_last_use = sorted(self._entries, key=lambda k: self._entries[k]["last_used"])
+
+        evicted = []
+        if self._max_age_days is not None:
+            max_age = self._max_age_days * 24 * 3600
+            evicted = [
+                key
+                for key in by_last_use
+                if now - self._entries[key]["last_used"] > max_age
+            ]
+
+        if self._max_size_mb is not None:
+            remaining = [key for key in by_last_use if key not in evicted]
+            size = sum(self._entries[key]["size"] for key in remaining)
+            for key in remaining:
+                if size <= self._max_size_mb * 1024**2:
+                    break
+                size -= self._entries[key]["size"]
+                evicted.append(key)
+
+        for key in evicted:
+            os.remove(self._artifact_path(key))
+            del self._entries[key]
+
+        if evicted:
+            logger.info(f"Evicted {len(evicted)} figures from the figure cache")
+        return len(evicted)
+
+    def save(self) -> None:
+        """Writes the manifest to disk."""
+        tmp_path = self._manifest_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._entries, f, indent=2)
+        os.replace(tmp_path, self._manifest_path)
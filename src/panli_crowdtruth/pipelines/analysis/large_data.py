@@ -0,0 +1,333 @@
+"""Figures of large unit and worker tables, drawn from summaries.
+
+Plotly Express embeds every row in the figure, so the size of the exported
+figures and their render time grow with the data. For tables of at least
+``threshold`` rows, the analyses switch to figures of the same shape that
+only embed summaries: histogram bin counts, box plot quantiles and violin
+densities computed here with NumPy, and a stratified sample of at most
+``max_points`` points per scatter plot, drawn with WebGL.
+"""
+
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+from plotly.graph_objects import Figure
+
+DEFAULT_SETTINGS = {
+    "large_data": "auto",
+    "threshold": 50_000,
+    "n_bins": 50,
+    "max_points": 5_000,
+    "seed": 0,
+}
+
+# Tukey's fences of the box plots, like Plotly
+WHISKER_IQR = 1.5
+
+
+def plotting_settings(plotting: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Completes the plotting parameters with ``DEFAULT_SETTINGS``."""
+    settings = {**DEFAULT_SETTINGS, **(plotting or {})}
+    if settings["large_data"] not in ("auto", True, False):
+        raise ValueError(
+            f"large_data must be 'auto', true or false: {settings['large_data']}"
+        )
+    return settings
+
+
+def use_large_data(n_rows: int, plotting: Optional[Dict[str, Any]] = None) -> bool:
+    """Whether a table of `n_rows` rows is plotted from summaries.
+
+    Args:
+        n_rows: Number of rows of the table.
+        plotting: Plotting parameters (see ``DEFAULT_SETTINGS``). With
+            ``large_data: auto``, tables of at least ``threshold`` rows are.
+
+    Returns:
+        True for large-data figures.
+    """
+    settings = plotting_settings(plotting)
+    if settings["large_data"] == "auto":
+        return n_rows >= settings["threshold"]
+    return settings["large_data"]
+
+
+def box_statistics(df: pd.DataFrame, value: str, by: List[str]) -> pd.DataFrame:
+    """Computes the statistics of a box plot of `value` for every group.
+
+    Args:
+        df: DataFrame with the columns `value` and `by`.
+        value: Name of the column to summarize.
+        by: Names of the columns to group by, none for a single box.
+
+    Returns:
+        pd.DataFrame: Per group (in the index) the number of values, mean,
+            quartiles and the fences: the most extreme values within 1.5 IQR
+            of the quartiles.
+    """
+    df = df.dropna(subset=[value, *by])
+    keys = [df[col] for col in by] or [np.zeros(len(df), dtype=int)]
+    grouped = df[value].groupby(keys, observed=True, sort=True)
+
+    stats = grouped.quantile([0.25, 0.5, 0.75]).unstack()
+    stats.columns = ["q1", "median", "q3"]
+    stats.insert(0, "n", grouped.count())
+    stats.insert(1, "mean", grouped.mean())
+
+    # Fences from the quartiles of the group of every value
+    codes = grouped.ngroup().to_numpy()
+    iqr = (stats["q3"] - stats["q1"]).to_numpy()
+    low = stats["q1"].to_numpy() - WHISKER_IQR * iqr
+    high = stats["q3"].to_numpy() + WHISKER_IQR * iqr
+    values = df[value].to_numpy(dtype=float)
+    inside = (values >= low[codes]) & (values <= high[codes])
+    stats["lowerfence"] = pd.Series(values).where(inside).groupby(codes).min().values
+    stats["upperfence"] = pd.Series(values).where(inside).groupby(codes).max().values
+
+    return stats
+
+
+def density(values: np.ndarray, edges: np.ndarray) -> np.ndarray:
+    """Estimates the density of `values` at the centers of the bins `edges`.
+
+    The histogram of the values is smoothed with a Gaussian kernel, whose
+    bandwidth follows Silverman's rule of thumb like Plotly's violins.
+
+    Args:
+        values: Values without NaNs.
+        edges: Edges of equally wide bins.
+
+    Returns:
+        Density of every bin.
+    """
+    counts, _ = np.histogram(values, bins=edges)
+    width = edges[1] - edges[0]
+    bandwidth = 1.06 * np.std(values) * max(len(values), 1) ** -0.2
+    sigma = bandwidth / width if width > 0 else 0
+    if sigma > 0:
+        offsets = np.arange(-np.ceil(3 * sigma), np.ceil(3 * sigma) + 1)
+        kernel = np.exp(-0.5 * (offsets / sigma) ** 2)
+        counts = np.convolve(counts, kernel / kernel.sum(), mode="same")
+    return counts / max(counts.sum() * width, np.finfo(float).tiny)
+
+
+def stratified_sample(
+    df: pd.DataFrame, by: str, max_points: int, seed: int = 0
+) -> pd.DataFrame:
+    """Samples at most `max_points` rows, proportionally from every group, and
+    at least one row of every group.
+
+    Args:
+        df: DataFrame to sample.
+        by: Name of the column with the groups.
+        max_points: Maximum number of rows (plus one per small group).
+        seed: Seed of the sample.
+
+    Returns:
+        pd.DataFrame: The sampled rows in their original order, or `df` if it
+            has at most `max_points` rows.
+    """
+    if len(df) <= max_points:
+        return df
+
+    rng = np.random.default_rng(seed)
+    groups = df[by].astype(object).fillna("")
+    size = groups.map(groups.value_counts())
+    quota = np.maximum(np.floor(size * max_points / len(df)), 1)
+    rank = pd.Series(rng.random(len(df)), index=df.index).groupby(groups).rank()
+    return df[(rank <= quota).to_numpy()]
+
+
+def summary_histogram(values: pd.Series, n_bins: int, color: str) -> Figure:
+    """Draws a histogram with a marginal box plot from bin counts and quartiles,
+    like ``px.histogram(marginal="box")``.
+
+    Args:
+        values: Values to plot.
+        n_bins: Number of bins.
+        color: Color of the bars and the box.
+
+    Returns:
+        Plotly figure with the histogram.
+    """
+    values = values.dropna().astype(float)
+    counts, edges = np.histogram(values.to_numpy(), bins=n_bins)
+    stats = box_statistics(values.to_frame("value"), "value", []).iloc[0]
+
+    fig = Figure()
+    fig.add_bar(
+        x=(edges[:-1] + edges[1:]) / 2,
+        y=counts,
+        width=np.diff(edges),
+        marker_color=color,
+        showlegend=False,
+    )
+    fig.add_box(
+        q1=[stats["q1"]],
+        median=[stats["median"]],
+        q3=[stats["q3"]],
+        lowerfence=[stats["lowerfence"]],
+        upperfence=[stats["upperfence"]],
+        mean=[stats["mean"]],
+        y=[0],
+        orientation="h",
+        marker_color=color,
+        showlegend=False,
+        yaxis="y2",
+    )
+    fig.update_layout(
+        bargap=0,
+        yaxis=dict(domain=[0, 0.7326]),
+        yaxis2=dict(domain=[0.7426, 1], anchor="x", showticklabels=False),
+    )
+    return fig
+
+
+def ordered_values(
+    values: pd.Series, category_orders: Dict[str, List[Any]]
+) -> List[Any]:
+    """The distinct values of a column, in the order of `category_orders` and
+    then as strings."""
+    present = set(values.dropna().unique())
+    order = [
+        value for value in category_orders.get(values.name, []) if value in present
+    ]
+    return order + sorted(present - set(order), key=str)
+
+
+def summary_violin(
+    df: pd.DataFrame,
+    value: str,
+    color: str,
+    n_bins: int,
+    colors: List[str],
+    category_orders: Dict[str, List[Any]],
+) -> Figure:
+    """Draws horizontal violins with inner boxes from densities and quartiles,
+    like ``px.violin(x=value, color=color, orientation="h", box=True)``.
+
+    Args:
+        df: DataFrame with the columns `value` and `color`.
+        value: Name of the column to plot.
+        color: Name of the column with a violin per value.
+        n_bins: Number of points of the density outlines.
+        colors: Colors of the violins.
+        category_orders: Order of the violins.
+
+    Returns:
+        Plotly figure with the violins.
+    """
+    df = df.dropna(subset=[value, color])
+    values = df[value].to_numpy(dtype=float)
+    low, high = values.min(), values.max()
+    edges = np.linspace(low, high if high > low else low + 1, n_bins + 1)
+    centers = (edges[:-1] + edges[1:]) / 2
+    stats = box_statistics(df, value, [color])
+
+    fig = Figure()
+    for position, group in enumerate(ordered_values(df[color], category_orders)):
+        outline = density(values[(df[color] == group).to_numpy()], edges)
+        outline = 0.4 * outline / max(outline.max(), np.finfo(float).tiny)
+        group_stats = stats.loc[group]
+        trace_color = colors[position % len(colors)]
+        fig.add_scatter(
+            x=np.concatenate([centers, centers[::-1]]),
+            y=np.concatenate([position + outline, (position - outline)[::-1]]),
+            fill="toself",
+            mode="lines",
+            line_color=trace_color,
+            name=str(group),
+            legendgroup=str(group),
+            hoverinfo="skip",
+        )
+        fig.add_box(
+            q1=[group_stats["q1"]],
+            median=[group_stats["median"]],
+            q3=[group_stats["q3"]],
+            lowerfence=[group_stats["lowerfence"]],
+            upperfence=[group_stats["upperfence"]],
+            mean=[group_stats["mean"]],
+            y=[position],
+            orientation="h",
+            width=0.1,
+            marker_color=trace_color,
+            name=str(group),
+            legendgroup=str(group),
+            showlegend=False,
+        )
+    fig.update_xaxes(title_text=value)
+    fig.update_yaxes(showticklabels=False, zeroline=False)
+    return fig
+
+
+def summary_box(
+    df: pd.DataFrame,
+    x: str,
+    y: str,
+    color: str,
+    facet_col: str,
+    facet_row: str,
+    colors: List[str],
+    category_orders: Dict[str, List[Any]],
+) -> Figure:
+    """Draws faceted, grouped box plots from quartiles, like
+    ``px.box(x=x, y=y, color=color, facet_col=facet_col, facet_row=facet_row)``.
+
+    Args:
+        df: DataFrame with the columns `x`, `y`, `color`, `facet_col` and
+            `facet_row`.
+        x: Name of the column with the boxes of a group.
+        y: Name of the column to plot.
+        color: Name of the column with the groups of boxes.
+        facet_col: Name of the column with the facet columns.
+        facet_row: Name of the column with the facet rows.
+        colors: Colors of the groups.
+        category_orders: Order of the boxes, groups and facets.
+
+    Returns:
+        Plotly figure with the box plots.
+    """
+    from plotly.subplots import make_subplots
+
+    df = df.dropna(subset=[y])
+    rows = ordered_values(df[facet_row], category_orders)
+    cols = ordered_values(df[facet_col], category_orders)
+    groups = ordered_values(df[color], category_orders)
+    stats = box_statistics(df, y, [facet_row, facet_col, color, x])
+
+    fig = make_subplots(
+        rows=len(rows),
+        cols=len(cols),
+        shared_xaxes=True,
+        shared_yaxes=True,
+        row_titles=[str(row) for row in rows],
+        column_titles=[str(col) for col in cols],
+        horizontal_spacing=0.02,
+        vertical_spacing=0.03,
+    )
+    in_legend = set()
+    for (row, col, group), group_stats in stats.groupby(level=[0, 1, 2]):
+        fig.add_box(
+            x=group_stats.index.get_level_values(3),
+            q1=group_stats["q1"],
+            median=group_stats["median"],
+            q3=group_stats["q3"],
+            lowerfence=group_stats["lowerfence"],
+            upperfence=group_stats["upperfence"],
+            mean=group_stats["mean"],
+            name=str(group),
+            legendgroup=str(group),
+            offsetgroup=str(group),
+            showlegend=group not in in_legend,
+            marker_color=colors[groups.index(group) % len(colors)],
+            row=rows.index(row) + 1,
+            col=cols.index(col) + 1,
+        )
+        in_legend.add(group)
+    fig.update_layout(boxmode="group")
+    fig.update_xaxes(
+        categoryorder="array", categoryarray=category_orders.get(x, []), title_text=""
+    )
+    fig.update_yaxes(title_text=y, col=1)
+    return fig
@@ -1,13 +1,43 @@
 from kedro.pipeline import Pipeline, node, pipeline
 
 from .annotations import analyse_annotations
-from .units import analyse_units
+from .facts import build_judgment_facts
+from .rendering import render_analysis_images
+from .units import (
+    analyse_units,
+    analyse_uqs_per_type,
+    preprocess_units,
+    regress_uqs_on_similarity,
+)
 from .workers_demographics import analyse_demographics
 from .workers_performance import analyse_performance
 
 
-def create_pipeline(**kwargs) -> Pipeline:
+def create_facts_pipeline(**kwargs) -> Pipeline:
     return pipeline(
+        [
+            node(
+                name="preprocess_units",
+                func=preprocess_units,
+                inputs="crowdtruth_units",
+                outputs="crowdtruth_units_preprocessed@columnar",
+            ),
+            node(
+                name="build_judgment_facts",
+                func=build_judgment_facts,
+                inputs={
+                    "df_crowdtruth_judgments": "crowdtruth_judgments",
+                    "df_crowdtruth_units": "crowdtruth_units_preprocessed@facts",
+                    "df_crowdtruth_workers": "crowdtruth_workers",
+                },
+                outputs="judgment_facts",
+            ),
+        ]
+    )
+
+
+def create_pipeline(**kwargs) -> Pipeline:
+    return create_facts_pipeline() + pipeline(
         [
             node(
                 name="analyse_demographics",
@@ -20,26 +50,56 @@ def create_pipeline(**kwargs) -> Pipeline:
                 func=analyse_performance,
                 inputs={
                     "df_prolific_workers": "prolific_workers_final",
-                    "df_crowdtruth_judgments": "crowdtruth_judgments",
+                    "df_judgment_facts": "judgment_facts",
                     "df_crowdtruth_workers": "crowdtruth_workers",
-                    "df_crowdtruth_units": "crowdtruth_units",
+                    "plotting": "params:plotting",
                 },
                 outputs="images_performance",
             ),
             node(
                 name="analyse_annotations",
                 func=analyse_annotations,
-                inputs={
-                    "df_crowdtruth_judgments": "crowdtruth_judgments",
-                    "df_crowdtruth_units": "crowdtruth_units",
-                },
+                inputs="judgment_facts",
                 outputs="images_annotations",
             ),
             node(
                 name="analyse_units",
                 func=analyse_units,
-                inputs="crowdtruth_units",
+                inputs={
+                    "df_crowdtruth_units": "crowdtruth_units_preprocessed@columnar",
+                    "plotting": "params:plotting",
+                },
                 outputs="images_units",
             ),
+            node(
+                name="regress_uqs_on_similarity",
+                func=regress_uqs_on_similarity,
+                inputs="crowdtruth_units_preprocessed@columnar",
+                outputs="uqs_similarity_trendlines",
+            ),
+            node(
+                name="analyse_uqs_per_type",
+                func=analyse_uqs_per_type,
+                inputs={
+                    "df_crowdtruth_units": "crowdtruth_units_preprocessed@uqs_relation",
+                    "plotting": "params:plotting",
+                },
+                outputs="images_uqs_per_type",
+            ),
+            node(
+                name="render_analysis_images",
+                func=render_analysis_images,
+                inputs={
+                    "n_workers": "params:n_render_workers",
+                    "figure_cache": "params:figure_cache",
+                    "image_formats": "params:image_formats",
+                    "images_demographics": "images_demographics",
+                    "images_performance": "images_performance",
+                    "images_annotations": "images_annotations",
+                    "images_units": "images_units",
+                    "images_uqs_per_type": "images_uqs_per_type",
+                },
+                outputs="image_render_times",
+            ),
         ]
     )
@@ -0,0 +1,159 @@
+"""Long-lived export session for the figures of the analysis pipeline.
+
+Starting kaleido launches a headless Chromium and loads plotly.js into it,
+which takes far longer than rendering a figure. ``RenderService`` starts one
+session, warms it up with an empty figure, and then renders every job of a
+batch in it, so the startup is paid once instead of per figure or per
+process. The startup and the time of every job are reported separately.
+
+HTML exports do not need kaleido. Instead of embedding plotly.js (about
+4.6 MB) in every file, they load a single ``plotly.min.js`` from their
+directory (see ``write_plotlyjs``).
+
+Example:
+
+.. code-block:: python
+
+    with RenderService() as service:
+        render_times = service.render(
+            [RenderJob(fig.to_json(), "png", 800, 600, "data/04_images/a.png")]
+        )
+    print(service.startup_seconds, render_times["seconds"].sum())
+"""
+
+import json
+import logging
+import os
+import shutil
+import time
+from typing import Iterable, NamedTuple
+
+import pandas as pd
+import plotly
+import plotly.io as pio
+
+logger = logging.getLogger(__name__)
+
+# The plotly.js bundled with plotly, so kaleido does not need the network
+PLOTLYJS = os.path.join(
+    os.path.dirname(plotly.__file__), "package_data", "plotly.min.js"
+)
+KALEIDO_FORMATS = ("png", "jpg", "jpeg", "webp", "svg", "pdf")
+HTML_FORMAT = "html"
+
+
+def write_plotlyjs(directory: str) -> str:
+    """Copies the plotly.js bundle that the HTML exports load into their
+    directory, unless it is there already.
+
+    Args:
+        directory: Directory of the HTML exports.
+
+    Returns:
+        Path of the bundle.
+    """
+    path = os.path.join(directory, os.path.basename(PLOTLYJS))
+    if not os.path.exists(path):
+        shutil.copyfile(PLOTLYJS, path)
+    return path
+
+
+class RenderJob(NamedTuple):
+    """A figure to export: its spec (``fig.to_json()``), the format, the size
+    in pixels and the output path."""
+
+    fig_json: str
+    fmt: str
+    width: int
+    height: int
+    path: str
+
+
+class RenderService:
+    """One kaleido session that renders batches of figures."""
+
+    def __init__(self, plotlyjs: str = PLOTLYJS):
+        """Creates a new instance of ``RenderService``; the session starts with
+        ``start`` or the first batch.
+
+        Args:
+            plotlyjs: Path of the plotly.js bundle to load into kaleido.
+        """
+        self._plotlyjs = plotlyjs
+        self._scope = None
+        self.startup_seconds = 0.0
+
+    def start(self) -> float:
+        """Starts the session and renders an empty figure, so that Chromium
+        and plotly.js are loaded.
+
+        Returns:
+            The startup time in seconds.
+        """
+        if self._scope is not None:
+            return self.startup_seconds
+
+        from kaleido.scopes.plotly import PlotlyScope
+
+        start = time.perf_counter()
+        self._scope = PlotlyScope(plotlyjs=self._plotlyjs, mathjax=False)
+        self._scope.transform(
+            {"data": [], "layout": {}}, format="png", width=100, height=100
+        )
+        self.startup_seconds = time.perf_counter() - start
+        logger.info(f"Started the kaleido session in {self.startup_seconds:.2f}s")
+        return self.startup_seconds
+
+    def render(self, jobs: Iterable[RenderJob]) -> pd.DataFrame:
+        """Exports a batch of figures.
+
+        Args:
+            jobs: Figures to export. Image formats are rendered by kaleido, and
+                ``html`` is written directly.
+
+        Returns:
+            DataFrame with the path, format and render time (in seconds,
+            without the startup) of every job.
+        """
+        records = []
+        for job in jobs:
+            os.makedirs(os.path.dirname(job.path) or ".", exist_ok=True)
+            if job.fmt in KALEIDO_FORMATS:
+                self.start()
+            start = time.perf_counter()
+            if job.fmt == HTML_FORMAT:
+                write_plotlyjs(os.path.dirname(job.path) or ".")
+                pio.write_html(
+                    pio.from_json(job.fig_json), job.path, include_plotlyjs="directory"
+                )
+            elif job.fmt in KALEIDO_FORMATS:
+                image = self._scope.transform(
+                    json.loads(job.fig_json),
+                    format=job.fmt,
+                    width=job.width,
+                    height=job.height,
+                )
+                with open(job.path, "wb") as f:
+                    f.write(image)
+            else:
+                raise ValueError(f"Unsupported figure format: {job.fmt}")
+            records.append(
+                {
+                    "path": job.path,
+                    "format": job.fmt,
+                    "seconds": time.perf_counter() - start,
+                }
+            )
+        return pd.DataFrame(records, columns=["path", "format", "seconds"])
+
+    def close(self) -> None:
+        """Stops the session."""
+        if self._scope is not None:
+            self._scope._shutdown_kaleido()
+            self._scope = None
+
+    def __enter__(self) -> "RenderService":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
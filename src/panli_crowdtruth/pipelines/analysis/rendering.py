@@ -0,0 +1,215 @@
+"""Shared rendering stage for the figures of the analysis pipeline.
+
+Every export is a blocking kaleido call. The analysis nodes therefore only
+create their figures, and ``render_analysis_images`` exports all of them at
+once in a single kaleido session (see ``RenderService``), or in one session
+per worker process. Figures that are unchanged since a previous run are
+restored from the figure cache.
+"""
+
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Iterable, List, Tuple
+
+import pandas as pd
+from plotly.graph_objects import Figure
+
+from panli_crowdtruth.pipelines.analysis.config_plotly import DIR_IMAGES
+from panli_crowdtruth.pipelines.analysis.figure_cache import FigureCache, figure_key
+from panli_crowdtruth.pipelines.analysis.render_service import (
+    HTML_FORMAT,
+    RenderJob,
+    RenderService,
+    write_plotlyjs,
+)
+
+logger = logging.getLogger(__name__)
+
+IMAGE_WIDTH = 800
+IMAGE_HEIGHT = 600
+IMAGE_FORMATS = ("png",)
+
+# Prefix of the image files of every analysis node
+IMAGE_PREFIXES = {
+    "images_demographics": "workers_demographics",
+    "images_performance": "workers_performance",
+    "images_annotations": "annotations",
+    "images_units": "units",
+    "images_uqs_per_type": "units",
+}
+
+
+def image_path(dir_images: str, name: str, fmt: str) -> str:
+    """Path of an exported figure: PNG images in `dir_images`, other formats
+    in a subdirectory per format."""
+    if fmt == "png":
+        return os.path.join(dir_images, f"{name}.png")
+    return os.path.join(dir_images, fmt, f"{name}.{fmt}")
+
+
+def _render_batch(jobs: List[RenderJob]) -> Tuple[float, pd.DataFrame]:
+    """Exports a batch of figures in its own session; runs in a worker
+    process."""
+    with RenderService() as service:
+        render_times = service.render(jobs)
+    return service.startup_seconds, render_times
+
+
+def render_figures(
+    figures: Dict[str, Figure],
+    dir_images: str = DIR_IMAGES,
+    n_workers: int = 1,
+    width: int = IMAGE_WIDTH,
+    height: int = IMAGE_HEIGHT,
+    cache: FigureCache = None,
+    formats: Iterable[str] = IMAGE_FORMATS,
+    service: RenderService = None,
+) -> pd.DataFrame:
+    """Exports figures in one kaleido session, or in one session per worker
+    process.
+
+    Args:
+        figures: Figures by file name (without extension).
+        dir_images: Directory to write the images to.
+        n_workers: Number of worker processes, at most the number of CPUs.
+            With 1 (the default) the figures are rendered in the current
+            process. Every worker process starts its own kaleido session.
+        width: Width of the images in pixels.
+        height: Height of the images in pixels.
+        cache: Cache of exported figures. Figures found in it are copied
+            instead of rendered.
+        formats: Formats to export every figure to (see ``image_path``).
+        service: Session to render in when there is a single worker, which
+            is then left open. By default a new session is started and
+            stopped.
+
+    Returns:
+        DataFrame with the figure, format, path, render time (in seconds) and
+        cache hit of every export, and a "startup" row with the startup time
+        of every session.
+    """
+    jobs, keys, cached = {}, {}, {}
+    for name, fig in figures.items():
+        fig_json = fig.to_json()
+        for fmt in formats:
+            path = image_path(dir_images, name, fmt)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            keys[name, fmt] = figure_key(fig_json, fmt, width, height)
+            cached[name, fmt] = cache is not None and cache.restore(
+                keys[name, fmt], path
+            )
+            if not cached[name, fmt]:
+                jobs[name, fmt] = RenderJob(fig_json, fmt, width, height, path)
+            elif fmt == HTML_FORMAT:
+                # The cache holds the HTML files, not the plotly.js they load
+                write_plotlyjs(os.path.dirname(path))
+
+    n_workers = max(min(n_workers or 1, os.cpu_count(), len(jobs)), 1)
+
+    start = time.perf_counter()
+    if n_workers == 1:
+        session = service or RenderService()
+        started = session.startup_seconds
+        try:
+            batch_times = session.render(jobs.values())
+        finally:
+            if service is None:
+                session.close()
+        # A session that was already started is not started again
+        results = [(session.startup_seconds - started, batch_times)]
+    else:
+        # Spawn, so that workers do not share a kaleido process with the parent
+        batches = [list(jobs.values())[i::n_workers] for i in range(n_workers)]
+        with ProcessPoolExecutor(
+            max_workers=n_workers, mp_context=multiprocessing.get_context("spawn")
+        ) as executor:
+            results = list(executor.map(_render_batch, batches))
+    total = time.perf_counter() - start
+
+    startups = [startup for startup, _ in results if startup]
+    seconds = pd.concat(
+        [render_times for _, render_times in results], ignore_index=True
+    ).set_index("path")["seconds"]
+    if cache is not None:
+        for key, job in jobs.items():
+            cache.add(keys[key], job.path)
+        cache.evict()
+        cache.save()
+
+    render_times = pd.DataFrame(
+        {
+            "figure": [name for name, _ in cached],
+            "format": [fmt for _, fmt in cached],
+            "path": [image_path(dir_images, name, fmt) for name, fmt in cached],
+            "seconds": [
+                seconds.get(jobs[key].path, 0.0) if key in jobs else 0.0
+                for key in cached
+            ],
+            "cached": list(cached.values()),
+        }
+    )
+    for row in render_times.itertuples():
+        if row.cached:
+            logger.info(f"Restored {row.path} from the figure cache")
+        else:
+            logger.info(f"Rendered {row.path} in {row.seconds:.2f}s")
+    logger.info(
+        f"Rendered {len(jobs)} figures ({len(cached) - len(jobs)} cached) in "
+        f"{total:.2f}s: {sum(startups):.2f}s to start {len(startups)} kaleido "
+        f"session(s) and {seconds.sum():.2f}s to render, with {n_workers} worker(s)"
+    )
+
+    startup_times = pd.DataFrame(
+        {"figure": "startup", "seconds": startups, "cached": False}
+    )
+    return pd.concat([render_times, startup_times], ignore_index=True)
+
+
+def render_analysis_images(
+    n_workers: int = 1,
+    figure_cache: Dict[str, Any] = None,
+    image_formats: List[str] = None,
+    **figures_per_node: Dict[str, Figure],
+) -> pd.DataFrame:
+    """Renders the figures of all analysis nodes as
+    ``{DIR_IMAGES}/<prefix>_<key>.png``, and in ``{DIR_IMAGES}/<format>/``
+    for other formats.
+
+    Args:
+        n_workers: Number of worker processes, each with its own kaleido
+            session.
+        figure_cache: Options of the figure cache: ``enabled``,
+            ``max_age_days`` and ``max_size_mb``. The cache is disabled if
+            not given.
+        image_formats: Formats to export, defaults to ``IMAGE_FORMATS``.
+        **figures_per_node: Figure dictionaries returned by the analysis
+            nodes, by output name (see ``IMAGE_PREFIXES``).
+
+    Returns:
+        DataFrame with the render time of every export and the startup time
+        of every session (see ``render_figures``).
+    """
+    figures = {
+        f"{IMAGE_PREFIXES[output]}_{key}": fig
+        for output, figs in figures_per_node.items()
+        for key, fig in figs.items()
+    }
+
+    figure_cache = figure_cache or {}
+    cache = None
+    if figure_cache.get("enabled", False):
+        cache = FigureCache(
+            DIR_IMAGES,
+            max_age_days=figure_cache.get("max_age_days"),
+            max_size_mb=figure_cache.get("max_size_mb"),
+        )
+
+    return render_figures(
+        figures,
+        n_workers=n_workers,
+        cache=cache,
+        formats=image_formats or IMAGE_FORMATS,
+    )
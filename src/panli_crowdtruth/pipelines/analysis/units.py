@@ -1,34 +1,55 @@
-from typing import Dict
+from itertools import chain
+from typing import Any, Dict, List, Tuple
 
+import numpy as np
 import pandas as pd
-import plotly.express as px
 from plotly.graph_objects import Figure
 
 from panli_crowdtruth.pipelines.analysis.config_plotly import (
     CATEGORY_ORDERS,
-    DIR_IMAGES,
     PLOTLY_COLORS,
 )
+from panli_crowdtruth.pipelines.analysis.large_data import (
+    plotting_settings,
+    stratified_sample,
+    summary_box,
+    summary_histogram,
+    summary_violin,
+    use_large_data,
+)
 
 
-def histogram_overall_uqs(df_crowdtruth_units: pd.DataFrame) -> pd.DataFrame:
+def histogram_overall_uqs(
+    df_crowdtruth_units: pd.DataFrame, plotting: Dict[str, Any] = None
+) -> pd.DataFrame:
     """
     Calculate the overall unit quality score (UQS) for each unit in the DataFrame.
 
     Args:
         df_crowdtruth_units: DataFrame containing crowdtruth units.
             Must contain a 'uqs' column.
+        plotting: Plotting parameters, for the large-data mode (see
+            `large_data.DEFAULT_SETTINGS`).
 
     Returns:
         pd.DataFrame: A DataFrame with the overall UQS for each unit.
     """
+    import plotly.express as px
+
     # Calculate the mean of the unit quality scores
-    fig = px.histogram(
-        df_crowdtruth_units,
-        x="uqs",
-        marginal="box",
-        color_discrete_sequence=PLOTLY_COLORS,
-    )
+    if use_large_data(len(df_crowdtruth_units), plotting):
+        fig = summary_histogram(
+            df_crowdtruth_units["uqs"],
+            plotting_settings(plotting)["n_bins"],
+            PLOTLY_COLORS[0],
+        )
+    else:
+        fig = px.histogram(
+            df_crowdtruth_units,
+            x="uqs",
+            marginal="box",
+            color_discrete_sequence=PLOTLY_COLORS,
+        )
 
     # update layout
     fig.update_layout(
@@ -47,7 +68,9 @@ def histogram_overall_uqs(df_crowdtruth_units: pd.DataFrame) -> pd.DataFrame:
     return fig
 
 
-def violin_uqs_per_type(df_crowdtruth_units: pd.DataFrame) -> px.violin:
+def violin_uqs_per_type(
+    df_crowdtruth_units: pd.DataFrame, plotting: Dict[str, Any] = None
+) -> Figure:
     """
     Create a violin plot to visualize the distribution of unit quality scores (UQS)
     per type (inta-sentence & inter-sentence) in the DataFrame.
@@ -55,21 +78,35 @@ def violin_uqs_per_type(df_crowdtruth_units: pd.DataFrame) -> px.violin:
     Args:
         df_crowdtruth_units: DataFrame containing crowdtruth units.
             Must contain 'uqs' and 'type' columns.
+        plotting: Plotting parameters, for the large-data mode (see
+            `large_data.DEFAULT_SETTINGS`).
 
     Returns:
         px.violin: A Plotly violin plot showing the distribution of UQS per type.
     """
+    import plotly.express as px
+
     # Create a violin plot to visualize the distribution of UQS per type
-    fig = px.violin(
-        df_crowdtruth_units,
-        color="relation",
-        x="uqs",
-        category_orders=CATEGORY_ORDERS,
-        color_discrete_sequence=px.colors.qualitative.T10,
-        labels={"relation": ""},
-        orientation="h",
-        box=True,
-    )
+    if use_large_data(len(df_crowdtruth_units), plotting):
+        fig = summary_violin(
+            df_crowdtruth_units,
+            "uqs",
+            "relation",
+            plotting_settings(plotting)["n_bins"],
+            PLOTLY_COLORS,
+            CATEGORY_ORDERS,
+        )
+    else:
+        fig = px.violin(
+            df_crowdtruth_units,
+            color="relation",
+            x="uqs",
+            category_orders=CATEGORY_ORDERS,
+            color_discrete_sequence=PLOTLY_COLORS,
+            labels={"relation": ""},
+            orientation="h",
+            box=True,
+        )
 
     # Update layout
     fig.update_layout(
@@ -94,7 +131,7 @@ def violin_uqs_per_type(df_crowdtruth_units: pd.DataFrame) -> px.violin:
 
 
 def boxplot_uqs_per_type_and_source(
-    df_crowdtruth_units: pd.DataFrame,
+    df_crowdtruth_units: pd.DataFrame, plotting: Dict[str, Any] = None
 ) -> Figure:
     """
     Create a box plot to visualize the unit quality scores (UQS) faceted by type
@@ -103,10 +140,14 @@ def boxplot_uqs_per_type_and_source(
     Args:
         df_crowdtruth_units: DataFrame containing crowdtruth units.
             Must contain 'uqs', 'relation', and 'source' columns.
+        plotting: Plotting parameters, for the large-data mode (see
+            `large_data.DEFAULT_SETTINGS`).
 
     Returns:
         px.box: A Plotly box plot showing UQS faceted by type and source.
     """
+    import plotly.express as px
+
     units = df_crowdtruth_units.copy()
 
     # Replace 'source' values with more descriptive names
@@ -117,18 +158,30 @@ def boxplot_uqs_per_type_and_source(
 
     # Create a box plot to visualize the unit quality scores (UQS) faceted by
     # type and source
-    fig = px.box(
-        units,
-        x="dominant_answer",
-        y="uqs",
-        color="source_type",
-        color_discrete_sequence=px.colors.qualitative.T10,
-        category_orders=CATEGORY_ORDERS,
-        orientation="v",
-        labels={"dominant_answer": ""},
-        facet_col="relation",
-        facet_row="additional_sources",
-    )
+    if use_large_data(len(units), plotting):
+        fig = summary_box(
+            units,
+            x="dominant_answer",
+            y="uqs",
+            color="source_type",
+            facet_col="relation",
+            facet_row="additional_sources",
+            colors=PLOTLY_COLORS,
+            category_orders=CATEGORY_ORDERS,
+        )
+    else:
+        fig = px.box(
+            units,
+            x="dominant_answer",
+            y="uqs",
+            color="source_type",
+            color_discrete_sequence=PLOTLY_COLORS,
+            category_orders=CATEGORY_ORDERS,
+            orientation="v",
+            labels={"dominant_answer": ""},
+            facet_col="relation",
+            facet_row="additional_sources",
+        )
 
     # Update layout
     fig.update_layout(
@@ -152,34 +205,167 @@ def boxplot_uqs_per_type_and_source(
     return fig
 
 
-def scatter_correlation_uqs_similarity(df_crowdtruth_units: pd.DataFrame) -> px.scatter:
+def grouped_linear_fit(df: pd.DataFrame, x: str, y: str, by: str) -> pd.DataFrame:
+    """
+    Fit a least-squares line of `y` on `x` within every group of `by`.
+
+    All groups are fitted at once from per-group sums (np.bincount) of the
+    centered values, so no model is built per group. Rows with missing values
+    are ignored, like statsmodels OLS does.
+
+    Args:
+        df: DataFrame with the columns `x`, `y` and `by`.
+        x: Name of the explanatory column.
+        y: Name of the response column.
+        by: Name of the column to group by.
+
+    Returns:
+        pd.DataFrame: Per group the number of points, slope, intercept, r²
+            (NaN when `x` or `y` is constant) and the range of `x`.
+    """
+    df = df[[by, x, y]].dropna()
+    codes, groups = pd.factorize(df[by], sort=True)
+    n_groups = len(groups)
+    x_values = df[x].to_numpy(dtype=float)
+    y_values = df[y].to_numpy(dtype=float)
+
+    n = np.bincount(codes, minlength=n_groups)
+    x_mean = np.bincount(codes, x_values, n_groups) / n
+    y_mean = np.bincount(codes, y_values, n_groups) / n
+    dx = x_values - x_mean[codes]
+    dy = y_values - y_mean[codes]
+    sxx = np.bincount(codes, dx * dx, n_groups)
+    sxy = np.bincount(codes, dx * dy, n_groups)
+    syy = np.bincount(codes, dy * dy, n_groups)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        slope = sxy / sxx
+        r_squared = sxy**2 / (sxx * syy)
+
+    x_min = np.full(n_groups, np.inf)
+    x_max = np.full(n_groups, -np.inf)
+    np.minimum.at(x_min, codes, x_values)
+    np.maximum.at(x_max, codes, x_values)
+
+    return pd.DataFrame(
+        {
+            by: groups,
+            "n": n,
+            "slope": slope,
+            "intercept": y_mean - slope * x_mean,
+            "r_squared": r_squared,
+            "x_min": x_min,
+            "x_max": x_max,
+        }
+    )
+
+
+def regress_uqs_on_similarity(df_crowdtruth_units: pd.DataFrame) -> pd.DataFrame:
+    """
+    Regress the UQS on the similarity of the inter-sentence units, per dominant
+    answer. These are the trendlines of `scatter_correlation_uqs_similarity`.
+
+    Args:
+        df_crowdtruth_units: DataFrame containing crowdtruth units, preprocessed
+            with `preprocess_units`.
+
+    Returns:
+        pd.DataFrame: The regression statistics per dominant answer (see
+            `grouped_linear_fit`).
+    """
+    units_inter = df_crowdtruth_units[df_crowdtruth_units.relation == "inter-sentence"]
+    return grouped_linear_fit(units_inter, "input.sim", "uqs", "dominant_answer")
+
+
+def add_trendlines(
+    fig: Figure, df_trendlines: pd.DataFrame, facet: str, color: str
+) -> Figure:
+    """
+    Add the lines of `grouped_linear_fit` to the facets of a scatter plot.
+
+    Args:
+        fig: Plotly scatter plot made with `custom_data=[facet]`, so every
+            trace tells which facet it is in.
+        df_trendlines: Regression statistics per facet.
+        facet: Name of the facet column.
+        color: Color of the lines.
+
+    Returns:
+        The figure with one line per facet.
+    """
+    trendlines = df_trendlines.set_index(facet)
+    for trace in list(fig.data):
+        line = trendlines.loc[trace.customdata[0][0]]
+        x = [line.x_min, line.x_max]
+        fig.add_scatter(
+            x=x,
+            y=[line.intercept + line.slope * value for value in x],
+            mode="lines",
+            line_color=color,
+            showlegend=False,
+            xaxis=trace.xaxis,
+            yaxis=trace.yaxis,
+            hovertemplate=(
+                f"<b>OLS trendline</b><br>uqs = {line.slope:.4g} * similarity + "
+                f"{line.intercept:.4g}<br>R<sup>2</sup>={line.r_squared:.6f}"
+                "<extra></extra>"
+            ),
+        )
+    return fig
+
+
+def scatter_correlation_uqs_similarity(
+    df_crowdtruth_units: pd.DataFrame, plotting: Dict[str, Any] = None
+) -> Figure:
     """
     Create a scatter plot to visualize the correlation between unit quality scores (UQS)
     and similarity scores fpr inter-sentence relations in the DataFrame.
 
+    In the large-data mode, the points are drawn with WebGL from a sample
+    stratified by dominant answer; the trendlines are fitted on all units.
+
     Args:
         df_crowdtruth_units: DataFrame containing crowdtruth units.
             Must contain 'uqs' and 'similarity' columns.
+        plotting: Plotting parameters, for the large-data mode (see
+            `large_data.DEFAULT_SETTINGS`).
 
     Returns:
         px.scatter: A Plotly scatter plot showing the correlation between UQS
             and similarity.
     """
+    import plotly.express as px
+
     # Filter the DataFrame for inter-sentence relations
     units_inter = df_crowdtruth_units[df_crowdtruth_units.relation == "inter-sentence"]
 
+    large_data = use_large_data(len(units_inter), plotting)
+    if large_data:
+        settings = plotting_settings(plotting)
+        units_inter = stratified_sample(
+            units_inter, "dominant_answer", settings["max_points"], settings["seed"]
+        )
+
     # Create a scatter plot to visualize the correlation between UQS and similarity
     fig = px.scatter(
         units_inter,
         x="input.sim",
         y="uqs",
         labels={"input.sim": "similarity", "dominant_aqs": "aqs"},
-        color_discrete_sequence=px.colors.qualitative.T10,
-        trendline="ols",
-        trendline_color_override="#E45756",
+        color_discrete_sequence=PLOTLY_COLORS,
         opacity=0.65,
         category_orders=CATEGORY_ORDERS,
         facet_row="dominant_answer",
+        custom_data=["dominant_answer"],
+        render_mode="webgl" if large_data else "auto",
+    )
+
+    # Add the trendlines of all facets, fitted at once
+    add_trendlines(
+        fig,
+        regress_uqs_on_similarity(df_crowdtruth_units),
+        "dominant_answer",
+        "#E45756",
     )
 
     # Update annotations to show only the type name
@@ -200,6 +386,51 @@ def scatter_correlation_uqs_similarity(df_crowdtruth_units: pd.DataFrame) -> px.
     return fig
 
 
+def annotation_score_matrix(
+    unit_annotation_score: pd.Series,
+) -> Tuple[np.ndarray, np.ndarray, List[str]]:
+    """
+    Convert the unit annotation score Counters into a dense unit x label matrix.
+
+    Args:
+        unit_annotation_score: Series of Counters with the annotation score per
+            label.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray, List[str]]: The score matrix (-inf for
+            labels missing from a Counter), the position of each label in its
+            Counter, and the labels of the columns.
+    """
+    n_units = len(unit_annotation_score)
+
+    # Few distinct label orders occur, so label columns are looked up per order
+    order_codes, orders = pd.factorize(
+        pd.Series([tuple(x) for x in unit_annotation_score], dtype=object)
+    )
+    labels = list(dict.fromkeys(label for order in orders for label in order))
+    order_columns = np.zeros((len(orders), max(map(len, orders))), dtype=int)
+    for i, order in enumerate(orders):
+        order_columns[i, : len(order)] = [labels.index(label) for label in order]
+
+    # Flatten all Counters and scatter the scores into their label columns
+    values = np.fromiter(
+        chain.from_iterable(x.values() for x in unit_annotation_score), float
+    )
+    lengths = np.fromiter(map(len, unit_annotation_score), int, count=n_units)
+    rows = np.repeat(np.arange(n_units), lengths)
+    flat_positions = np.arange(len(values)) - np.repeat(
+        np.cumsum(lengths) - lengths, lengths
+    )
+    columns = order_columns[order_codes[rows], flat_positions]
+
+    scores = np.full((n_units, len(labels)), -np.inf)
+    scores[rows, columns] = values
+    positions = np.full(scores.shape, len(labels))
+    positions[rows, columns] = flat_positions
+
+    return scores, positions, labels
+
+
 def preprocess_units(df_crowdtruth_units: pd.DataFrame) -> pd.DataFrame:
     """
     Preprocess the DataFrame of crowdtruth units to add additional columns
@@ -211,37 +442,16 @@ def preprocess_units(df_crowdtruth_units: pd.DataFrame) -> pd.DataFrame:
     Returns:
         pd.DataFrame: The preprocessed DataFrame with additional columns.
     """
-
-    def _author_vs_additional_sources(row):
-        if row["input.source_index"] == 0:
-            return "author"
-        else:
-            return "additional_source"
-
-    def _context(row):
-        if row["relation"] == "inter-sentence":
-            return True
-        if row["input.true_answer"] == "agree":
-            return False
-        return True
-
-    def _relation_sentence_statement(row):
-        if row["input.sent_id"] in row["input.statement_sent_ids"]:
-            return "intra-sentence"
-        return "inter-sentence"
-
     units = df_crowdtruth_units.copy()
 
-    # add column 'dominant_answer'
-    units["dominant_answer"] = units["unit_annotation_score"].apply(
-        lambda x: x.most_common()[0][0]
-    )
-    units["second_answer"] = units["unit_annotation_score"].apply(
-        lambda x: x.most_common()[1][0]
-    )
-    units["dominant_aqs"] = units["unit_annotation_score"].apply(
-        lambda x: x.most_common()[0][1]
-    )
+    # add columns 'dominant_answer', 'second_answer' and 'dominant_aqs'. Labels
+    # are ranked like Counter.most_common(): by score, then by Counter order
+    scores, positions, labels = annotation_score_matrix(units["unit_annotation_score"])
+    ranking = np.lexsort((positions, -scores), axis=1)
+    labels = np.array(labels, dtype=object)
+    units["dominant_answer"] = labels[ranking[:, 0]]
+    units["second_answer"] = labels[ranking[:, 1]]
+    units["dominant_aqs"] = np.take_along_axis(scores, ranking[:, :1], axis=1)[:, 0]
 
     # fillna for true_answer
     units["input.true_answer"] = units["input.true_answer"].fillna("unknown")
@@ -250,50 +460,82 @@ def preprocess_units(df_crowdtruth_units: pd.DataFrame) -> pd.DataFrame:
     )
 
     # presence of additional sources
-    units["additional_sources"] = units["input.n_sources"].apply(lambda x: x > 0)
+    units["additional_sources"] = units["input.n_sources"] > 0
+
+    # Intra-sentence if the sentence is one of the sentences of the statement
+    is_intra_sentence = np.array(
+        [
+            sent_id in statement_sent_ids
+            for sent_id, statement_sent_ids in zip(
+                units["input.sent_id"], units["input.statement_sent_ids"]
+            )
+        ],
+        dtype=bool,
+    )
 
-    # Preprocess the DataFrame to add a 'with_context' column
-    units["with_context"] = units.apply(_context, axis=1)
+    # Add a 'with_context' column
+    units["with_context"] = ~is_intra_sentence | (units["input.true_answer"] != "agree")
 
-    # Preprocess the DataFrame to add a 'source_type' column
-    units["source_type"] = units.apply(_author_vs_additional_sources, axis=1)
+    # Add a 'source_type' column
+    units["source_type"] = np.where(
+        units["input.source_index"] == 0, "author", "additional_source"
+    ).astype(object)
 
-    # Preprocess the DataFrame to add a 'relation' column
-    units["relation"] = units.apply(_relation_sentence_statement, axis=1)
+    # Add a 'relation' column
+    units["relation"] = np.where(
+        is_intra_sentence, "intra-sentence", "inter-sentence"
+    ).astype(object)
 
     return units
 
 
-def analyse_units(df_crowdtruth_units: pd.DataFrame) -> Dict[str, Figure]:
+def analyse_units(
+    df_crowdtruth_units: pd.DataFrame, plotting: Dict[str, Any] = None
+) -> Dict[str, Figure]:
     """
     Generates visualizations for the provided DataFrame of crowdtruth units.
 
     Args:
-        df_crowdtruth_units: DataFrame containing crowdtruth units.
+        df_crowdtruth_units: DataFrame containing crowdtruth units, preprocessed
+            with `preprocess_units`.
+        plotting: Plotting parameters, for the large-data mode (see
+            `large_data.DEFAULT_SETTINGS`).
 
     Returns:
         Dict[str, px.Figure]: A dictionary containing Plotly figures for various
             unit visualizations, including overall unit quality score (UQS).
     """
-    # Preprocess the DataFrame to add additional columns for analysis
-    df_crowdtruth_units = preprocess_units(df_crowdtruth_units)
-
     # Create figures for unit analysis
     figs_units = {
-        "overall_uqs": histogram_overall_uqs(df_crowdtruth_units),
-        "uqs_per_type": violin_uqs_per_type(df_crowdtruth_units),
-        "uqs_per_type_and_source": boxplot_uqs_per_type_and_source(df_crowdtruth_units),
+        "overall_uqs": histogram_overall_uqs(df_crowdtruth_units, plotting),
+        "uqs_per_type_and_source": boxplot_uqs_per_type_and_source(
+            df_crowdtruth_units, plotting
+        ),
         "correlation_uqs_similarity": scatter_correlation_uqs_similarity(
-            df_crowdtruth_units
+            df_crowdtruth_units, plotting
         ),
     }
 
-    # Save figures as images
-    for key, fig in figs_units.items():
-        fig.write_image(
-            f"{DIR_IMAGES}/units_{key}.png",
-            width=800,
-            height=600,
-        )
+    return figs_units
+
+
+def analyse_uqs_per_type(
+    df_crowdtruth_units: pd.DataFrame, plotting: Dict[str, Any] = None
+) -> Dict[str, Figure]:
+    """
+    Generates the visualization of the UQS per relation type. Only needs the
+    'uqs' and 'relation' columns of the preprocessed units.
+
+    Args:
+        df_crowdtruth_units: DataFrame containing crowdtruth units.
+            Must contain 'uqs' and 'relation' columns.
+        plotting: Plotting parameters, for the large-data mode (see
+            `large_data.DEFAULT_SETTINGS`).
+
+    Returns:
+        Dict[str, px.Figure]: A dictionary containing the Plotly violin plot of
+            the UQS per type.
+    """
+    figs_units = {"uqs_per_type": violin_uqs_per_type(df_crowdtruth_units, plotting)}
 
     return figs_units
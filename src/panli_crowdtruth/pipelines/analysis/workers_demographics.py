@@ -1,10 +1,9 @@
 from typing import Dict
 
 import pandas as pd
-import plotly.express as px
 from plotly.graph_objects import Figure
 
-from panli_crowdtruth.pipelines.analysis.config_plotly import DIR_IMAGES, PLOTLY_COLORS
+from panli_crowdtruth.pipelines.analysis.config_plotly import PLOTLY_COLORS
 
 
 def replace_by_other(row, column_name="fluent_language", threshold=4):
@@ -17,7 +16,7 @@ def replace_by_other(row, column_name="fluent_language", threshold=4):
 
 def plot_employment_status(
     df_prolific_workers: pd.DataFrame,
-) -> px.pie:
+) -> Figure:
     """
     Generates a pie chart visualizing the distribution of employment status in the
     provided DataFrame. This function standardizes and formats employment status
@@ -32,6 +31,8 @@ def plot_employment_status(
         px.pie: A Plotly pie chart figure object representing the employment
             status distribution.
     """
+    import plotly.express as px
+
     # Dictionary to standardize and format employment status labels for better display
     to_replace = {
         "Not in paid work (e.g. homemaker', 'retired or disabled)": (
@@ -68,7 +69,7 @@ def plot_employment_status(
 
 def plot_nationalities(
     df_prolific_workers: pd.DataFrame,
-) -> px.pie:
+) -> Figure:
     """
     Generates a pie chart showing the distribution of participants' nationalities.
     Nationalities with fewer than 20 workers are grouped into an "Other" category.
@@ -80,6 +81,8 @@ def plot_nationalities(
         px.pie: A Plotly pie chart figure object representing the distribution of
             participants' nationalities.
     """
+    import plotly.express as px
+
     # Group by 'Nationality' and count unique workers per nationality
     df_nationalities = (
         df_prolific_workers.groupby("Nationality")["worker_id"]
@@ -108,7 +111,7 @@ def plot_nationalities(
     return fig
 
 
-def plot_age(df_prolific_workers: pd.DataFrame) -> px.histogram:
+def plot_age(df_prolific_workers: pd.DataFrame) -> Figure:
     """
     Generates a histogram of the ages of participants, excluding outliers (ages >= 100).
 
@@ -119,6 +122,8 @@ def plot_age(df_prolific_workers: pd.DataFrame) -> px.histogram:
     Returns:
         px.histogram: Plotly histogram object showing the distribution of ages.
     """
+    import plotly.express as px
+
     # Filter out outlier ages (age >= 100)
     df_age = df_prolific_workers[df_prolific_workers.age < 100]
 
@@ -139,7 +144,7 @@ def plot_age(df_prolific_workers: pd.DataFrame) -> px.histogram:
     return fig
 
 
-def plot_fluent_languages(df_prolific_workers: pd.DataFrame) -> px.bar:
+def plot_fluent_languages(df_prolific_workers: pd.DataFrame) -> Figure:
     """
     Generates a bar plot showing the number of unique workers per fluent language,
     excluding English, and groups languages with fewer than a specified threshold
@@ -153,6 +158,7 @@ def plot_fluent_languages(df_prolific_workers: pd.DataFrame) -> px.bar:
         px.bar: Plotly bar plot object showing the number of workers per fluent
             language.
     """
+    import plotly.express as px
 
     # Split the 'Fluent languages' column into lists (if not already)
     df_prolific_workers["Fluent languages"] = df_prolific_workers[
@@ -224,12 +230,4 @@ def analyse_demographics(df_prolific_workers: pd.DataFrame) -> Dict[str, Figure]
         "fig_fluent_languages": plot_fluent_languages(df_prolific_workers),
     }
 
-    # Save figures as images
-    for key, fig in figs_demographics.items():
-        fig.write_image(
-            f"{DIR_IMAGES}/workers_demographics_{key}.png",
-            width=800,
-            height=600,
-        )
-
     return figs_demographics
@@ -1,34 +1,52 @@
-from typing import Dict
+from typing import Any, Dict
 
 import pandas as pd
-import plotly.express as px
 from plotly.graph_objects import Figure
 
-from panli_crowdtruth.pipelines.analysis.config_plotly import DIR_IMAGES, PLOTLY_COLORS
+from panli_crowdtruth.pipelines.analysis.config_plotly import PLOTLY_COLORS
+from panli_crowdtruth.pipelines.analysis.large_data import (
+    plotting_settings,
+    summary_histogram,
+    use_large_data,
+)
 
+# Number of batches from which the bars of `mean_wqs_per_batch` touch
+MAX_SEPARATE_BARS = 100
 
-def time_taken_per_task(df: pd.DataFrame) -> px.histogram:
+
+def time_taken_per_task(df: pd.DataFrame, plotting: Dict[str, Any] = None) -> Figure:
     """
     Generates a histogram showing the distribution of time taken per task by workers.
 
     Args:
         df: DataFrame containing worker information, including 'time_taken' column.
+        plotting: Plotting parameters, for the large-data mode (see
+            `large_data.DEFAULT_SETTINGS`).
 
     Returns:
         px.histogram: Plotly histogram object showing the distribution of time taken
             per task.
     """
+    import plotly.express as px
+
     # Filter out negative or zero time taken
     df_time = df[df.entered_code != "Manual Completion"].copy()
     df_time["time_taken_minutes"] = df_time["time_taken"] / 60
 
     # Create histogram of time taken per task
-    fig = px.histogram(
-        df_time,
-        x="time_taken_minutes",
-        color_discrete_sequence=PLOTLY_COLORS,
-        marginal="box",
-    )
+    if use_large_data(len(df_time), plotting):
+        fig = summary_histogram(
+            df_time["time_taken_minutes"],
+            plotting_settings(plotting)["n_bins"],
+            PLOTLY_COLORS[0],
+        )
+    else:
+        fig = px.histogram(
+            df_time,
+            x="time_taken_minutes",
+            color_discrete_sequence=PLOTLY_COLORS,
+            marginal="box",
+        )
 
     # Update layout
     fig.update_layout(
@@ -38,18 +56,23 @@ def time_taken_per_task(df: pd.DataFrame) -> px.histogram:
     return fig
 
 
-def prolific_scores(df_prolific_workers: pd.DataFrame) -> px.histogram:
+def prolific_scores(
+    df_prolific_workers: pd.DataFrame, plotting: Dict[str, Any] = None
+) -> Figure:
     """
     Generates a histogram showing the distribution of Prolific scores of workers.
 
     Args:
         df_prolific_workers: DataFrame containing worker information,
             including 'prolific_score' column.
+        plotting: Plotting parameters, for the large-data mode (see
+            `large_data.DEFAULT_SETTINGS`).
 
     Returns:
         px.histogram: Plotly histogram object showing the distribution of Prolific
             scores.
     """
+    import plotly.express as px
 
     df_prolific_workers = df_prolific_workers.sort_values(
         "completed_date_time", ascending=False
@@ -57,12 +80,19 @@ def prolific_scores(df_prolific_workers: pd.DataFrame) -> px.histogram:
     df_prolific_workers = df_prolific_workers.drop_duplicates(subset=["worker_id"])
 
     # Create histogram of Prolific scores
-    fig = px.histogram(
-        df_prolific_workers,
-        x="prolific_score",
-        marginal="box",
-        color_discrete_sequence=PLOTLY_COLORS,
-    )
+    if use_large_data(len(df_prolific_workers), plotting):
+        fig = summary_histogram(
+            df_prolific_workers["prolific_score"],
+            plotting_settings(plotting)["n_bins"],
+            PLOTLY_COLORS[0],
+        )
+    else:
+        fig = px.histogram(
+            df_prolific_workers,
+            x="prolific_score",
+            marginal="box",
+            color_discrete_sequence=PLOTLY_COLORS,
+        )
 
     # Update layout
     fig.update_layout(
@@ -72,25 +102,38 @@ def prolific_scores(df_prolific_workers: pd.DataFrame) -> px.histogram:
     return fig
 
 
-def worker_quality_score(df_crowdtruth_workers: pd.DataFrame) -> px.histogram:
+def worker_quality_score(
+    df_crowdtruth_workers: pd.DataFrame, plotting: Dict[str, Any] = None
+) -> Figure:
     """
     Generates a histogram showing the distribution of worker quality scores.
 
     Args:
         df_prolific_workers: DataFrame containing worker information,
             including 'wqs' column.
+        plotting: Plotting parameters, for the large-data mode (see
+            `large_data.DEFAULT_SETTINGS`).
 
     Returns:
         px.histogram: Plotly histogram object showing the distribution of worker
             quality scores.
     """
+    import plotly.express as px
+
     # Create histogram of worker quality scores
-    fig = px.histogram(
-        df_crowdtruth_workers,
-        x="wqs",
-        marginal="box",
-        color_discrete_sequence=PLOTLY_COLORS,
-    )
+    if use_large_data(len(df_crowdtruth_workers), plotting):
+        fig = summary_histogram(
+            df_crowdtruth_workers["wqs"],
+            plotting_settings(plotting)["n_bins"],
+            PLOTLY_COLORS[0],
+        )
+    else:
+        fig = px.histogram(
+            df_crowdtruth_workers,
+            x="wqs",
+            marginal="box",
+            color_discrete_sequence=PLOTLY_COLORS,
+        )
 
     # Update layout
     fig.update_layout(
@@ -102,33 +145,24 @@ def worker_quality_score(df_crowdtruth_workers: pd.DataFrame) -> px.histogram:
     return fig
 
 
-def mean_wqs_per_batch(
-    df_crowdtruth_judgments: pd.DataFrame,
-    df_crowdtruth_workers: pd.DataFrame,
-    df_crowdtruth_units: pd.DataFrame,
-) -> px.bar:
+def mean_wqs_per_batch(df_judgment_facts: pd.DataFrame) -> Figure:
     """
     Generates a bar chart showing the mean worker quality score (WQS) per batch.
+    The batches are a category axis, whose labels Plotly thins out when there
+    are too many to show, and the mean line spans the whole axis.
 
     Args:
-        df_crowdtruth_judgments: DataFrame containing judgments with
-            'batch_id' and 'worker'.
-        df_crowdtruth_workers: DataFrame containing worker information, including 'wqs'.
-        df_crowdtruth_units: DataFrame containing unit information.
+        df_judgment_facts: DataFrame containing the judgment facts, including
+            'worker', 'batch_id' and 'wqs'.
 
     Returns:
         Plotly bar chart object showing the mean WQS per batch.
     """
-    # Merge judgments with workers to get WQS
-    select_judgments = df_crowdtruth_judgments[["unit", "worker"]]
-    select_units = df_crowdtruth_units["input.batch_id"].reset_index()
-    select_workers = df_crowdtruth_workers["wqs"]
-    df = select_judgments.merge(select_units, on="unit", how="left")
-    df = df.merge(select_workers, on="worker", how="left")
-    df = (
-        df.drop(columns="unit")
-        .drop_duplicates()
-        .rename(columns={"input.batch_id": "batch_id"})
+    import plotly.express as px
+
+    # One row per worker and batch
+    df = df_judgment_facts[["worker", "batch_id", "wqs"]].drop_duplicates(
+        ["worker", "batch_id"]
     )
 
     # Group by batch and calculate mean WQS
@@ -148,7 +182,12 @@ def mean_wqs_per_batch(
     fig.update_layout(
         xaxis_title="average worker quality score",
         yaxis_title="batch id",
+        yaxis_type="category",
     )
+    if len(df_mean_wqs_batch) > MAX_SEPARATE_BARS:
+        # Bars thinner than their outline: draw them as an area
+        fig.update_layout(bargap=0)
+        fig.update_traces(marker_line_width=0)
 
     # Add vertical line for mean WQS across all batches
     line_mean = df_mean_wqs_batch["wqs"].mean()
@@ -157,9 +196,9 @@ def mean_wqs_per_batch(
         shapes=[
             dict(
                 type="line",
-                yref="y",
-                y0=-1,
-                y1=21,
+                yref="paper",
+                y0=0,
+                y1=1,
                 xref="x",
                 x0=line_mean,
                 x1=line_mean,
@@ -172,35 +211,29 @@ def mean_wqs_per_batch(
 
 def analyse_performance(
     df_prolific_workers: pd.DataFrame,
-    df_crowdtruth_judgments: pd.DataFrame,
+    df_judgment_facts: pd.DataFrame,
     df_crowdtruth_workers: pd.DataFrame,
-    df_crowdtruth_units: pd.DataFrame,
+    plotting: Dict[str, Any] = None,
 ) -> Dict[str, Figure]:
     """
     Analyzes worker demographics and returns a dictionary of Plotly bar plots.
 
     Args:
         df_prolific_workers: DataFrame containing worker information.
+        df_judgment_facts: DataFrame containing the judgment facts.
+        df_crowdtruth_workers: DataFrame containing crowdtruth workers.
+        plotting: Plotting parameters, for the large-data mode (see
+            `large_data.DEFAULT_SETTINGS`).
 
     Returns:
         Dictionary with keys
     """
     # Generate figures for worker performance analysis
     figs_performance = {
-        "time_taken_per_task": time_taken_per_task(df_prolific_workers),
-        "prolific_scores": prolific_scores(df_prolific_workers),
-        "worker_quality_score": worker_quality_score(df_crowdtruth_workers),
-        "mean_wqs_per_batch": mean_wqs_per_batch(
-            df_crowdtruth_judgments, df_crowdtruth_workers, df_crowdtruth_units
-        ),
+        "time_taken_per_task": time_taken_per_task(df_prolific_workers, plotting),
+        "prolific_scores": prolific_scores(df_prolific_workers, plotting),
+        "worker_quality_score": worker_quality_score(df_crowdtruth_workers, plotting),
+        "mean_wqs_per_batch": mean_wqs_per_batch(df_judgment_facts),
     }
 
-    # Save figures as images
-    for key, fig in figs_performance.items():
-        fig.write_image(
-            f"{DIR_IMAGES}/workers_performance_{key}.png",
-            width=800,
-            height=600,
-        )
-
     return figs_performance
@@ -1,7 +1,9 @@
 import os
 
+from panli_crowdtruth.pipelines.analysis.render_service import RenderJob, RenderService
 
-def write_images(fig, dir_images, name_file):
+
+def write_images(fig, dir_images, name_file, service: RenderService = None):
 
     pdf_dir = os.path.join(dir_images, "pdf")
     html_dir = os.path.join(dir_images, "html")
@@ -11,7 +13,18 @@ def write_images(fig, dir_images, name_file):
         os.makedirs(html_dir)
 
     pdf_path = os.path.join(pdf_dir, f"{name_file}.pdf")
-    fig.write_image(pdf_path)
-
     html_path = os.path.join(html_dir, f"{name_file}.html")
-    fig.write_html(html_path)
+
+    # Render in the given session, which stays open for the next figures
+    session = service or RenderService()
+    fig_json = fig.to_json()
+    width, height = fig.layout.width, fig.layout.height
+    jobs = [
+        RenderJob(fig_json, "pdf", width, height, pdf_path),
+        RenderJob(fig_json, "html", width, height, html_path),
+    ]
+    try:
+        session.render(jobs)
+    finally:
+        if service is None:
+            session.close()
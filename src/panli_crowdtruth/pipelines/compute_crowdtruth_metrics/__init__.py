@@ -1 +1 @@
-from .pipeline import create_pipeline  # NOQA
+from .pipeline import create_incremental_pipeline, create_pipeline  # NOQA
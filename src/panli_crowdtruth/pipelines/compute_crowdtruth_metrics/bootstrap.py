@@ -0,0 +1,280 @@
+"""Bootstrap confidence intervals of the UQS and WQS.
+
+Every replicate resamples the judgments of every unit with replacement and
+recomputes the metrics until convergence. The judgments are encoded once as a
+``JudgmentTensor``; the worker processes receive it once, when they start,
+and build every replicate by indexing its arrays, so no DataFrame is parsed
+per replicate.
+
+Every draw stays a separate judgment with a binary annotation vector. A
+worker can only judge a unit once, so the k-th draw of a worker on a unit is
+a judgment of the worker's k-th copy, a separate worker of the replicate. The
+first copy of a worker holds its draws on every unit it was drawn on, and its
+WQS is the WQS of the worker in the replicate.
+"""
+
+import logging
+import os
+import time
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .vectorized_metrics import (
+    ConvergenceCriteria,
+    JudgmentTensor,
+    initial_scores,
+    iterate_until_convergence,
+)
+
+if TYPE_CHECKING:
+    from crowdtruth.configuration import DefaultConfig
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SETTINGS = {
+    "n_replicates": 0,
+    "confidence": 0.95,
+    "n_workers": None,
+    "seed": 0,
+}
+
+
+class JudgmentResampler:
+    """Draws bootstrap replicates of an encoded set of judgments.
+
+    The judgments are ordered by unit once, so drawing a replicate is a
+    single vectorized draw of an offset within the unit of every judgment.
+    """
+
+    def __init__(self, tensor: JudgmentTensor, criteria: ConvergenceCriteria):
+        self.tensor = tensor
+        self.criteria = criteria
+        self.order = np.argsort(tensor.unit_idx, kind="stable")
+        self.counts = np.bincount(tensor.unit_idx, minlength=tensor.n_units)
+        self.starts = np.cumsum(self.counts) - self.counts
+
+    def resample(self, rng: np.random.Generator) -> Tuple[JudgmentTensor, np.ndarray]:
+        """Draws the judgments of every unit with replacement.
+
+        Args:
+            rng: Random generator of the replicate.
+
+        Returns:
+            The judgments of the replicate and the positions of its workers in
+            the original tensor, -1 for the further copies of workers drawn
+            more than once on a unit. Every unit keeps its number of draws, so
+            all units are in the replicate.
+        """
+        tensor = self.tensor
+        unit = tensor.unit_idx[self.order]
+        draws = self.starts[unit] + (rng.random(len(unit)) * self.counts[unit]).astype(
+            int
+        )
+        drawn = self.order[draws]
+        worker = tensor.worker_idx[drawn].astype(np.int64)
+
+        # Number of earlier draws of the same worker on the same unit
+        pair = worker * tensor.n_units + tensor.unit_idx[drawn]
+        by_pair = np.argsort(pair, kind="stable")
+        sorted_pair = pair[by_pair]
+        new_pair = np.r_[True, sorted_pair[1:] != sorted_pair[:-1]]
+        position = np.arange(len(pair))
+        copy = np.empty(len(pair), dtype=np.int64)
+        copy[by_pair] = position - np.maximum.accumulate(
+            np.where(new_pair, position, 0)
+        )
+
+        # The copies of a worker come after all the first copies
+        copies, worker_idx = np.unique(
+            copy * tensor.n_workers + worker, return_inverse=True
+        )
+        original = copies % tensor.n_workers
+        names = tensor.workers[original].to_numpy(dtype=object)
+        further = copies >= tensor.n_workers
+        names[further] = [
+            f"{name}#{k}"
+            for name, k in zip(names[further], copies[further] // tensor.n_workers)
+        ]
+
+        replicate = JudgmentTensor(
+            workers=pd.Index(names),
+            units=tensor.units,
+            labels=tensor.labels,
+            worker_idx=worker_idx,
+            unit_idx=tensor.unit_idx[drawn],
+            values=tensor.values[drawn],
+        )
+        return replicate, np.where(further, -1, original)
+
+    def replicate_scores(
+        self, seed: np.random.SeedSequence
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Computes the UQS and WQS of one replicate.
+
+        Args:
+            seed: Seed of the replicate.
+
+        Returns:
+            The UQS of every unit and the WQS of every worker, NaN for workers
+            that were not drawn.
+        """
+        replicate, workers = self.resample(np.random.default_rng(seed))
+        history, _ = iterate_until_convergence(
+            replicate, initial_scores(replicate), self.criteria
+        )
+        wqs = np.full(self.tensor.n_workers, np.nan)
+        first = workers >= 0
+        wqs[workers[first]] = history[-1].wqs[first]
+        return history[-1].uqs, wqs
+
+
+_resampler: Optional[JudgmentResampler] = None
+
+
+def _init_worker(resampler: JudgmentResampler) -> None:
+    """Keeps the resampler of a worker process for all its replicates."""
+    global _resampler
+    _resampler = resampler
+
+
+def _replicate_scores(seed: np.random.SeedSequence) -> Tuple[np.ndarray, np.ndarray]:
+    return _resampler.replicate_scores(seed)
+
+
+def bootstrap_scores(
+    tensor: JudgmentTensor,
+    n_replicates: int,
+    n_workers: Optional[int] = None,
+    seed: int = 0,
+    criteria: Optional[ConvergenceCriteria] = None,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Computes the UQS and WQS of bootstrap replicates on a process pool.
+
+    Every replicate has its own seed derived from ``seed``, so the replicates
+    do not depend on the number of processes.
+
+    Args:
+        tensor: Encoded judgments.
+        n_replicates: Number of replicates.
+        n_workers: Number of processes, capped at (and defaulting to) the
+            number of CPUs.
+        seed: Seed of the replicates.
+        criteria: When to stop iterating.
+
+    Returns:
+        Replicate x unit matrix of UQS and replicate x worker matrix of WQS.
+    """
+    resampler = JudgmentResampler(tensor, criteria or ConvergenceCriteria())
+    seeds = np.random.SeedSequence(seed).spawn(n_replicates)
+    n_workers = max(min(n_workers or os.cpu_count(), os.cpu_count(), n_replicates), 1)
+
+    start = time.perf_counter()
+    if n_workers == 1:
+        scores = [resampler.replicate_scores(seed) for seed in seeds]
+    else:
+        with ProcessPoolExecutor(
+            max_workers=n_workers,
+            mp_context=get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(resampler,),
+        ) as executor:
+            chunksize = max(1, n_replicates // (4 * n_workers))
+            scores = list(executor.map(_replicate_scores, seeds, chunksize=chunksize))
+    logger.info(
+        f"Computed {n_replicates} bootstrap replicates in "
+        f"{time.perf_counter() - start:.2f}s with {n_workers} worker(s)"
+    )
+
+    uqs, wqs = zip(*scores)
+    return np.stack(uqs), np.stack(wqs)
+
+
+def percentile_interval(
+    replicates: np.ndarray, confidence: float
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Computes percentile intervals over the replicates, ignoring NaNs.
+
+    Args:
+        replicates: Replicate x item matrix of scores.
+        confidence: Confidence level of the intervals.
+
+    Returns:
+        Lower and upper bounds of every item, NaN for items without scores.
+    """
+    alpha = (1 - confidence) / 2
+    with warnings.catch_warnings():
+        warnings.filterwarnings("ignore", "All-NaN slice", RuntimeWarning)
+        low, high = np.nanquantile(replicates, [alpha, 1 - alpha], axis=0)
+    return low, high
+
+
+def bootstrap_crowdtruth_metrics(
+    df_units: pd.DataFrame,
+    df_workers: pd.DataFrame,
+    df_annotations: pd.DataFrame,
+    df_judgments: pd.DataFrame,
+    config: "DefaultConfig",
+    bootstrap: Dict[str, Any] = None,
+    convergence: Dict[str, Any] = None,
+) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """Adds bootstrap confidence intervals of the UQS and WQS to the units and
+    workers.
+
+    Args:
+        df_units: CrowdTruth units.
+        df_workers: CrowdTruth workers.
+        df_annotations: CrowdTruth annotations, whose index are the labels.
+        df_judgments: CrowdTruth judgments.
+        config: Configuration for CrowdTruth.
+        bootstrap: Number of replicates, confidence level, number of
+            processes and seed (see ``DEFAULT_SETTINGS``). No intervals are
+            computed for zero replicates.
+        convergence: Convergence criteria of every replicate (see
+            ``ConvergenceCriteria``).
+
+    Returns:
+        Units with "uqs_ci_low" and "uqs_ci_high", and workers with
+        "wqs_ci_low" and "wqs_ci_high".
+    """
+    settings = {**DEFAULT_SETTINGS, **(bootstrap or {})}
+    if not settings["n_replicates"]:
+        logger.info("Skipping the bootstrap confidence intervals")
+        return df_units, df_workers
+    if not 0 < settings["confidence"] < 1:
+        raise ValueError(
+            f"The confidence level must be in (0, 1): {settings['confidence']}"
+        )
+
+    col = list(config.output.values())[0]
+    labels: List[str] = df_annotations.index.tolist()
+    tensor = JudgmentTensor.from_judgments(df_judgments, col, labels)
+
+    uqs, wqs = bootstrap_scores(
+        tensor,
+        settings["n_replicates"],
+        settings["n_workers"],
+        settings["seed"],
+        ConvergenceCriteria.from_params(convergence),
+    )
+
+    df_units = df_units.copy()
+    df_workers = df_workers.copy()
+    for df, name, index, replicates in [
+        (df_units, "uqs", tensor.units, uqs),
+        (df_workers, "wqs", tensor.workers, wqs),
+    ]:
+        low, high = percentile_interval(replicates, settings["confidence"])
+        df[f"{name}_ci_low"] = pd.Series(low, index=index)
+        df[f"{name}_ci_high"] = pd.Series(high, index=index)
+
+    logger.info(
+        f"Mean width of the {settings['confidence']:.0%} intervals: "
+        f"UQS {(df_units['uqs_ci_high'] - df_units['uqs_ci_low']).mean():.3f}, "
+        f"WQS {(df_workers['wqs_ci_high'] - df_workers['wqs_ci_low']).mean():.3f}"
+    )
+    return df_units, df_workers
@@ -1,10 +1,19 @@
 import logging
-from typing import Dict
+import time
+from typing import TYPE_CHECKING, Any, Dict
 
-import crowdtruth
 import pandas as pd
 
-from .preprocessing import prepare_crowdtruth_judgments
+from .sharded_metrics import compute_metrics_sharded
+from .vectorized_metrics import (
+    CONVERGENCE_COLUMNS,
+    ConvergenceCriteria,
+    compute_metrics_vectorized,
+    label_matrix,
+)
+
+if TYPE_CHECKING:
+    from crowdtruth.configuration import DefaultConfig
 
 logger = logging.getLogger(__name__)
 
@@ -13,46 +22,86 @@ def fix_annotations(results: Dict[str, pd.DataFrame]) -> Dict[str, pd.DataFrame]
     """Fixes the answer_value in annotations based on judgments (workaround
     for bug in CrowdTruth).
 
+    The judgment vectors are stacked into a dense judgment x label matrix, so
+    the number of judgments per label is a single column-wise count.
+
     Args:
         results: Results dictionary from CrowdTruth.
 
     Returns:
         Fixed results dictionary from CrowdTruth.
     """
-    results["annotations"]["output.answer_value"] = 0
+    start = time.perf_counter()
 
-    for idx in results["judgments"].index:
-        for k, v in results["judgments"]["output.answer_value"][idx].items():
-            if v > 0:
-                results["annotations"].loc[k, "output.answer_value"] += 1
+    labels = results["annotations"].index.tolist()
+    answers = label_matrix(results["judgments"]["output.answer_value"], labels)
+    results["annotations"]["output.answer_value"] = (answers > 0).sum(axis=0)
 
     results["annotations"] = results["annotations"].sort_values(
         by=["aqs"], ascending=False
     )
+
+    logger.info(
+        f"Fixed annotation counts of {len(answers)} judgments in "
+        f"{time.perf_counter() - start:.3f}s"
+    )
     return results
 
 
 def compute_crowdtruth_metrics(
-    input_filepath: str, n_classes: int
+    data: Dict[str, pd.DataFrame],
+    config: "DefaultConfig",
+    metrics_engine: str = "crowdtruth",
+    n_shards: int = None,
+    parity_check: bool = False,
+    convergence: Dict[str, Any] = None,
 ) -> Dict[str, pd.DataFrame]:
     """
     Computes the CrowdTruth metrics.
 
     Args:
-        data: Preprocessed input data.
+        data: Annotations preprocessed with ``prepare_crowdtruth_judgments``.
         config: Configuration for CrowdTruth.
+        metrics_engine: Engine used to compute the metrics, either "crowdtruth"
+            (the CrowdTruth library), "vectorized" (sparse matrix operations)
+            or "sharded" (vectorized, on connected components of the
+            worker-unit graph in parallel processes).
+        n_shards: Maximum number of processes of the "sharded" engine,
+            defaults to the number of CPUs.
+        parity_check: Whether the "sharded" engine checks its results against
+            the single-shot "vectorized" engine.
+        convergence: Tolerance, maximum number of iterations and early
+            stopping of the iterations (see ``ConvergenceCriteria``). Only
+            the "vectorized" and "sharded" engines support other values than
+            CrowdTruth's tolerance of 0.001.
 
     Returns:
-        Units, workers, annotations, judgments, jobs
+        Units, workers, annotations, judgments, jobs and the time and score
+        changes of every iteration (empty for the "crowdtruth" engine)
     """
-
-    # Preprocess input data for CrowdTruth
-    logger.info("Preprocessing data for CrowdTruth")
-    data, config = prepare_crowdtruth_judgments(input_filepath, n_classes)
+    criteria = ConvergenceCriteria.from_params(convergence)
 
     # Compute CrowdTruth metrics
-    logger.info("Computing CrowdTruth metrics")
-    results = crowdtruth.run(data, config)
+    logger.info(f"Computing CrowdTruth metrics ({metrics_engine} engine)")
+    if metrics_engine == "crowdtruth":
+        if not criteria.is_default:
+            raise ValueError(
+                "The crowdtruth engine always iterates until convergence at a "
+                "tolerance of 0.001; use the vectorized or sharded engine to "
+                f"change the convergence criteria: {criteria}"
+            )
+        import crowdtruth
+
+        results = crowdtruth.run(data, config)
+        results["convergence"] = pd.DataFrame(columns=CONVERGENCE_COLUMNS)
+    elif metrics_engine == "vectorized":
+        results = compute_metrics_vectorized(data, config, criteria)
+    elif metrics_engine == "sharded":
+        results = compute_metrics_sharded(
+            data, config, n_shards, parity_check, criteria
+        )
+    else:
+        raise ValueError(f"Unsupported metrics engine: {metrics_engine}")
 
     # Fixes in annotations (workaround for bug in CrowdTruth)
     results = fix_annotations(results)
@@ -64,4 +113,5 @@ def compute_crowdtruth_metrics(
         results["annotations"],
         results["judgments"],
         results["jobs"],
+        results["convergence"],
     )
@@ -0,0 +1,58 @@
+"""CrowdTruth configurations of the PANLI annotations.
+
+Importing ``crowdtruth`` takes a while, so this module is only imported when a
+configuration is needed (see ``preprocessing.get_config``).
+"""
+
+from crowdtruth.configuration import DefaultConfig
+
+from .preprocessing import FOUR_LABELS, THREE_LABELS
+
+
+class BaseConfig(DefaultConfig):
+    inputColumns = [
+        "batch_id",
+        "list_id",
+        "pair_id",
+        "sent_id",
+        "statement_sent_ids",
+        "n_sources",
+        "sources",
+        "sentence_predicate",
+        "sentence",
+        "sentence_statement",
+        "statement",
+        "sim",
+        "source_index",
+        "source_text",
+        "true_answer",
+    ]
+    outputColumns = ["answer_value"]
+    customPlatformColumns = [
+        "judgment_id",
+        "question_id",
+        "worker_id",
+        "started_time",
+        "submitted_time",
+    ]
+    open_ended_task = False
+
+
+class ConfigFourLabels(BaseConfig):
+    annotation_vector = FOUR_LABELS
+
+
+class ConfigThreeLabels(BaseConfig):
+    annotation_vector = THREE_LABELS
+
+    def processJudgments(self, judgments):
+        for col in self.outputColumns:
+            judgments[col] = judgments[col].replace(
+                {
+                    "agree": "entailment",
+                    "disagree": "contradiction",
+                    "partially_agree": "neutral",
+                    "uncertain": "neutral",
+                }
+            )
+        return judgments
@@ -0,0 +1,270 @@
+"""Incremental recomputation of the CrowdTruth metrics.
+
+New Prolific batches are loaded with CrowdTruth on their own and merged into
+the stored results of the previous run. The metrics are then iterated over
+all judgments, starting from the converged scores of the previous run instead
+of from all ones, which typically needs far fewer iterations.
+"""
+
+import logging
+import time
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from panli_crowdtruth.text_store import join_texts
+
+from .compute_metrics import fix_annotations
+from .preprocessing import get_loaded_config, prepare_crowdtruth_judgments
+from .vectorized_metrics import (
+    ConvergenceCriteria,
+    JudgmentTensor,
+    MetricScores,
+    encode_results,
+    initial_scores,
+    iterate_metrics,
+    iterate_until_convergence,
+    store_scores,
+)
+
+logger = logging.getLogger(__name__)
+
+BATCH_COLUMN = "batch_id"
+
+WORKER_METRICS = ["wqs", "wwa", "wsa", "wqs_initial", "wwa_initial", "wsa_initial"]
+ANNOTATION_METRICS = ["aqs", "aqs_initial"]
+
+
+def warm_start_scores(
+    tensor: JudgmentTensor,
+    df_units: pd.DataFrame,
+    df_workers: pd.DataFrame,
+    df_annotations: pd.DataFrame,
+) -> MetricScores:
+    """Aligns the converged scores of a previous run with the judgments.
+
+    Units, workers and labels that were not part of the previous run start
+    from 1, like in a cold start.
+
+    Args:
+        tensor: Encoded judgments.
+        df_units: Units of the previous run.
+        df_workers: Workers of the previous run.
+        df_annotations: Annotations of the previous run.
+
+    Returns:
+        Scores to start iterating from.
+    """
+
+    def align(scores: pd.Series, index: np.ndarray) -> np.ndarray:
+        return scores.reindex(index).fillna(1.0).to_numpy(dtype=float)
+
+    return MetricScores(
+        uqs=align(df_units["uqs"], tensor.units),
+        wqs=align(df_workers["wqs"], tensor.workers),
+        wwa=align(df_workers["wwa"], tensor.workers),
+        wsa=align(df_workers["wsa"], tensor.workers),
+        aqs=align(df_annotations["aqs"], tensor.labels),
+    )
+
+
+def merge_results(
+    previous: Dict[str, pd.DataFrame], new: Dict[str, pd.DataFrame]
+) -> Dict[str, pd.DataFrame]:
+    """Merges the results of ``crowdtruth.load`` for new batches into the
+    results of a previous run.
+
+    Workers and annotations are aggregated across jobs in the same way
+    ``crowdtruth.load`` does for several input files.
+
+    Args:
+        previous: Results dictionary of the previous run.
+        new: Results dictionary from ``crowdtruth.load`` for the new batches.
+
+    Returns:
+        Merged results dictionary, without metrics.
+    """
+    units = pd.concat(
+        [previous["units"].reindex(columns=new["units"].columns), new["units"]]
+    )
+    judgments = pd.concat(
+        [
+            previous["judgments"].reindex(columns=new["judgments"].columns),
+            new["judgments"],
+        ]
+    )
+    jobs = pd.concat([previous["jobs"], new["jobs"]])
+
+    workers = pd.concat(
+        [previous["workers"].drop(columns=WORKER_METRICS), new["workers"]]
+    )
+    workers = workers.groupby(workers.index).agg(
+        {"unit": "sum", "judgment": "sum", "job": "sum", "duration": "mean"}
+    )
+
+    annotations = pd.concat(
+        [previous["annotations"].drop(columns=ANNOTATION_METRICS), new["annotations"]]
+    )
+    annotations = annotations.groupby(annotations.index).sum()
+
+    return {
+        "units": units,
+        "workers": workers,
+        "annotations": annotations,
+        "judgments": judgments,
+        "jobs": jobs,
+    }
+
+
+def compute_crowdtruth_metrics_incremental(
+    df_annotations: pd.DataFrame,
+    input_filepath: str,
+    n_classes: int,
+    df_previous_units: pd.DataFrame,
+    df_previous_workers: pd.DataFrame,
+    df_previous_annotations: pd.DataFrame,
+    df_previous_judgments: pd.DataFrame,
+    df_previous_jobs: pd.DataFrame,
+    compare_cold_start: bool = False,
+    convergence: Optional[Dict[str, Any]] = None,
+    df_previous_unit_texts: Optional[pd.DataFrame] = None,
+) -> List[Any]:
+    """Updates the CrowdTruth metrics with the batches that are new since the
+    previous run.
+
+    Only the judgments of new batches (``batch_id`` not in the previous units)
+    are loaded with CrowdTruth. The metrics are iterated from the converged
+    scores of the previous run with the vectorized engine. Both runs stop at
+    the same tolerance, so the scores agree with a cold start up to that
+    tolerance.
+
+    Args:
+        df_annotations: Annotations ingested from the input data.
+        input_filepath: Path to input data, which names the CrowdTruth jobs.
+        n_classes: Number of classes (3 or 4) in PANLI dataset.
+        df_previous_units: Units of the previous run.
+        df_previous_workers: Workers of the previous run.
+        df_previous_annotations: Annotations of the previous run.
+        df_previous_judgments: Judgments of the previous run.
+        df_previous_jobs: Jobs of the previous run.
+        compare_cold_start: Whether to also iterate from a cold start, to
+            report the exact number of iterations saved.
+        convergence: Tolerance, maximum number of iterations and early
+            stopping of the iterations (see ``ConvergenceCriteria``).
+        df_previous_unit_texts: Text table of the previous units, whose texts
+            are joined back before the units are merged with the new ones.
+
+    Returns:
+        Units (with their texts), workers, annotations, judgments, jobs, a
+        report of the update and the configuration for CrowdTruth. The units
+        and workers have no confidence intervals, as they change with the
+        new judgments; ``bootstrap_crowdtruth_metrics`` recomputes them.
+    """
+    if df_previous_unit_texts is not None:
+        df_previous_units = join_texts(df_previous_units, df_previous_unit_texts)
+
+    previous_batches = set(df_previous_units[f"input.{BATCH_COLUMN}"].unique())
+
+    df_new = df_annotations[~df_annotations[BATCH_COLUMN].isin(previous_batches)]
+    new_batches = sorted(df_new[BATCH_COLUMN].unique().tolist())
+
+    report = {
+        "new_batches": new_batches,
+        "new_judgments": len(df_new),
+        "warm_start_iterations": 0,
+        "warm_start_seconds": None,
+        "cold_start_iterations": None,
+        "cold_start_seconds": None,
+        "iterations_saved": None,
+    }
+
+    if df_new.empty:
+        logger.info("No new batches since the previous run, keeping its results")
+        return [
+            df_previous_units,
+            df_previous_workers,
+            df_previous_annotations,
+            df_previous_judgments,
+            df_previous_jobs,
+            report,
+            get_loaded_config(df_annotations, n_classes),
+        ]
+
+    # Load only the new batches with CrowdTruth
+    logger.info(f"Preprocessing {len(df_new)} judgments of batches {new_batches}")
+    job_name = input_filepath.split(".csv")[0]
+    new, config = prepare_crowdtruth_judgments(
+        df_new,
+        n_classes,
+        job_name=f"{job_name}_batch_{'_'.join(map(str, new_batches))}",
+    )
+
+    overlap = new["units"].index.intersection(df_previous_units.index)
+    if len(overlap) > 0:
+        raise ValueError(
+            f"{len(overlap)} units of the new batches were already annotated; "
+            "run the compute_crowdtruth_metrics pipeline to recompute from scratch"
+        )
+
+    previous = {
+        "units": df_previous_units,
+        "workers": df_previous_workers,
+        "annotations": df_previous_annotations,
+        "judgments": df_previous_judgments,
+        "jobs": df_previous_jobs,
+    }
+    results = merge_results(previous, new)
+
+    # Iterate from the converged scores of the previous run
+    logger.info("Computing CrowdTruth metrics (warm start)")
+    start = time.perf_counter()
+    tensor = encode_results(results, config)
+    cold = initial_scores(tensor)
+    criteria = ConvergenceCriteria.from_params(convergence)
+    history, warm_convergence = iterate_until_convergence(
+        tensor,
+        warm_start_scores(
+            tensor, df_previous_units, df_previous_workers, df_previous_annotations
+        ),
+        criteria,
+    )
+    results = store_scores(
+        results, config, tensor, history[-1], iterate_metrics(tensor, cold)
+    )
+    report["warm_start_iterations"] = len(history) - 1
+    report["warm_start_seconds"] = time.perf_counter() - start
+    report["warm_start_stop_reason"] = warm_convergence["stop_reason"].iloc[-1]
+
+    if compare_cold_start:
+        logger.info("Computing CrowdTruth metrics (cold start, for comparison)")
+        start = time.perf_counter()
+        cold_history, _ = iterate_until_convergence(tensor, cold, criteria)
+        report["cold_start_iterations"] = len(cold_history) - 1
+        report["cold_start_seconds"] = time.perf_counter() - start
+        report["iterations_saved"] = (
+            report["cold_start_iterations"] - report["warm_start_iterations"]
+        )
+        logger.info(
+            f"Warm start converged in {report['warm_start_iterations']} iterations, "
+            f"cold start in {report['cold_start_iterations']} "
+            f"({report['iterations_saved']} iterations saved)"
+        )
+    else:
+        logger.info(
+            f"Warm start converged in {report['warm_start_iterations']} iterations"
+        )
+
+    # Fixes in annotations (workaround for bug in CrowdTruth)
+    results = fix_annotations(results)
+
+    logger.info("Storing results")
+    return [
+        results["units"],
+        results["workers"],
+        results["annotations"],
+        results["judgments"],
+        results["jobs"],
+        report,
+        config,
+    ]
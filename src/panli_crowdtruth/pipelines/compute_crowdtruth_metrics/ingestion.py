@@ -0,0 +1,123 @@
+"""Streaming ingestion of the raw Prolific annotations.
+
+The raw export is read in chunks with an explicit schema instead of letting
+pandas infer the dtypes of the whole file. IDs and the (highly repetitive)
+text columns are categorical, so every distinct string is stored once, and
+the batch, list and pair ids are integers. Every chunk is validated before it
+is written to the intermediate Parquet file.
+"""
+
+import logging
+from itertools import count
+from typing import Iterator
+
+import pandas as pd
+
+from .preprocessing import FOUR_LABELS
+
+logger = logging.getLogger(__name__)
+
+ANNOTATIONS_SCHEMA = {
+    # Platform columns
+    "judgment_id": "string",
+    "question_id": "category",
+    "worker_id": "category",
+    "started_time": "string",
+    "submitted_time": "string",
+    # Ids of the PANLI items
+    "batch_id": "Int64",
+    "list_id": "Int64",
+    "pair_id": "Int64",
+    "sent_id": "category",
+    "statement_sent_ids": "category",
+    # Input columns
+    "n_sources": "Int64",
+    "sources": "category",
+    "sentence_predicate": "category",
+    "sentence": "category",
+    "sentence_statement": "category",
+    "statement": "category",
+    "sim": "float64",
+    "source_index": "Int64",
+    "source_text": "category",
+    "true_answer": "category",
+    # Output column
+    "answer_value": "category",
+}
+
+REQUIRED_COLUMNS = ["judgment_id", "question_id", "worker_id", "batch_id", "list_id"]
+ANSWERS = FOUR_LABELS
+
+
+def validate_annotations_chunk(chunk: pd.DataFrame, first_row: int) -> pd.DataFrame:
+    """Checks a chunk of raw annotations.
+
+    Args:
+        chunk: Chunk of the raw annotations.
+        first_row: Row number of the first row of the chunk in the file.
+
+    Returns:
+        The chunk.
+    """
+    rows = f"rows {first_row}-{first_row + len(chunk) - 1}"
+
+    missing_columns = set(ANNOTATIONS_SCHEMA) - set(chunk.columns)
+    if missing_columns:
+        raise ValueError(f"Missing columns in the annotations: {missing_columns}")
+
+    missing_values = chunk[REQUIRED_COLUMNS].isna().sum()
+    missing_values = missing_values[missing_values > 0]
+    if not missing_values.empty:
+        raise ValueError(
+            f"Missing values in {rows} of the annotations: {missing_values.to_dict()}"
+        )
+
+    unknown_answers = set(chunk["answer_value"].dropna().unique()) - set(ANSWERS)
+    if unknown_answers:
+        raise ValueError(f"Unknown answers in {rows}: {unknown_answers}")
+
+    return chunk
+
+
+class AnnotationChunks:
+    """Typed and validated chunks of the raw Prolific annotations.
+
+    The chunks are only read when the object is iterated, e.g. by
+    ``ChunkedParquetDataset`` while it writes them. This is an iterable and
+    not an iterator on purpose: Kedro saves iterator outputs chunk by chunk,
+    each save overwriting the previous one.
+    """
+
+    def __init__(self, input_filepath: str, chunksize: int):
+        self.input_filepath = input_filepath
+        self.chunksize = chunksize
+
+    def __iter__(self) -> Iterator[pd.DataFrame]:
+        reader = pd.read_csv(
+            self.input_filepath,
+            usecols=lambda col: col in ANNOTATIONS_SCHEMA,
+            dtype=ANNOTATIONS_SCHEMA,
+            chunksize=self.chunksize,
+        )
+        with reader:
+            for first_row, chunk in zip(count(0, self.chunksize), reader):
+                yield validate_annotations_chunk(chunk, first_row)
+
+
+def ingest_prolific_annotations(
+    input_filepath: str, chunksize: int = 100_000
+) -> AnnotationChunks:
+    """Streams the raw Prolific annotations in typed and validated chunks.
+
+    The chunks are read lazily, while the output dataset writes them, so only
+    one chunk is in memory at a time.
+
+    Args:
+        input_filepath: Path to input data.
+        chunksize: Number of rows per chunk.
+
+    Returns:
+        Iterable over the chunks of the annotations.
+    """
+    logger.info(f"Ingesting {input_filepath} in chunks of {chunksize} rows")
+    return AnnotationChunks(input_filepath, chunksize)
@@ -1,25 +1,125 @@
 from kedro.pipeline import Pipeline, node, pipeline
+from kedro.pipeline.node import Node
 
+from panli_crowdtruth.text_store import split_texts
+
+from .bootstrap import bootstrap_crowdtruth_metrics
 from .compute_metrics import compute_crowdtruth_metrics
+from .incremental import compute_crowdtruth_metrics_incremental
+from .ingestion import ingest_prolific_annotations
+from .preprocessing import prepare_crowdtruth_judgments_cached
+
+
+def ingestion_node() -> Node:
+    return node(
+        name="ingest_prolific_annotations",
+        func=ingest_prolific_annotations,
+        inputs={
+            "input_filepath": "params:prolific_input_filepath",
+            "chunksize": "params:ingestion_chunksize",
+        },
+        outputs="prolific_annotations_ingested",
+    )
+
+
+def bootstrap_node() -> Node:
+    return node(
+        name="bootstrap_crowdtruth_metrics",
+        func=bootstrap_crowdtruth_metrics,
+        inputs={
+            "df_units": "crowdtruth_units_scores",
+            "df_workers": "crowdtruth_workers_scores",
+            "df_annotations": "crowdtruth_annotations",
+            "df_judgments": "crowdtruth_judgments",
+            "config": "config",
+            "bootstrap": "params:metrics_bootstrap",
+            "convergence": "params:metrics_convergence",
+        },
+        outputs=["crowdtruth_units_with_texts", "crowdtruth_workers"],
+    )
+
+
+def split_unit_texts_node() -> Node:
+    return node(
+        name="split_unit_texts",
+        func=split_texts,
+        inputs="crowdtruth_units_with_texts",
+        outputs=["crowdtruth_units", "crowdtruth_unit_texts"],
+    )
 
 
 def create_pipeline(**kwargs) -> Pipeline:
     return pipeline(
         [
+            node(
+                name="prepare_crowdtruth_judgments",
+                func=prepare_crowdtruth_judgments_cached,
+                inputs={
+                    "input_filepath": "params:prolific_input_filepath",
+                    "n_classes": "params:n_classes",
+                    "cache_dir": "params:crowdtruth_input_cache.dir",
+                    "max_cache_entries": "params:crowdtruth_input_cache.max_entries",
+                    "chunksize": "params:ingestion_chunksize",
+                },
+                outputs=["preprocessed_annotations", "config"],
+            ),
             node(
                 name="compute_crowdtruth_metrics",
                 func=compute_crowdtruth_metrics,
                 inputs={
+                    "data": "preprocessed_annotations",
+                    "config": "config",
+                    "metrics_engine": "params:metrics_engine",
+                    "n_shards": "params:metrics_n_shards",
+                    "parity_check": "params:metrics_parity_check",
+                    "convergence": "params:metrics_convergence",
+                },
+                outputs=[
+                    "crowdtruth_units_scores",
+                    "crowdtruth_workers_scores",
+                    "crowdtruth_annotations",
+                    "crowdtruth_judgments",
+                    "crowdtruth_jobs",
+                    "crowdtruth_convergence",
+                ],
+            ),
+            bootstrap_node(),
+            split_unit_texts_node(),
+        ]
+    )
+
+
+def create_incremental_pipeline(**kwargs) -> Pipeline:
+    return pipeline(
+        [
+            ingestion_node(),
+            node(
+                name="compute_crowdtruth_metrics_incremental",
+                func=compute_crowdtruth_metrics_incremental,
+                inputs={
+                    "df_annotations": "prolific_annotations_ingested",
                     "input_filepath": "params:prolific_input_filepath",
                     "n_classes": "params:n_classes",
+                    "df_previous_units": "previous_crowdtruth_units",
+                    "df_previous_unit_texts": "previous_crowdtruth_unit_texts",
+                    "df_previous_workers": "previous_crowdtruth_workers",
+                    "df_previous_annotations": "previous_crowdtruth_annotations",
+                    "df_previous_judgments": "previous_crowdtruth_judgments",
+                    "df_previous_jobs": "previous_crowdtruth_jobs",
+                    "compare_cold_start": "params:incremental_compare_cold_start",
+                    "convergence": "params:metrics_convergence",
                 },
                 outputs=[
-                    "crowdtruth_units",
-                    "crowdtruth_workers",
+                    "crowdtruth_units_scores",
+                    "crowdtruth_workers_scores",
                     "crowdtruth_annotations",
                     "crowdtruth_judgments",
                     "crowdtruth_jobs",
+                    "crowdtruth_incremental_report",
+                    "config",
                 ],
             ),
+            bootstrap_node(),
+            split_unit_texts_node(),
         ]
     )
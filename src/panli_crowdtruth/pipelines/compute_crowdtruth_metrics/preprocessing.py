@@ -1,77 +1,258 @@
-from typing import Dict, Tuple
+import hashlib
+import json
+import logging
+import os
+import pickle
+from collections import defaultdict
+from typing import TYPE_CHECKING, Any, Dict, Iterable, Tuple, Union
 
-import crowdtruth
 import pandas as pd
-from crowdtruth.configuration import DefaultConfig
-
-
-class BaseConfig(DefaultConfig):
-    inputColumns = [
-        "batch_id",
-        "list_id",
-        "pair_id",
-        "sent_id",
-        "statement_sent_ids",
-        "n_sources",
-        "sources",
-        "sentence_predicate",
-        "sentence",
-        "sentence_statement",
-        "statement",
-        "sim",
-        "source_index",
-        "source_text",
-        "true_answer",
-    ]
-    outputColumns = ["answer_value"]
-    customPlatformColumns = [
-        "judgment_id",
-        "question_id",
-        "worker_id",
-        "started_time",
-        "submitted_time",
-    ]
-    open_ended_task = False
-
-
-class ConfigFourLabels(BaseConfig):
-    annotation_vector = ["agree", "disagree", "partially_agree", "uncertain"]
-
-
-class ConfigThreeLabels(BaseConfig):
-    annotation_vector = ["entailment", "contradiction", "neutral"]
-
-    def processJudgments(self, judgments):
-        for col in self.outputColumns:
-            judgments[col] = judgments[col].replace(
-                {
-                    "agree": "entailment",
-                    "disagree": "contradiction",
-                    "partially_agree": "neutral",
-                    "uncertain": "neutral",
-                }
+
+if TYPE_CHECKING:
+    from crowdtruth.configuration import DefaultConfig
+
+logger = logging.getLogger(__name__)
+
+# Bump to invalidate the cached CrowdTruth input after changing the preprocessing
+CACHE_VERSION = 1
+
+
+FOUR_LABELS = ["agree", "disagree", "partially_agree", "uncertain"]
+THREE_LABELS = ["entailment", "contradiction", "neutral"]
+
+CONFIGS = ["BaseConfig", "ConfigFourLabels", "ConfigThreeLabels"]
+
+
+def __getattr__(name: str) -> Any:
+    # The configurations import crowdtruth, so they are only loaded when used.
+    # Configurations pickled before they moved are found here as well.
+    if name in CONFIGS:
+        from . import configuration
+
+        return getattr(configuration, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def get_config(n_classes: int) -> "DefaultConfig":
+    """Returns the CrowdTruth configuration for the number of classes.
+
+    Args:
+        n_classes: Number of classes (3 or 4) in PANLI dataset.
+    """
+    from .configuration import ConfigFourLabels, ConfigThreeLabels
+
+    if n_classes == 3:
+        return ConfigThreeLabels()
+    elif n_classes == 4:
+        return ConfigFourLabels()
+    else:
+        raise ValueError(f"Unsupported number of classes: {n_classes}")
+
+
+def get_loaded_config(df_annotations: pd.DataFrame, n_classes: int) -> "DefaultConfig":
+    """Returns the configuration that ``crowdtruth.load`` returns for the
+    annotations, with their input and output columns, without loading them.
+
+    Args:
+        df_annotations: Ingested annotations; only their columns are read.
+        n_classes: Number of classes (3 or 4) in PANLI dataset.
+    """
+    from crowdtruth.crowd_platform import get_column_types
+
+    return get_column_types(df_annotations.iloc[:0], get_config(n_classes))
+
+
+def to_crowdtruth_frame(df_annotations: pd.DataFrame) -> pd.DataFrame:
+    """Converts the ingested annotations to the plain columns CrowdTruth expects.
+
+    Categorical columns become object columns; equal strings keep sharing one
+    object, since they are taken from the categories.
+
+    Args:
+        df_annotations: Ingested annotations.
+
+    Returns:
+        Annotations that can be passed to ``crowdtruth.load``.
+    """
+    dtypes = {}
+    for col, dtype in df_annotations.dtypes.items():
+        if isinstance(dtype, pd.CategoricalDtype) or pd.api.types.is_string_dtype(
+            dtype
+        ):
+            dtypes[col] = object
+        elif isinstance(dtype, pd.Int64Dtype) and not df_annotations[col].hasnans:
+            dtypes[col] = "int64"
+    df_annotations = df_annotations.astype(dtypes)
+
+    # Missing values are NaN in CrowdTruth
+    for col, dtype in dtypes.items():
+        if dtype is object:
+            df_annotations[col] = df_annotations[col].where(
+                df_annotations[col].notna(), float("nan")
+            )
+    return df_annotations
+
+
+def concat_crowdtruth_frames(chunks: Iterable[pd.DataFrame]) -> pd.DataFrame:
+    """Converts chunks of the ingested annotations to a single frame for
+    CrowdTruth.
+
+    Every chunk is converted on its own (see ``to_crowdtruth_frame``) as it
+    is read, and the frame CrowdTruth needs is built once from the converted
+    chunks. Concatenating the ingested chunks first would build it twice, as
+    ``pd.concat`` turns categorical columns whose categories differ between
+    chunks into object columns. Equal strings share one object across all
+    chunks.
+
+    Args:
+        chunks: Chunks of the ingested annotations.
+
+    Returns:
+        Annotations that can be passed to ``crowdtruth.load``.
+    """
+    shared: Dict[str, Dict[str, str]] = defaultdict(dict)
+    frames = []
+    for chunk in chunks:
+        categorical = {
+            col: chunk[col].cat.rename_categories(
+                [shared[col].setdefault(value, value) for value in dtype.categories]
             )
-        return judgments
+            for col, dtype in chunk.dtypes.items()
+            if isinstance(dtype, pd.CategoricalDtype)
+        }
+        frames.append(to_crowdtruth_frame(chunk.assign(**categorical)))
+
+    if not frames:
+        raise ValueError("No annotations to preprocess")
+    return pd.concat(frames, ignore_index=True)
+
+
+def name_job(results: Dict[str, pd.DataFrame], name: str) -> None:
+    """Names the job of results that ``crowdtruth.load`` read from a DataFrame.
+
+    Args:
+        results: Results dictionary from ``crowdtruth.load``.
+        name: Name of the job.
+    """
+    results["judgments"]["job"] = name
+    results["jobs"].index = pd.Index([name] * len(results["jobs"]), name="job")
+    if "job" in results["units"].columns:
+        results["units"]["job"] = name
 
 
 def prepare_crowdtruth_judgments(
-    input_filepath: str, n_classes: int
-) -> Tuple[Dict[str, pd.DataFrame], DefaultConfig]:
+    df_annotations: Union[pd.DataFrame, Iterable[pd.DataFrame]],
+    n_classes: int,
+    job_name: str,
+) -> Tuple[Dict[str, pd.DataFrame], "DefaultConfig"]:
     """Preprocesses the input data before computing CrowdTruth metrics.
 
     Args:
-        input_filepath: Path to input data.
+        df_annotations: Ingested annotations, or their chunks.
         n_classes: Number of classes (3 or 4) in PANLI dataset.
+        job_name: Name of the CrowdTruth job.
     """
+    import crowdtruth
+
     # Create config class
-    if n_classes == 3:
-        config_class = ConfigThreeLabels()
-    elif n_classes == 4:
-        config_class = ConfigFourLabels()
+    config_class = get_config(n_classes)
+
+    if isinstance(df_annotations, pd.DataFrame):
+        data_frame = to_crowdtruth_frame(df_annotations)
     else:
-        raise ValueError(f"Unsupported number of classes: {n_classes}")
+        data_frame = concat_crowdtruth_frames(df_annotations)
 
     # Load data with CrowdTruth
-    data, config = crowdtruth.load(file=input_filepath, config=config_class)
+    data, config = crowdtruth.load(data_frame=data_frame, config=config_class)
+    name_job(data, job_name)
+
+    return data, config
+
+
+def crowdtruth_input_key(input_filepath: str, n_classes: int) -> str:
+    """Returns the cache key of the preprocessed CrowdTruth input.
+
+    The key is made from the content of the input file, the schema and checks
+    of the ingestion, the number of classes and the configuration class.
+
+    Args:
+        input_filepath: Path to input data.
+        n_classes: Number of classes (3 or 4) in PANLI dataset.
+    """
+    from .ingestion import ANNOTATIONS_SCHEMA, ANSWERS, REQUIRED_COLUMNS
+
+    digest = hashlib.sha256()
+    with open(input_filepath, "rb") as f:
+        for block in iter(lambda: f.read(1024**2), b""):
+            digest.update(block)
+
+    ingestion = json.dumps(
+        [ANNOTATIONS_SCHEMA, REQUIRED_COLUMNS, ANSWERS], sort_keys=True
+    )
+    config_class = type(get_config(n_classes))
+    digest.update(
+        f"|{ingestion}|{n_classes}"
+        f"|{config_class.__module__}.{config_class.__qualname__}"
+        f"|{CACHE_VERSION}".encode("utf-8")
+    )
+    return digest.hexdigest()
+
+
+def prepare_crowdtruth_judgments_cached(
+    input_filepath: str,
+    n_classes: int,
+    cache_dir: str,
+    max_cache_entries: int = 3,
+    chunksize: int = 100_000,
+) -> Tuple[Dict[str, pd.DataFrame], "DefaultConfig"]:
+    """Ingests and preprocesses the input data for CrowdTruth, or reuses the
+    result of a previous run on the same input (see ``crowdtruth_input_key``).
+
+    The cache is checked before the input is read, so a hit neither parses
+    the CSV nor runs ``crowdtruth.load``. On a miss, the chunks of the
+    ingestion are converted for CrowdTruth as they are read (see
+    ``concat_crowdtruth_frames``). The cache is the only store of the
+    preprocessed input.
+
+    Args:
+        input_filepath: Path to input data, which names the CrowdTruth job.
+        n_classes: Number of classes (3 or 4) in PANLI dataset.
+        cache_dir: Directory of the cached results.
+        max_cache_entries: Number of results kept in the cache; the least
+            recently used ones are removed.
+        chunksize: Number of rows per chunk of the ingestion.
+
+    Returns:
+        Preprocessed annotations and CrowdTruth configuration.
+    """
+    from .ingestion import ingest_prolific_annotations
+
+    key = crowdtruth_input_key(input_filepath, n_classes)
+    cache_path = os.path.join(cache_dir, f"{key}.pickle")
+
+    if os.path.exists(cache_path):
+        logger.info(f"Reusing preprocessed CrowdTruth input {key[:12]}")
+        os.utime(cache_path)
+        with open(cache_path, "rb") as f:
+            return pickle.load(f)
+
+    logger.info("Preprocessing data for CrowdTruth")
+    data, config = prepare_crowdtruth_judgments(
+        ingest_prolific_annotations(input_filepath, chunksize),
+        n_classes,
+        job_name=input_filepath.split(".csv")[0],
+    )
+
+    os.makedirs(cache_dir, exist_ok=True)
+    with open(cache_path, "wb") as f:
+        pickle.dump((data, config), f, protocol=pickle.HIGHEST_PROTOCOL)
+
+    cached = sorted(
+        (os.path.join(cache_dir, file) for file in os.listdir(cache_dir)),
+        key=os.path.getmtime,
+        reverse=True,
+    )
+    for path in cached[max_cache_entries:]:
+        os.remove(path)
 
     return data, config
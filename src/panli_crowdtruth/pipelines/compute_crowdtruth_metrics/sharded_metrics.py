@@ -0,0 +1,359 @@
+"""Sharded computation of the CrowdTruth metrics on a pool of processes.
+
+The UQS, WWA and WSA of a unit or worker only depend on the units and workers
+in its connected component of the bipartite worker-unit graph. The components
+are therefore split over shards, and every shard iterates its own units and
+workers in a separate process. The AQS is the only global score: every
+iteration, the shards send their additive AQS terms to the parent, which sums
+them and sends the new AQS back.
+"""
+
+import logging
+import multiprocessing
+import os
+import time
+from multiprocessing.connection import Connection
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .vectorized_metrics import (
+    ConvergenceCriteria,
+    JudgmentTensor,
+    MetricScores,
+    annotation_quality_terms,
+    combine_annotation_quality_terms,
+    compute_metrics_vectorized,
+    convergence_record,
+    convergence_table,
+    encode_results,
+    initial_scores,
+    store_scores,
+    unit_quality_score,
+    worker_unit_agreement,
+    worker_worker_agreement,
+)
+
+if TYPE_CHECKING:
+    from crowdtruth.configuration import DefaultConfig
+
+logger = logging.getLogger(__name__)
+
+PARITY_TOLERANCE = 1e-9
+# Seconds between the checks that the shard processes are still alive
+POLL_SECONDS = 1.0
+
+
+def worker_unit_components(tensor: JudgmentTensor) -> Tuple[int, np.ndarray]:
+    """Finds the connected components of the bipartite worker-unit graph.
+
+    Args:
+        tensor: Encoded judgments.
+
+    Returns:
+        The number of components and the component of every unit.
+    """
+    from scipy import sparse
+    from scipy.sparse.csgraph import connected_components
+
+    incidence = tensor.incidence()
+    graph = sparse.bmat([[None, incidence], [incidence.T, None]])
+    n_components, component = connected_components(graph, directed=False)
+    return n_components, component[tensor.n_workers :]
+
+
+def split_tensor(
+    tensor: JudgmentTensor, n_shards: int
+) -> List[Tuple[JudgmentTensor, np.ndarray, np.ndarray]]:
+    """Splits the judgments into shards of whole connected components.
+
+    Components are assigned largest first to the shard with the fewest
+    judgments, so the shards are about equally large.
+
+    Args:
+        tensor: Encoded judgments.
+        n_shards: Maximum number of shards.
+
+    Returns:
+        For every shard, its judgments and the positions of its workers and
+        units in ``tensor``.
+    """
+    n_components, unit_component = worker_unit_components(tensor)
+    judgment_component = unit_component[tensor.unit_idx]
+    component_size = np.bincount(judgment_component, minlength=n_components)
+
+    n_shards = min(n_shards, n_components)
+    shard_size = np.zeros(n_shards, dtype=int)
+    component_shard = np.empty(n_components, dtype=int)
+    for component in np.argsort(-component_size, kind="stable"):
+        shard = np.argmin(shard_size)
+        component_shard[component] = shard
+        shard_size[shard] += component_size[component]
+
+    judgment_shard = component_shard[judgment_component]
+    shards = []
+    for shard in range(n_shards):
+        mask = judgment_shard == shard
+        workers, worker_idx = np.unique(tensor.worker_idx[mask], return_inverse=True)
+        units, unit_idx = np.unique(tensor.unit_idx[mask], return_inverse=True)
+        shard_tensor = JudgmentTensor(
+            workers=tensor.workers[workers],
+            units=tensor.units[units],
+            labels=tensor.labels,
+            worker_idx=worker_idx,
+            unit_idx=unit_idx,
+            values=tensor.values[mask],
+        )
+        shards.append((shard_tensor, workers, units))
+
+    logger.info(
+        f"Split {n_components} connected components into {n_shards} shards of "
+        f"{shard_size.min()}-{shard_size.max()} judgments"
+    )
+    return shards
+
+
+def _run_shard(conn: Connection, tensor: JudgmentTensor) -> None:
+    """Iterates the local scores of a shard; runs in a worker process.
+
+    Every message from the parent holds the global AQS of the previous
+    iteration. The shard answers with its AQS terms for the next iteration
+    and the largest and summed changes of its UQS and WQS, or with its final
+    and first iteration scores when the message is ``None``.
+    """
+    scores = initial_scores(tensor)
+    first = None
+
+    while True:
+        aqs = conn.recv()
+        if aqs is None:
+            conn.send((scores, first))
+            break
+
+        numerator, denominator = annotation_quality_terms(
+            tensor, scores.uqs, scores.wqs
+        )
+        uqs = unit_quality_score(tensor, scores.wqs, aqs)
+        wwa = worker_worker_agreement(tensor, scores.uqs, scores.wqs, aqs)
+        wsa = worker_unit_agreement(tensor, scores.uqs, scores.wqs, aqs)
+        new_scores = MetricScores(uqs=uqs, wqs=wwa * wsa, wwa=wwa, wsa=wsa, aqs=aqs)
+
+        uqs_delta = np.abs(new_scores.uqs - scores.uqs)
+        wqs_delta = np.abs(new_scores.wqs - scores.wqs)
+        conn.send(
+            (
+                numerator,
+                denominator,
+                uqs_delta.max(),
+                wqs_delta.max(),
+                uqs_delta.sum(),
+                wqs_delta.sum(),
+            )
+        )
+
+        scores = new_scores
+        if first is None:
+            first = new_scores
+
+
+def iterate_sharded(
+    tensor: JudgmentTensor,
+    n_shards: int,
+    criteria: Optional[ConvergenceCriteria] = None,
+) -> Tuple[MetricScores, MetricScores, pd.DataFrame]:
+    """Iterates the CrowdTruth metrics until convergence on shards of
+    connected components, each in its own process.
+
+    Args:
+        tensor: Encoded judgments.
+        n_shards: Maximum number of shards (and processes).
+        criteria: When to stop iterating.
+
+    Returns:
+        Converged scores, scores after the first iteration, and the time and
+        score changes of every iteration.
+    """
+    criteria = criteria or ConvergenceCriteria()
+    shards = split_tensor(tensor, n_shards)
+
+    # Spawn, so that the shards do not inherit the state of the Kedro process
+    context = multiprocessing.get_context("spawn")
+    connections, processes = [], []
+    for shard_tensor, _, _ in shards:
+        parent_conn, child_conn = context.Pipe()
+        process = context.Process(
+            target=_run_shard, args=(child_conn, shard_tensor), daemon=True
+        )
+        process.start()
+        # Only the shard holds its end, so the pipe closes when the shard dies
+        child_conn.close()
+        connections.append(parent_conn)
+        processes.append(process)
+
+    try:
+        aqs = np.ones(tensor.n_labels)
+        records = []
+        stop_reason = None
+        while stop_reason is None:
+            start = time.perf_counter()
+            for conn in connections:
+                conn.send(aqs)
+            replies = _receive_all(connections, processes)
+
+            numerator = sum(reply[0] for reply in replies)
+            denominator = sum(reply[1] for reply in replies)
+            new_aqs = combine_annotation_quality_terms(numerator, denominator)
+            aqs_delta = np.abs(new_aqs - aqs)
+            aqs = new_aqs
+            if not records:
+                first_aqs = aqs
+
+            records.append(
+                convergence_record(
+                    len(records) + 1,
+                    time.perf_counter() - start,
+                    {
+                        "uqs": sum(reply[4] for reply in replies) / tensor.n_units,
+                        "wqs": sum(reply[5] for reply in replies) / tensor.n_workers,
+                        "aqs": aqs_delta.mean(),
+                    },
+                    {
+                        "uqs": max(reply[2] for reply in replies),
+                        "wqs": max(reply[3] for reply in replies),
+                        "aqs": aqs_delta.max(),
+                    },
+                )
+            )
+            stop_reason = criteria.stop_reason(
+                [record["max_delta"] for record in records]
+            )
+
+        for conn in connections:
+            conn.send(None)
+        shard_scores = _receive_all(connections, processes)
+    finally:
+        for conn in connections:
+            conn.close()
+        for process in processes:
+            process.join(timeout=10)
+            if process.is_alive():
+                process.terminate()
+
+    # The shards only receive the AQS of an iteration with the next one
+    final = _merge_scores(tensor, shards, [scores for scores, _ in shard_scores])
+    final.aqs = aqs
+    first = _merge_scores(tensor, shards, [first for _, first in shard_scores])
+    first.aqs = first_aqs
+    return final, first, convergence_table(records, stop_reason)
+
+
+def _receive_all(
+    connections: List[Connection], processes: List[multiprocessing.Process]
+) -> list:
+    """Receives a message from every shard, and raises an error when a shard
+    process dies instead of waiting for it forever."""
+    messages = []
+    for shard, (conn, process) in enumerate(zip(connections, processes)):
+        while not conn.poll(POLL_SECONDS):
+            if not process.is_alive():
+                break
+        try:
+            messages.append(conn.recv())
+        except EOFError:
+            process.join(timeout=POLL_SECONDS)
+            raise RuntimeError(
+                f"Shard {shard + 1} of {len(processes)} of the CrowdTruth metrics "
+                f"died (exit code {process.exitcode}); see its error above"
+            ) from None
+    return messages
+
+
+def _merge_scores(
+    tensor: JudgmentTensor,
+    shards: List[Tuple[JudgmentTensor, np.ndarray, np.ndarray]],
+    shard_scores: List[MetricScores],
+) -> MetricScores:
+    """Scatters the local scores of the shards into global score arrays."""
+    merged = initial_scores(tensor)
+    for (_, workers, units), scores in zip(shards, shard_scores):
+        merged.uqs[units] = scores.uqs
+        merged.wqs[workers] = scores.wqs
+        merged.wwa[workers] = scores.wwa
+        merged.wsa[workers] = scores.wsa
+    return merged
+
+
+def check_parity(
+    sharded: Dict[str, pd.DataFrame],
+    single: Dict[str, pd.DataFrame],
+    tolerance: float = PARITY_TOLERANCE,
+) -> float:
+    """Checks that the sharded metrics equal the single-shot metrics.
+
+    Args:
+        sharded: Results dictionary of the sharded computation.
+        single: Results dictionary of the single-shot computation.
+        tolerance: Largest allowed absolute difference.
+
+    Returns:
+        The largest absolute difference between the scores.
+    """
+    columns = {
+        "units": ["uqs", "uqs_initial"],
+        "workers": ["wqs", "wwa", "wsa", "wqs_initial", "wwa_initial", "wsa_initial"],
+        "annotations": ["aqs", "aqs_initial"],
+    }
+    max_difference = 0.0
+    for table, cols in columns.items():
+        for col in cols:
+            expected = single[table][col]
+            actual = sharded[table][col].reindex(expected.index)
+            max_difference = max(max_difference, (actual - expected).abs().max())
+
+    if not max_difference <= tolerance:
+        raise ValueError(
+            f"Sharded CrowdTruth metrics differ from the single-shot run by "
+            f"{max_difference} (tolerance {tolerance})"
+        )
+    logger.info(f"Sharded metrics match the single-shot run (max d= {max_difference})")
+    return max_difference
+
+
+def compute_metrics_sharded(
+    results: Dict[str, pd.DataFrame],
+    config: "DefaultConfig",
+    n_shards: int = None,
+    parity_check: bool = False,
+    criteria: Optional[ConvergenceCriteria] = None,
+) -> Dict[str, pd.DataFrame]:
+    """Computes the CrowdTruth metrics on shards of connected components of
+    the worker-unit graph, in parallel processes.
+
+    Args:
+        results: Results dictionary from ``crowdtruth.load``.
+        config: Configuration for CrowdTruth.
+        n_shards: Maximum number of shards (and processes). Defaults to the
+            number of CPUs.
+        parity_check: Whether to also run the single-shot vectorized
+            computation and check that the results are the same.
+        criteria: When to stop iterating, defaults to CrowdTruth's criterion.
+
+    Returns:
+        Results dictionary with the CrowdTruth metrics, and the instrumentation
+        of the iterations under "convergence".
+    """
+    n_shards = n_shards or os.cpu_count()
+    if parity_check:
+        single = compute_metrics_vectorized(
+            {name: df.copy() for name, df in results.items()}, config, criteria
+        )
+
+    tensor = encode_results(results, config)
+    final, first, convergence = iterate_sharded(tensor, n_shards, criteria)
+    results = store_scores(results, config, tensor, final, first)
+    results["convergence"] = convergence
+
+    if parity_check:
+        check_parity(results, single)
+    return results
@@ -0,0 +1,664 @@
+"""Vectorized implementation of the CrowdTruth 2.0 metrics.
+
+The CrowdTruth library keeps every worker vector in a Python ``Counter`` and
+computes the unit, worker and annotation quality scores with nested Python
+loops. This module holds the judgments as a sparse worker x unit x label
+tensor and runs the same iterative UQS/WQS/AQS updates with NumPy and SciPy
+matrix operations.
+"""
+
+import logging
+import time
+from collections import Counter
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+if TYPE_CHECKING:
+    from crowdtruth.configuration import DefaultConfig
+    from scipy import sparse
+
+logger = logging.getLogger(__name__)
+
+SMALL_NUMBER_CONST = 0.00000001
+MAX_DELTA = 0.001
+CONVERGENCE_COLUMNS = [
+    "iteration",
+    "seconds",
+    "max_delta",
+    "uqs_delta_mean",
+    "uqs_delta_max",
+    "wqs_delta_mean",
+    "wqs_delta_max",
+    "aqs_delta_mean",
+    "aqs_delta_max",
+    "stop_reason",
+]
+
+
+@dataclass
+class JudgmentTensor:
+    """Sparse worker x unit x label tensor of judgments.
+
+    Every judgment is stored once as a (worker, unit) coordinate pair with a
+    dense row of label values, so the tensor is kept in COO form.
+
+    Attributes:
+        workers: Worker ids, in the order of the worker codes.
+        units: Unit ids, in the order of the unit codes.
+        labels: Annotation labels, in the order of the label columns.
+        worker_idx: Worker code of every judgment.
+        unit_idx: Unit code of every judgment.
+        values: Judgment x label matrix with the annotation vectors.
+    """
+
+    workers: pd.Index
+    units: pd.Index
+    labels: List[str]
+    worker_idx: np.ndarray
+    unit_idx: np.ndarray
+    values: np.ndarray
+
+    @property
+    def n_workers(self) -> int:
+        return len(self.workers)
+
+    @property
+    def n_units(self) -> int:
+        return len(self.units)
+
+    @property
+    def n_labels(self) -> int:
+        return len(self.labels)
+
+    @classmethod
+    def from_judgments(
+        cls, judgments: pd.DataFrame, col: str, labels: List[str]
+    ) -> "JudgmentTensor":
+        """Encodes the judgments of a CrowdTruth results dictionary.
+
+        Args:
+            judgments: Judgments with 'unit', 'worker' and an annotation vector
+                column.
+            col: Name of the annotation vector column.
+            labels: Annotation labels to encode.
+
+        Returns:
+            The encoded judgment tensor.
+        """
+        # CrowdTruth keeps the last judgment of a worker on a unit
+        judgments = judgments.drop_duplicates(["unit", "worker"], keep="last")
+
+        worker_idx, workers = pd.factorize(judgments["worker"], sort=True)
+        unit_idx, units = pd.factorize(judgments["unit"], sort=True)
+        values = label_matrix(judgments[col], labels)
+
+        return cls(
+            workers=workers,
+            units=units,
+            labels=list(labels),
+            worker_idx=worker_idx,
+            unit_idx=unit_idx,
+            values=values,
+        )
+
+    def label_slice(self, label: int) -> "sparse.csr_matrix":
+        """Returns the worker x unit matrix of a single label."""
+        from scipy import sparse
+
+        return sparse.csr_matrix(
+            (self.values[:, label], (self.worker_idx, self.unit_idx)),
+            shape=(self.n_workers, self.n_units),
+        )
+
+    def incidence(self) -> "sparse.csr_matrix":
+        """Returns the worker x unit matrix of who annotated which unit."""
+        from scipy import sparse
+
+        return sparse.csr_matrix(
+            (np.ones(len(self.worker_idx)), (self.worker_idx, self.unit_idx)),
+            shape=(self.n_workers, self.n_units),
+        )
+
+    def unit_sum(self, weights: np.ndarray) -> np.ndarray:
+        """Sums per-judgment weights (1D) or label rows (2D) per unit."""
+        return _group_sum(self.unit_idx, weights, self.n_units)
+
+    def worker_sum(self, weights: np.ndarray) -> np.ndarray:
+        """Sums per-judgment weights (1D) or label rows (2D) per worker."""
+        return _group_sum(self.worker_idx, weights, self.n_workers)
+
+
+@dataclass
+class MetricScores:
+    """Scores of one iteration of the CrowdTruth metrics."""
+
+    uqs: np.ndarray
+    wqs: np.ndarray
+    wwa: np.ndarray
+    wsa: np.ndarray
+    aqs: np.ndarray
+
+
+@dataclass
+class ConvergenceCriteria:
+    """When to stop iterating the CrowdTruth metrics.
+
+    Attributes:
+        tolerance: Converged when no score changes by this much in an
+            iteration. CrowdTruth uses 0.001.
+        max_iterations: Maximum number of iterations, ``None`` for no limit.
+        patience: Early stopping: stop when the largest change has not
+            decreased by ``min_improvement`` (relative) for this many
+            iterations, e.g. when the scores oscillate. ``None`` disables it.
+        min_improvement: Relative decrease of the largest change that counts
+            as an improvement for early stopping.
+    """
+
+    tolerance: float = MAX_DELTA
+    max_iterations: Optional[int] = None
+    patience: Optional[int] = None
+    min_improvement: float = 0.0
+
+    def __post_init__(self):
+        if self.max_iterations is not None and self.max_iterations < 1:
+            raise ValueError(
+                f"max_iterations must be at least 1: {self.max_iterations}"
+            )
+        if self.patience is not None and self.patience < 1:
+            raise ValueError(f"patience must be at least 1: {self.patience}")
+
+    @classmethod
+    def from_params(cls, params: Optional[Dict[str, Any]]) -> "ConvergenceCriteria":
+        """Reads the criteria from the ``metrics_convergence`` parameters."""
+        params = dict(params or {})
+        early_stopping = params.pop("early_stopping", None) or {}
+        return cls(**params, **early_stopping)
+
+    @property
+    def is_default(self) -> bool:
+        return self == ConvergenceCriteria()
+
+    def stop_reason(self, max_deltas: List[float]) -> Optional[str]:
+        """Decides whether to stop after the latest iteration.
+
+        Args:
+            max_deltas: Largest change of any score in every iteration so far.
+
+        Returns:
+            Why to stop ("converged", "max_iterations" or "early_stopping"),
+            or ``None`` to continue.
+        """
+        if max_deltas[-1] < self.tolerance:
+            return "converged"
+        if self.max_iterations is not None and len(max_deltas) >= self.max_iterations:
+            return "max_iterations"
+        if self.patience is not None and len(max_deltas) > self.patience:
+            best_before = min(max_deltas[: -self.patience])
+            recent = min(max_deltas[-self.patience :])
+            if recent > best_before * (1 - self.min_improvement):
+                return "early_stopping"
+        return None
+
+
+def convergence_record(
+    iteration: int,
+    seconds: float,
+    means: Dict[str, float],
+    maxes: Dict[str, float],
+) -> Dict[str, Any]:
+    """Instrumentation of one iteration: its time and the mean and largest
+    change of the UQS, WQS and AQS."""
+    record = {
+        "iteration": iteration,
+        "seconds": seconds,
+        "max_delta": max(maxes.values()),
+    }
+    for name in ["uqs", "wqs", "aqs"]:
+        record[f"{name}_delta_mean"] = means[name]
+        record[f"{name}_delta_max"] = maxes[name]
+    logger.info(
+        f"{iteration} iterations; max d= {record['max_delta']}"
+        f" ; wqs d= {means['wqs']}; uqs d= {means['uqs']}"
+        f"; aqs d= {means['aqs']}; {seconds:.3f}s"
+    )
+    return record
+
+
+def convergence_table(records: List[Dict[str, Any]], stop_reason: str) -> pd.DataFrame:
+    """Table of the iteration records, with the stop reason on the last one."""
+    records = [dict(record, stop_reason=None) for record in records]
+    if records:
+        records[-1]["stop_reason"] = stop_reason
+        logger.info(f"Stopped after {len(records)} iterations: {stop_reason}")
+    return pd.DataFrame(records, columns=CONVERGENCE_COLUMNS)
+
+
+def label_matrix(vectors: pd.Series, labels: List[str]) -> np.ndarray:
+    """Stacks dict-like annotation vectors into a dense judgment x label matrix.
+
+    Args:
+        vectors: Series of dict-like annotation vectors.
+        labels: Labels to use as columns, missing labels are filled with 0.
+
+    Returns:
+        Float matrix with one row per vector and one column per label.
+    """
+    matrix = np.empty((len(vectors), len(labels)))
+    for i, label in enumerate(labels):
+        matrix[:, i] = np.fromiter(
+            (vector.get(label, 0) for vector in vectors), float, count=len(vectors)
+        )
+    return matrix
+
+
+def _group_sum(idx: np.ndarray, weights: np.ndarray, size: int) -> np.ndarray:
+    if weights.ndim == 1:
+        return np.bincount(idx, weights=weights, minlength=size)
+    return np.stack(
+        [np.bincount(idx, weights=column, minlength=size) for column in weights.T],
+        axis=1,
+    )
+
+
+def _floor(values: np.ndarray) -> np.ndarray:
+    return np.where(values < SMALL_NUMBER_CONST, SMALL_NUMBER_CONST, values)
+
+
+def annotation_quality_terms(
+    tensor: JudgmentTensor, uqs: np.ndarray, wqs: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Computes the numerator and denominator of the AQS for every label.
+
+    For every ordered pair of workers (i, j) that share a unit, the
+    probability that worker i picks a label given that worker j picked it is
+    computed over their shared units, weighted by the UQS. The numerator sums
+    these probabilities weighted by the WQS of both workers, the denominator
+    sums the weights. Both are additive over disjoint sets of workers, since
+    only workers that share a unit form a pair.
+
+    Args:
+        tensor: Encoded judgments.
+        uqs: Unit quality scores of the previous iteration.
+        wqs: Worker quality scores of the previous iteration.
+
+    Returns:
+        The numerators and denominators, one per label.
+    """
+    from scipy import sparse
+
+    weighted_incidence = tensor.incidence() @ sparse.diags(uqs)
+
+    numerator = np.empty(tensor.n_labels)
+    denominator = np.empty(tensor.n_labels)
+    for label in range(tensor.n_labels):
+        label_slice = tensor.label_slice(label)
+
+        # Denominator and numerator per worker pair, summed over shared units
+        pair_denominator = (weighted_incidence @ label_slice.T).tocsr()
+        pair_denominator.eliminate_zeros()
+        pair_numerator = label_slice @ sparse.diags(uqs) @ label_slice.T
+
+        pair_probability = pair_numerator.multiply(pair_denominator.power(-1))
+        pair_present = pair_denominator.sign()
+
+        numerator[label] = wqs @ (pair_probability @ wqs) - np.sum(
+            pair_probability.diagonal() * wqs**2
+        )
+        denominator[label] = wqs @ (pair_present @ wqs) - np.sum(
+            pair_present.diagonal() * wqs**2
+        )
+
+    return numerator, denominator
+
+
+def combine_annotation_quality_terms(
+    numerator: np.ndarray, denominator: np.ndarray
+) -> np.ndarray:
+    """Computes the AQS from the (summed) terms of ``annotation_quality_terms``."""
+    aqs = np.full(len(numerator), SMALL_NUMBER_CONST)
+    np.divide(numerator, denominator, out=aqs, where=denominator > SMALL_NUMBER_CONST)
+    return _floor(aqs)
+
+
+def annotation_quality_score(
+    tensor: JudgmentTensor, uqs: np.ndarray, wqs: np.ndarray
+) -> np.ndarray:
+    """Computes the annotation quality score (AQS) for every label.
+
+    The AQS is the WQS-weighted average, over all pairs of workers that share
+    a unit, of the probability that worker i picks a label given that worker
+    j picked it (see ``annotation_quality_terms``).
+
+    Args:
+        tensor: Encoded judgments.
+        uqs: Unit quality scores of the previous iteration.
+        wqs: Worker quality scores of the previous iteration.
+
+    Returns:
+        The annotation quality scores, one per label.
+    """
+    return combine_annotation_quality_terms(*annotation_quality_terms(tensor, uqs, wqs))
+
+
+def unit_quality_score(
+    tensor: JudgmentTensor, wqs: np.ndarray, aqs: np.ndarray
+) -> np.ndarray:
+    """Computes the unit quality score (UQS) for every unit.
+
+    The UQS is the AQS-weighted cosine similarity between all pairs of worker
+    vectors on a unit, averaged with the WQS of both workers as weights. The
+    sum over pairs is taken from the squared norm of the summed vectors.
+
+    Args:
+        tensor: Encoded judgments.
+        wqs: Worker quality scores of the previous iteration.
+        aqs: Annotation quality scores of the previous iteration.
+
+    Returns:
+        The unit quality scores, one per unit.
+    """
+    wqs_judgment = wqs[tensor.worker_idx]
+    unit_vectors = _normalized_vectors(tensor.values, aqs)
+    weighted_vectors = unit_vectors * wqs_judgment[:, None]
+
+    summed_vectors = tensor.unit_sum(weighted_vectors)
+    numerator = (
+        np.sum(summed_vectors**2, axis=1)
+        - tensor.unit_sum(np.sum(weighted_vectors**2, axis=1))
+    ) / 2
+    denominator = (
+        tensor.unit_sum(wqs_judgment) ** 2 - tensor.unit_sum(wqs_judgment**2)
+    ) / 2
+
+    return numerator / _floor(denominator)
+
+
+def worker_worker_agreement(
+    tensor: JudgmentTensor, uqs: np.ndarray, wqs: np.ndarray, aqs: np.ndarray
+) -> np.ndarray:
+    """Computes the worker-worker agreement (WWA) for every worker.
+
+    The WWA is the AQS-weighted cosine similarity between a worker and all
+    other workers on the same units, averaged with the WQS of the other worker
+    and the UQS of the unit as weights.
+
+    Args:
+        tensor: Encoded judgments.
+        uqs: Unit quality scores of the previous iteration.
+        wqs: Worker quality scores of the previous iteration.
+        aqs: Annotation quality scores of the previous iteration.
+
+    Returns:
+        The worker-worker agreement scores, one per worker.
+    """
+    wqs_judgment = wqs[tensor.worker_idx]
+    uqs_judgment = uqs[tensor.unit_idx]
+    unit_vectors = _normalized_vectors(tensor.values, aqs)
+
+    # Similarity with all other workers = similarity with the unit sum minus self
+    summed_vectors = tensor.unit_sum(unit_vectors * wqs_judgment[:, None])
+    similarity = np.sum(
+        unit_vectors * summed_vectors[tensor.unit_idx], axis=1
+    ) - wqs_judgment * np.sum(unit_vectors**2, axis=1)
+    others_weight = tensor.unit_sum(wqs_judgment)[tensor.unit_idx] - wqs_judgment
+
+    numerator = tensor.worker_sum(similarity * uqs_judgment)
+    denominator = tensor.worker_sum(others_weight * uqs_judgment)
+
+    return numerator / _floor(denominator)
+
+
+def worker_unit_agreement(
+    tensor: JudgmentTensor, uqs: np.ndarray, wqs: np.ndarray, aqs: np.ndarray
+) -> np.ndarray:
+    """Computes the worker-unit agreement (WSA) for every worker.
+
+    The WSA is the AQS-weighted cosine similarity between a worker vector and
+    the WQS-weighted unit vector without that worker, averaged over the units
+    of the worker with the UQS as weights.
+
+    Args:
+        tensor: Encoded judgments.
+        uqs: Unit quality scores of the previous iteration.
+        wqs: Worker quality scores of the previous iteration.
+        aqs: Annotation quality scores of the previous iteration.
+
+    Returns:
+        The worker-unit agreement scores, one per worker.
+    """
+    wqs_judgment = wqs[tensor.worker_idx]
+    uqs_judgment = uqs[tensor.unit_idx]
+
+    worker_vectors = tensor.values * wqs_judgment[:, None]
+    unit_vectors = tensor.unit_sum(worker_vectors)[tensor.unit_idx]
+    rest_vectors = unit_vectors - worker_vectors
+
+    numerator = np.sum(aqs * worker_vectors * rest_vectors, axis=1)
+    norm = np.sqrt(
+        np.sum(aqs * worker_vectors**2, axis=1) * np.sum(aqs * rest_vectors**2, axis=1)
+    )
+    cosine = np.full(len(norm), SMALL_NUMBER_CONST)
+    np.divide(numerator, norm, out=cosine, where=norm >= SMALL_NUMBER_CONST)
+
+    numerator = tensor.worker_sum(cosine * uqs_judgment)
+    denominator = tensor.worker_sum(uqs_judgment)
+
+    return numerator / _floor(denominator)
+
+
+def unit_annotation_score(tensor: JudgmentTensor, wqs: np.ndarray) -> np.ndarray:
+    """Computes the WQS-weighted share of workers picking each label per unit.
+
+    Args:
+        tensor: Encoded judgments.
+        wqs: Worker quality scores.
+
+    Returns:
+        Unit x label matrix with the unit annotation scores.
+    """
+    wqs_judgment = wqs[tensor.worker_idx]
+    numerator = tensor.unit_sum(tensor.values * wqs_judgment[:, None])
+    denominator = tensor.unit_sum(wqs_judgment)
+    return numerator / _floor(denominator)[:, None]
+
+
+def _normalized_vectors(values: np.ndarray, aqs: np.ndarray) -> np.ndarray:
+    """Scales vectors so their dot product is the AQS-weighted cosine."""
+    weighted = values * np.sqrt(aqs)
+    return weighted / np.linalg.norm(weighted, axis=1)[:, None]
+
+
+def iterate_metrics(tensor: JudgmentTensor, scores: MetricScores) -> MetricScores:
+    """Runs a single iteration of the CrowdTruth metrics.
+
+    All scores are computed from the scores of the previous iteration.
+
+    Args:
+        tensor: Encoded judgments.
+        scores: Scores of the previous iteration.
+
+    Returns:
+        Scores of the current iteration.
+    """
+    aqs = annotation_quality_score(tensor, scores.uqs, scores.wqs)
+    uqs = unit_quality_score(tensor, scores.wqs, scores.aqs)
+    wwa = worker_worker_agreement(tensor, scores.uqs, scores.wqs, scores.aqs)
+    wsa = worker_unit_agreement(tensor, scores.uqs, scores.wqs, scores.aqs)
+
+    return MetricScores(uqs=uqs, wqs=wwa * wsa, wwa=wwa, wsa=wsa, aqs=aqs)
+
+
+def initial_scores(tensor: JudgmentTensor) -> MetricScores:
+    """Returns the scores CrowdTruth starts iterating from."""
+    return MetricScores(
+        uqs=np.ones(tensor.n_units),
+        wqs=np.ones(tensor.n_workers),
+        wwa=np.ones(tensor.n_workers),
+        wsa=np.ones(tensor.n_workers),
+        aqs=np.ones(tensor.n_labels),
+    )
+
+
+def _unit_annotation_counters(
+    tensor: JudgmentTensor, scores: np.ndarray, unit_vectors: pd.Series
+) -> pd.Series:
+    """Wraps unit annotation scores in Counters, in the label order of the unit."""
+    label_position = {label: i for i, label in enumerate(tensor.labels)}
+    counters = {}
+    for unit, unit_scores in zip(tensor.units, scores):
+        counters[unit] = Counter(
+            {
+                label: unit_scores[label_position[label]]
+                for label in unit_vectors[unit].keys()
+            }
+        )
+    return pd.Series(counters)
+
+
+def encode_results(
+    results: Dict[str, pd.DataFrame], config: "DefaultConfig"
+) -> JudgmentTensor:
+    """Encodes the judgments from ``crowdtruth.load`` as a ``JudgmentTensor``.
+
+    Labels are ordered as they first appear in the unit vectors.
+
+    Args:
+        results: Results dictionary from ``crowdtruth.load``.
+        config: Configuration for CrowdTruth.
+
+    Returns:
+        Encoded judgments.
+    """
+    if config.open_ended_task:
+        raise ValueError("The vectorized metrics only support closed tasks")
+
+    col = list(config.output.values())[0]
+    unit_vectors = results["units"][col]
+
+    labels = list(unit_vectors.iloc[0].keys())
+    for vector in unit_vectors:
+        labels.extend(label for label in vector if label not in labels)
+
+    return JudgmentTensor.from_judgments(results["judgments"], col, labels)
+
+
+def iterate_until_convergence(
+    tensor: JudgmentTensor,
+    scores: MetricScores,
+    criteria: Optional[ConvergenceCriteria] = None,
+) -> Tuple[List[MetricScores], pd.DataFrame]:
+    """Iterates the CrowdTruth metrics until the convergence criteria are met,
+    by default until no score changes by ``MAX_DELTA``.
+
+    Args:
+        tensor: Encoded judgments.
+        scores: Scores to start iterating from.
+        criteria: When to stop iterating.
+
+    Returns:
+        Scores of every iteration, starting with ``scores``, and the time and
+        score changes of every iteration.
+    """
+    criteria = criteria or ConvergenceCriteria()
+    history = [scores]
+    records = []
+    stop_reason = None
+    while stop_reason is None:
+        start = time.perf_counter()
+        new_scores = iterate_metrics(tensor, scores)
+
+        deltas = {
+            name: np.abs(getattr(new_scores, name) - getattr(scores, name))
+            for name in ["uqs", "wqs", "aqs"]
+        }
+        records.append(
+            convergence_record(
+                len(history),
+                time.perf_counter() - start,
+                {name: delta.mean() for name, delta in deltas.items()},
+                {name: delta.max() for name, delta in deltas.items()},
+            )
+        )
+
+        scores = new_scores
+        history.append(scores)
+        stop_reason = criteria.stop_reason([record["max_delta"] for record in records])
+
+    return history, convergence_table(records, stop_reason)
+
+
+def store_scores(
+    results: Dict[str, pd.DataFrame],
+    config: "DefaultConfig",
+    tensor: JudgmentTensor,
+    scores: MetricScores,
+    first: MetricScores,
+) -> Dict[str, pd.DataFrame]:
+    """Adds the converged and first-iteration scores to the results.
+
+    Args:
+        results: Results dictionary from ``crowdtruth.load``.
+        config: Configuration for CrowdTruth.
+        tensor: Encoded judgments.
+        scores: Converged scores.
+        first: Scores after the first iteration from a cold start.
+
+    Returns:
+        Results dictionary with the CrowdTruth metrics.
+    """
+    col = list(config.output.values())[0]
+    unit_vectors = results["units"][col]
+
+    uas = unit_annotation_score(tensor, scores.wqs)
+    uas_initial = unit_annotation_score(tensor, np.ones(tensor.n_workers))
+
+    results["units"]["uqs"] = pd.Series(scores.uqs, index=tensor.units)
+    results["units"]["unit_annotation_score"] = _unit_annotation_counters(
+        tensor, uas, unit_vectors
+    )
+    results["workers"]["wqs"] = pd.Series(scores.wqs, index=tensor.workers)
+    results["workers"]["wwa"] = pd.Series(scores.wwa, index=tensor.workers)
+    results["workers"]["wsa"] = pd.Series(scores.wsa, index=tensor.workers)
+    results["annotations"]["aqs"] = pd.Series(scores.aqs, index=tensor.labels)
+
+    results["units"]["uqs_initial"] = pd.Series(first.uqs, index=tensor.units)
+    results["units"]["unit_annotation_score_initial"] = _unit_annotation_counters(
+        tensor, uas_initial, unit_vectors
+    )
+    results["workers"]["wqs_initial"] = pd.Series(first.wqs, index=tensor.workers)
+    results["workers"]["wwa_initial"] = pd.Series(first.wwa, index=tensor.workers)
+    results["workers"]["wsa_initial"] = pd.Series(first.wsa, index=tensor.workers)
+    results["annotations"]["aqs_initial"] = pd.Series(first.aqs, index=tensor.labels)
+
+    return results
+
+
+def compute_metrics_vectorized(
+    results: Dict[str, pd.DataFrame],
+    config: "DefaultConfig",
+    criteria: Optional[ConvergenceCriteria] = None,
+) -> Dict[str, pd.DataFrame]:
+    """Iteratively computes the CrowdTruth metrics with matrix operations.
+
+    Drop-in replacement for ``crowdtruth.run`` for closed tasks: the results
+    dictionary from ``crowdtruth.load`` is extended with the same columns.
+
+    Args:
+        results: Results dictionary from ``crowdtruth.load``.
+        config: Configuration for CrowdTruth.
+        criteria: When to stop iterating, defaults to CrowdTruth's criterion.
+
+    Returns:
+        Results dictionary with the CrowdTruth metrics, and the instrumentation
+        of the iterations under "convergence".
+    """
+    tensor = encode_results(results, config)
+    history, convergence = iterate_until_convergence(
+        tensor, initial_scores(tensor), criteria
+    )
+    results = store_scores(results, config, tensor, history[-1], history[1])
+    results["convergence"] = convergence
+    return results
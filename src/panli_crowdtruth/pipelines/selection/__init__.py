@@ -1 +1 @@
-from .pipeline import create_pipeline  # NOQA
+from .pipeline import create_pipeline, create_sweep_pipeline  # NOQA
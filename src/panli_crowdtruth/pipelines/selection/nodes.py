@@ -1,11 +1,95 @@
-from typing import Tuple
+from typing import Dict, List, Tuple
 
+import numpy as np
 import pandas as pd
 
 
+def rank_judgments_by_wqs(df_judgment_facts: pd.DataFrame) -> pd.Series:
+    """Rank the judgments of each unit by the quality score (WQS) of the worker.
+
+    The judgments are sorted once on (unit, -wqs) with a stable sort, so ties
+    keep the order of the judgments and workers without a WQS come last.
+
+    Args:
+        df_judgment_facts: DataFrame containing the judgment facts, indexed by
+            judgment. Must contain 'unit' and 'wqs' columns.
+
+    Returns:
+        pd.Series: Rank (starting at 0) of every judgment within its unit,
+            indexed by judgment, in the order of the judgment facts.
+    """
+    # Rank judgments within each unit
+    ranked = (
+        df_judgment_facts[["unit", "wqs"]]
+        .reset_index(drop=True)
+        .sort_values(["unit", "wqs"], ascending=[True, False], kind="stable")
+    )
+    rank = np.empty(len(ranked), dtype=np.int64)
+    rank[ranked.index] = ranked.groupby("unit", sort=False, observed=True).cumcount()
+
+    return pd.Series(rank, index=df_judgment_facts.index, name="rank")
+
+
+def rank_annotations(
+    rank: pd.Series, df_prolific_annotations: pd.DataFrame
+) -> pd.Series:
+    """Look up the rank of every annotation by its judgment id.
+
+    The judgment facts usually hold the annotations in the same order, as
+    CrowdTruth keeps the order of its input. The ranks are then taken by
+    position, after comparing the ids once; otherwise they are joined on the
+    judgment ids, which hashes the ids of both sides.
+
+    Args:
+        rank: Rank of every judgment within its unit, indexed by judgment.
+        df_prolific_annotations: DataFrame containing Prolific annotations.
+
+    Returns:
+        Rank of every annotation, aligned with df_prolific_annotations; NaN
+        for the annotations without a judgment fact.
+    """
+    judgment_ids = df_prolific_annotations["judgment_id"]
+    if len(rank) == len(judgment_ids) and np.array_equal(
+        rank.index.to_numpy(dtype=object), judgment_ids.to_numpy(dtype=object)
+    ):
+        return pd.Series(
+            rank.to_numpy(dtype=float), index=df_prolific_annotations.index, name="rank"
+        )
+
+    return df_prolific_annotations.join(rank, on="judgment_id")["rank"]
+
+
+def select_top_n_workers(
+    df_prolific_annotations: pd.DataFrame,
+    df_prolific_workers: pd.DataFrame,
+    annotation_rank: pd.Series,
+    n_workers: int,
+) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """Select the annotations ranked within the top N of their unit, and the
+    workers that made them.
+
+    Args:
+        df_prolific_annotations: DataFrame containing Prolific annotations.
+        df_prolific_workers: DataFrame containing Prolific workers.
+        annotation_rank: Rank of every annotation within its unit, aligned with
+            df_prolific_annotations. Annotations without a rank (without a
+            judgment fact) are kept.
+        n_workers: Number of workers to keep per unit.
+
+    Returns:
+        Selected annotations and workers.
+    """
+    selected = annotation_rank.isna() | (annotation_rank < n_workers)
+    df_annotations_selected = df_prolific_annotations[selected]
+    df_workers_selected = df_prolific_workers[
+        df_prolific_workers.worker_id.isin(df_annotations_selected.worker_id)
+    ]
+
+    return df_annotations_selected, df_workers_selected
+
+
 def balance_number_of_workers(
-    df_crowdtruth_workers: pd.DataFrame,
-    df_crowdtruth_judgments: pd.DataFrame,
+    df_judgment_facts: pd.DataFrame,
     df_prolific_annotations: pd.DataFrame,
     df_prolific_workers: pd.DataFrame,
     n_workers: int = 10,
@@ -13,33 +97,61 @@ def balance_number_of_workers(
     """Select top N workers per unit. This is done to balance the number of
     participants per unit.
 
-
+    Judgments that CrowdTruth did not score (e.g. units with a single
+    judgment) are kept.
     """
 
-    # Merge judgments and workers
-    workers_merge = df_crowdtruth_workers.reset_index()[["worker", "wqs"]]
-    merged = df_crowdtruth_judgments.reset_index().merge(
-        workers_merge, on="worker", how="left"
+    # Find top N workers per unit
+    rank = rank_judgments_by_wqs(df_judgment_facts)
+    annotation_rank = rank_annotations(rank, df_prolific_annotations)
+
+    # Drop from data
+    return select_top_n_workers(
+        df_prolific_annotations, df_prolific_workers, annotation_rank, n_workers
     )
 
-    # Find top 10 workers per unit
-    to_drop = []
-    for _, unit_judgments in merged.groupby("unit"):
-        n_judgments = len(unit_judgments)
-        if n_judgments > n_workers:
-            drop_judgments = (
-                unit_judgments.sort_values("wqs", ascending=False)
-                .iloc[n_workers:]
-                .judgment.tolist()
-            )
-            to_drop.extend(drop_judgments)
 
-    # Drop from data
-    df_annotations_selected = df_prolific_annotations[
-        ~df_prolific_annotations.judgment_id.isin(to_drop)
-    ]
-    df_workers_selected = df_prolific_workers[
-        df_prolific_workers.worker_id.isin(df_annotations_selected.worker_id)
-    ]
+def balance_number_of_workers_sweep(
+    df_judgment_facts: pd.DataFrame,
+    df_prolific_annotations: pd.DataFrame,
+    df_prolific_workers: pd.DataFrame,
+    n_workers_sweep: List[int],
+) -> Tuple[Dict[str, pd.DataFrame], Dict[str, pd.DataFrame], pd.DataFrame]:
+    """Select top N workers per unit for several values of N at once.
 
-    return df_annotations_selected, df_workers_selected
+    The judgments are ranked by WQS once, and that ranking is sliced for every
+    requested N.
+
+    Args:
+        df_judgment_facts: DataFrame containing the judgment facts.
+        df_prolific_annotations: DataFrame containing Prolific annotations.
+        df_prolific_workers: DataFrame containing Prolific workers.
+        n_workers_sweep: Values of N to select the annotations for.
+
+    Returns:
+        Selected annotations and workers per N (keyed by partition name), and a
+        summary of the number of judgments and workers kept for every N.
+    """
+    # Rank judgments once for all values of N
+    rank = rank_judgments_by_wqs(df_judgment_facts)
+    annotation_rank = rank_annotations(rank, df_prolific_annotations)
+
+    annotations_selected = {}
+    workers_selected = {}
+    summary = []
+    for n_workers in n_workers_sweep:
+        df_annotations, df_workers = select_top_n_workers(
+            df_prolific_annotations, df_prolific_workers, annotation_rank, n_workers
+        )
+        partition = f"n_workers_{n_workers}"
+        annotations_selected[partition] = df_annotations
+        workers_selected[partition] = df_workers
+        summary.append(
+            {
+                "n_workers": n_workers,
+                "judgments": len(df_annotations),
+                "workers": df_workers.worker_id.nunique(),
+            }
+        )
+
+    return annotations_selected, workers_selected, pd.DataFrame(summary)
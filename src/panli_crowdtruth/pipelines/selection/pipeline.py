@@ -1,6 +1,6 @@
 from kedro.pipeline import Pipeline, node, pipeline
 
-from .nodes import balance_number_of_workers
+from .nodes import balance_number_of_workers, balance_number_of_workers_sweep
 
 
 def create_pipeline(**kwargs) -> Pipeline:
@@ -10,12 +10,34 @@ def create_pipeline(**kwargs) -> Pipeline:
                 name="balance_number_of_workers",
                 func=balance_number_of_workers,
                 inputs={
-                    "df_crowdtruth_workers": "crowdtruth_workers",
-                    "df_crowdtruth_judgments": "crowdtruth_judgments",
+                    "df_judgment_facts": "judgment_facts",
                     "df_prolific_annotations": "prolific_annotations_all",
                     "df_prolific_workers": "prolific_workers_all",
+                    "n_workers": "params:n_workers",
                 },
                 outputs=["prolific_annotations_final", "prolific_workers_final"],
             ),
         ]
     )
+
+
+def create_sweep_pipeline(**kwargs) -> Pipeline:
+    return pipeline(
+        [
+            node(
+                name="balance_number_of_workers_sweep",
+                func=balance_number_of_workers_sweep,
+                inputs={
+                    "df_judgment_facts": "judgment_facts",
+                    "df_prolific_annotations": "prolific_annotations_all",
+                    "df_prolific_workers": "prolific_workers_all",
+                    "n_workers_sweep": "params:n_workers_sweep",
+                },
+                outputs=[
+                    "prolific_annotations_sweep",
+                    "prolific_workers_sweep",
+                    "selection_sweep_summary",
+                ],
+            ),
+        ]
+    )
@@ -0,0 +1,124 @@
+"""Deduplicated store of the text columns of the CrowdTruth units.
+
+The sentence, statement and source columns of the units repeat the same
+strings for every unit that shares a sentence, a statement or a source across
+pairs and lists, and the same sentence appears in several columns. Before the
+units are stored, ``split_texts`` moves every distinct string of these columns
+into a single text table, and replaces every column by integer references to
+it (``<column>#text``, -1 for a missing text). None of the metrics or analyses
+read the texts, so they are only joined back with ``join_texts`` where they
+are needed, e.g. to export the units or to merge them with new batches.
+
+Example:
+
+.. code-block:: python
+
+    df_units, df_texts = split_texts(df_crowdtruth_units)
+    df_units = join_texts(df_units, df_texts, ["input.statement"])
+"""
+
+import logging
+from typing import List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+TEXT_COLUMNS = [
+    "input.sentence",
+    "input.statement",
+    "input.sentence_statement",
+    "input.sources",
+    "input.source_text",
+]
+TEXT_ID_SUFFIX = "#text"
+
+
+def text_id_column(col: str) -> str:
+    """Name of the column with the references to the texts of `col`."""
+    return col + TEXT_ID_SUFFIX
+
+
+def split_texts(
+    df: pd.DataFrame, columns: List[str] = TEXT_COLUMNS
+) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """Moves the distinct strings of text columns into a text table.
+
+    The strings of every column are factorized through their categories, so
+    every distinct string is hashed once per column.
+
+    Args:
+        df: Table with text columns, e.g. the CrowdTruth units.
+        columns: Names of the text columns; those missing from `df` are
+            skipped.
+
+    Returns:
+        The table with the integer references (``int32``, -1 for a missing
+        text) in place of the text columns, and the text table with one row
+        per distinct string, indexed by 'text_id'.
+    """
+    columns = [col for col in columns if col in df.columns]
+    values = {col: pd.Categorical(df[col]) for col in columns}
+    texts = pd.Index(
+        pd.unique(
+            np.concatenate(
+                [np.empty(0, dtype=object)]
+                + [value.categories.to_numpy(dtype=object) for value in values.values()]
+            )
+        )
+    )
+
+    refs = df.copy()
+    for col, value in values.items():
+        # Text id of every category, then of every row (code -1 stays -1)
+        text_ids = np.append(texts.get_indexer(value.categories), -1)
+        position = refs.columns.get_loc(col)
+        refs = refs.drop(columns=col)
+        refs.insert(
+            position,
+            text_id_column(col),
+            text_ids[value.codes].astype(np.int32),
+        )
+
+    df_texts = pd.DataFrame(
+        {"text": texts.to_numpy()}, index=pd.RangeIndex(len(texts), name="text_id")
+    )
+
+    logger.info(
+        f"Stored {len(texts)} distinct texts of {len(columns)} columns "
+        f"and {len(df)} rows"
+    )
+    return refs, df_texts
+
+
+def join_texts(
+    df: pd.DataFrame, df_texts: pd.DataFrame, columns: Optional[List[str]] = None
+) -> pd.DataFrame:
+    """Restores text columns moved to a text table by ``split_texts``.
+
+    Args:
+        df: Table with references to the texts.
+        df_texts: Text table returned by ``split_texts``.
+        columns: Names of the text columns to restore, defaults to all the
+            columns with references in `df`.
+
+    Returns:
+        The table with the text columns in place of their references, as
+        categoricals of the texts.
+    """
+    if columns is None:
+        columns = [
+            col[: -len(TEXT_ID_SUFFIX)]
+            for col in df.columns
+            if col.endswith(TEXT_ID_SUFFIX)
+        ]
+
+    texts = pd.Index(df_texts["text"])
+    df = df.copy()
+    for col in columns:
+        ref_col = text_id_column(col)
+        position = df.columns.get_loc(ref_col)
+        codes = df.pop(ref_col).to_numpy()
+        df.insert(position, col, pd.Categorical.from_codes(codes, categories=texts))
+    return df
@@ -0,0 +1,40 @@
+"""Synthetic studies for the benchmarks."""
+
+from collections import Counter
+
+import pandas as pd
+import pytest
+
+from panli_crowdtruth.benchmarks.synthetic import (
+    SyntheticStudy,
+    crowdtruth_results,
+    generate_study,
+)
+from panli_crowdtruth.pipelines.compute_crowdtruth_metrics.preprocessing import (
+    prepare_crowdtruth_judgments,
+)
+
+pytest.importorskip("crowdtruth")
+
+
+@pytest.mark.parametrize("n_classes", [3, 4])
+def test_crowdtruth_results_match_crowdtruth_load(n_classes):
+    annotations, _ = generate_study(SyntheticStudy(n_units=60, workers_per_unit=5))
+    expected, expected_config = prepare_crowdtruth_judgments(
+        annotations, n_classes, "synthetic"
+    )
+    actual, config = crowdtruth_results(annotations, n_classes, "synthetic")
+
+    assert config.input == expected_config.input
+    assert config.output == expected_config.output
+    assert list(actual) == list(expected)
+    for name, want in expected.items():
+        got = actual[name]
+        for col in want.columns:
+            if isinstance(want[col].iloc[0], Counter):
+                # Same counts, with the labels in the same order
+                assert [list(x.items()) for x in got[col]] == [
+                    list(x.items()) for x in want[col]
+                ], (name, col)
+                got, want = got.drop(columns=col), want.drop(columns=col)
+        pd.testing.assert_frame_equal(got, want, obj=name)
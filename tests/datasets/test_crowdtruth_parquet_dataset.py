@@ -0,0 +1,30 @@
+"""Round trip of CrowdTruth results through ``CrowdTruthParquetDataset``."""
+
+from collections import Counter
+
+import pandas as pd
+
+from panli_crowdtruth.datasets import CrowdTruthParquetDataset
+
+
+def test_counters_keep_their_labels_and_order(tmp_path):
+    df = pd.DataFrame(
+        {
+            "unit_annotation_score": [
+                Counter({"agree, mostly": 0.25, "disagree": 0.75}),
+                Counter(),
+                Counter({"disagree": 1.0, "agree, mostly": 0.0}),
+            ],
+            "output.answer_value": [Counter({"a": 2}), Counter({"b": 1}), Counter()],
+        },
+        index=pd.Index(["u1", "u2", "u3"], name="unit"),
+    )
+    dataset = CrowdTruthParquetDataset(str(tmp_path / "units.parquet"))
+    dataset.save(df)
+    loaded = dataset.load()
+
+    for col in df.columns:
+        assert [list(x.items()) for x in loaded[col]] == [
+            list(x.items()) for x in df[col]
+        ]
+        assert all(isinstance(x, Counter) for x in loaded[col])
@@ -0,0 +1,47 @@
+"""Correlation of the answers per unit."""
+
+import numpy as np
+import pandas as pd
+
+from panli_crowdtruth.pipelines.analysis.annotations import label_count_matrix
+
+
+def _facts():
+    rng = np.random.default_rng(0)
+    n = 200
+    units = [f"unit_{i}" for i in range(20)]
+    relations = pd.Series(
+        rng.choice(["believe", "say", None], size=len(units)), index=units
+    )
+    unit = rng.choice(units, size=n)
+    return pd.DataFrame(
+        {
+            # A unit without judgments and a label that nobody picked
+            "unit": pd.Categorical(unit, categories=units + ["unit_unused"]),
+            "answer": pd.Categorical(
+                rng.choice(["agree", "disagree", "partially_agree"], size=n),
+                categories=["agree", "disagree", "partially_agree", "uncertain"],
+            ),
+            "relation": relations.reindex(unit).to_numpy(),
+        }
+    )
+
+
+def test_label_counts_match_pivot_table():
+    facts = _facts()
+
+    counts = label_count_matrix(facts)
+
+    # Counts of the baseline, from the answer strings
+    df = facts.astype({"unit": str, "answer": str})
+    expected = (
+        df.groupby(["unit", "relation"])["answer"]
+        .value_counts()
+        .to_frame("answer_count")
+        .pivot_table("answer_count", "unit", "answer")
+        .fillna(0)
+    )
+    pd.testing.assert_frame_equal(
+        counts.astype(float), expected, check_names=False, check_like=True
+    )
+    assert not counts.corr().isna().any().any()
@@ -0,0 +1,29 @@
+"""Export of the analysis figures."""
+
+import os
+import shutil
+
+import plotly.graph_objects as go
+
+from panli_crowdtruth.pipelines.analysis.figure_cache import FigureCache
+from panli_crowdtruth.pipelines.analysis.rendering import image_path, render_figures
+
+
+def test_cached_html_exports_share_plotlyjs(tmp_path):
+    dir_images = str(tmp_path)
+    figures = {"bar": go.Figure(go.Bar(y=[1, 3, 2]))}
+    html_dir = os.path.dirname(image_path(dir_images, "bar", "html"))
+
+    render_figures(figures, dir_images, cache=FigureCache(dir_images), formats=["html"])
+    shutil.rmtree(html_dir)
+    render_times = render_figures(
+        figures, dir_images, cache=FigureCache(dir_images), formats=["html"]
+    )
+
+    assert render_times["cached"].iloc[0]
+    path = image_path(dir_images, "bar", "html")
+    # The export loads plotly.js from its directory instead of embedding it
+    assert os.path.getsize(path) < 100_000
+    with open(path, encoding="utf-8") as f:
+        assert 'src="plotly.min.js"' in f.read()
+    assert os.path.exists(os.path.join(html_dir, "plotly.min.js"))
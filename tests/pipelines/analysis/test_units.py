@@ -0,0 +1,103 @@
+"""Preprocessing and trendlines of the units."""
+
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+
+from panli_crowdtruth.pipelines.analysis.units import (
+    grouped_linear_fit,
+    preprocess_units,
+)
+
+LABELS = ["agree", "disagree", "partially_agree", "uncertain"]
+
+
+def _units(n=60):
+    rng = np.random.default_rng(0)
+    # Counters in different label orders, with tied scores
+    scores = [
+        Counter(
+            {
+                label: rng.integers(0, 4) / 4
+                for label in rng.permutation(LABELS)[: rng.integers(2, 5)]
+            }
+        )
+        for _ in range(n)
+    ]
+    sent_ids = rng.integers(0, 5, size=n)
+    return pd.DataFrame(
+        {
+            "unit_annotation_score": scores,
+            "input.true_answer": rng.choice(["agree", "disagree", None], size=n),
+            "input.n_sources": rng.integers(0, 3, size=n),
+            "input.source_index": rng.integers(0, 3, size=n),
+            "input.sent_id": [f"s{i}" for i in sent_ids],
+            "input.statement_sent_ids": [
+                str([f"s{i}" for i in rng.choice(5, size=2, replace=False)])
+                for _ in range(n)
+            ],
+        },
+        index=pd.Index([f"unit_{i}" for i in range(n)], name="unit"),
+    )
+
+
+def test_preprocess_units_matches_row_wise_baseline():
+    units = _units()
+
+    preprocessed = preprocess_units(units)
+
+    # Row by row, like before the vectorization
+    most_common = units["unit_annotation_score"].apply(lambda x: x.most_common())
+    relation = units.apply(
+        lambda row: (
+            "intra-sentence"
+            if row["input.sent_id"] in row["input.statement_sent_ids"]
+            else "inter-sentence"
+        ),
+        axis=1,
+    )
+    true_answer = units["input.true_answer"].fillna("unknown")
+    expected = pd.DataFrame(
+        {
+            "dominant_answer": most_common.apply(lambda x: x[0][0]),
+            "second_answer": most_common.apply(lambda x: x[1][0]),
+            "dominant_aqs": most_common.apply(lambda x: x[0][1]),
+            "additional_sources": units["input.n_sources"].apply(lambda x: x > 0),
+            "with_context": (relation == "inter-sentence") | (true_answer != "agree"),
+            "source_type": units["input.source_index"].apply(
+                lambda x: "author" if x == 0 else "additional_source"
+            ),
+            "relation": relation,
+        }
+    )
+    pd.testing.assert_frame_equal(preprocessed[expected.columns], expected)
+
+
+def test_grouped_linear_fit_matches_ols_per_group():
+    import statsmodels.api as sm
+
+    rng = np.random.default_rng(0)
+    n = 300
+    df = pd.DataFrame(
+        {
+            "dominant_answer": rng.choice(["agree", "disagree", "uncertain"], size=n),
+            "input.sim": rng.random(n),
+        }
+    )
+    df["uqs"] = 0.3 + 0.5 * df["input.sim"] + rng.normal(0, 0.1, size=n)
+    # Missing values are left out of the fit
+    df.loc[df.index[::17], "uqs"] = np.nan
+
+    fits = grouped_linear_fit(df, "input.sim", "uqs", "dominant_answer")
+
+    for _, fit in fits.iterrows():
+        group = df[df["dominant_answer"] == fit["dominant_answer"]]
+        ols = sm.OLS(
+            group["uqs"], sm.add_constant(group["input.sim"]), missing="drop"
+        ).fit()
+        assert fit["n"] == ols.nobs
+        np.testing.assert_allclose(
+            [fit["intercept"], fit["slope"], fit["r_squared"]],
+            [ols.params["const"], ols.params["input.sim"], ols.rsquared],
+        )
@@ -0,0 +1,70 @@
+"""Bootstrap confidence intervals of the UQS and WQS."""
+
+import copy
+
+import numpy as np
+import pytest
+
+from panli_crowdtruth.benchmarks.synthetic import SyntheticStudy, generate_study
+from panli_crowdtruth.pipelines.compute_crowdtruth_metrics.bootstrap import (
+    JudgmentResampler,
+    bootstrap_crowdtruth_metrics,
+)
+from panli_crowdtruth.pipelines.compute_crowdtruth_metrics.compute_metrics import (
+    compute_crowdtruth_metrics,
+)
+from panli_crowdtruth.pipelines.compute_crowdtruth_metrics.preprocessing import (
+    prepare_crowdtruth_judgments,
+)
+from panli_crowdtruth.pipelines.compute_crowdtruth_metrics.vectorized_metrics import (
+    ConvergenceCriteria,
+    encode_results,
+)
+
+pytest.importorskip("crowdtruth")
+
+
+@pytest.fixture(scope="module")
+def crowdtruth_results():
+    annotations, _ = generate_study(
+        SyntheticStudy(n_units=40, workers_per_unit=6, units_per_list=10)
+    )
+    data, config = prepare_crowdtruth_judgments(annotations, 3, "synthetic")
+    results = compute_crowdtruth_metrics(
+        copy.deepcopy(data), config, metrics_engine="vectorized"
+    )
+    return results, config
+
+
+def test_replicates_keep_binary_judgments(crowdtruth_results):
+    (units, workers, annotations, judgments, _, _), config = crowdtruth_results
+    tensor = encode_results({"units": units, "judgments": judgments}, config)
+    resampler = JudgmentResampler(tensor, ConvergenceCriteria())
+
+    replicate, original = resampler.resample(np.random.default_rng(0))
+
+    assert len(replicate.values) == len(tensor.values)
+    assert set(np.unique(replicate.values)) <= {0.0, 1.0}
+    pairs = replicate.worker_idx.astype(np.int64) * replicate.n_units
+    assert len(np.unique(pairs + replicate.unit_idx)) == len(pairs)
+    # Some workers were drawn twice on a unit, and their copies are kept apart
+    assert (original == -1).any()
+    assert replicate.workers.is_unique
+
+
+def test_intervals_contain_the_scores(crowdtruth_results):
+    (units, workers, annotations, judgments, _, _), config = crowdtruth_results
+    units, workers = bootstrap_crowdtruth_metrics(
+        units,
+        workers,
+        annotations,
+        judgments,
+        config,
+        {"n_replicates": 50, "n_workers": 1},
+    )
+
+    for df, name in [(units, "uqs"), (workers, "wqs")]:
+        low, high = df[f"{name}_ci_low"], df[f"{name}_ci_high"]
+        assert low.notna().all() and high.notna().all(), name
+        assert ((0 <= low) & (low <= high) & (high <= 1)).all(), name
+        assert ((low <= df[name]) & (df[name] <= high)).all(), name
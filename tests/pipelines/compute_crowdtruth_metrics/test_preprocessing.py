@@ -0,0 +1,31 @@
+"""Conversion of the ingested annotations for CrowdTruth."""
+
+import pandas as pd
+
+from panli_crowdtruth.benchmarks.synthetic import SyntheticStudy, generate_study
+from panli_crowdtruth.pipelines.compute_crowdtruth_metrics.ingestion import (
+    ingest_prolific_annotations,
+)
+from panli_crowdtruth.pipelines.compute_crowdtruth_metrics.preprocessing import (
+    concat_crowdtruth_frames,
+    to_crowdtruth_frame,
+)
+
+
+def test_chunks_convert_like_the_concatenated_annotations(tmp_path):
+    annotations, _ = generate_study(SyntheticStudy(n_units=30, workers_per_unit=4))
+    # Missing values in the last chunk only
+    annotations.loc[annotations.index[-10:], "source_index"] = None
+    input_filepath = tmp_path / "annotations.csv"
+    annotations.to_csv(input_filepath, index=False)
+    chunks = ingest_prolific_annotations(str(input_filepath), chunksize=25)
+
+    frame = concat_crowdtruth_frames(chunks)
+
+    expected = to_crowdtruth_frame(pd.concat(chunks, ignore_index=True))
+    pd.testing.assert_frame_equal(frame, expected)
+    # Equal strings of different chunks are one object
+    first = frame["sentence"].iloc[0]
+    assert all(
+        value is first for value in frame["sentence"][frame["sentence"] == first]
+    )
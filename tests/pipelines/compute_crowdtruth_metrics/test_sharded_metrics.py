@@ -0,0 +1,84 @@
+"""Sharded iteration of the CrowdTruth metrics."""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from panli_crowdtruth.benchmarks.synthetic import SyntheticStudy, generate_study
+from panli_crowdtruth.pipelines.compute_crowdtruth_metrics import sharded_metrics
+from panli_crowdtruth.pipelines.compute_crowdtruth_metrics.preprocessing import (
+    prepare_crowdtruth_judgments,
+)
+from panli_crowdtruth.pipelines.compute_crowdtruth_metrics.vectorized_metrics import (
+    JudgmentTensor,
+)
+
+
+def _tensor(n_components=3, workers_per_component=3, units_per_component=4):
+    """Judgments of disjoint groups of workers that annotate all units of their
+    group, with random one-hot answers."""
+    rng = np.random.default_rng(0)
+    worker_idx, unit_idx = [], []
+    for component in range(n_components):
+        for worker in range(workers_per_component):
+            for unit in range(units_per_component):
+                worker_idx.append(component * workers_per_component + worker)
+                unit_idx.append(component * units_per_component + unit)
+    labels = ["agree", "disagree", "uncertain"]
+    values = np.eye(len(labels))[rng.integers(len(labels), size=len(worker_idx))]
+    return JudgmentTensor(
+        workers=pd.Index([f"w{i}" for i in range(max(worker_idx) + 1)]),
+        units=pd.Index([f"u{i}" for i in range(max(unit_idx) + 1)]),
+        labels=labels,
+        worker_idx=np.array(worker_idx),
+        unit_idx=np.array(unit_idx),
+        values=values,
+    )
+
+
+def _dying_shard(conn, tensor):
+    # Replies to the first iteration like a shard, then dies
+    aqs = conn.recv()
+    zeros = np.zeros_like(aqs)
+    conn.send((zeros, zeros + 1, 1.0, 1.0, 1.0, 1.0))
+    conn.recv()
+    raise MemoryError("shard out of memory")
+
+
+def test_sharded_metrics_match_single_shot():
+    pytest.importorskip("crowdtruth")
+    annotations, _ = generate_study(
+        SyntheticStudy(n_units=60, workers_per_unit=8, units_per_list=12)
+    )
+    results, config = prepare_crowdtruth_judgments(annotations, 3, "synthetic")
+
+    # Raises when the sharded scores differ from the single-shot scores
+    results = sharded_metrics.compute_metrics_sharded(
+        results, config, n_shards=2, parity_check=True
+    )
+    assert results["units"]["uqs"].notna().all()
+
+
+def test_dead_shard_raises_instead_of_hanging(monkeypatch):
+    run_shard = sharded_metrics._run_shard
+    shards = []
+    context = sharded_metrics.multiprocessing.get_context("spawn")
+    n_shards = 3
+
+    class DyingContext:
+        Pipe = staticmethod(context.Pipe)
+
+        @staticmethod
+        def Process(*args, target, **kwargs):  # noqa: N802, like the context
+            # The last shard dies after its first reply
+            shards.append(target)
+            if len(shards) == n_shards:
+                target = _dying_shard
+            return context.Process(*args, target=target, **kwargs)
+
+    monkeypatch.setattr(
+        sharded_metrics.multiprocessing, "get_context", lambda method: DyingContext
+    )
+    with pytest.raises(RuntimeError, match="died"):
+        sharded_metrics.iterate_sharded(_tensor(), n_shards=n_shards)
+    assert shards == [run_shard] * n_shards
@@ -0,0 +1,65 @@
+"""Parity of the vectorized metric engine with ``crowdtruth.run``."""
+
+import copy
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from panli_crowdtruth.benchmarks.synthetic import SyntheticStudy, generate_study
+from panli_crowdtruth.pipelines.compute_crowdtruth_metrics.compute_metrics import (
+    compute_crowdtruth_metrics,
+)
+from panli_crowdtruth.pipelines.compute_crowdtruth_metrics.preprocessing import (
+    prepare_crowdtruth_judgments,
+)
+
+crowdtruth = pytest.importorskip("crowdtruth")
+
+TOLERANCE = 1e-9
+
+
+@pytest.fixture(scope="module", params=[3, 4], ids=["3 labels", "4 labels"])
+def crowdtruth_input(request):
+    annotations, _ = generate_study(
+        SyntheticStudy(n_units=60, workers_per_unit=8, units_per_list=12)
+    )
+    return prepare_crowdtruth_judgments(annotations, request.param, "synthetic")
+
+
+def _scores(engine, data, config):
+    # The engines add their scores to the input frames
+    units, workers, annotations, _, _, _ = compute_crowdtruth_metrics(
+        copy.deepcopy(data), config, metrics_engine=engine
+    )
+    return units["uqs"], workers["wqs"], annotations["aqs"]
+
+
+def test_vectorized_engine_matches_crowdtruth(crowdtruth_input):
+    data, config = crowdtruth_input
+    expected = _scores("crowdtruth", data, config)
+    actual = _scores("vectorized", data, config)
+
+    for name, want, got in zip(["uqs", "wqs", "aqs"], expected, actual):
+        assert len(want) > 0, name
+        got = got.reindex(want.index)
+        assert not got.isna().any(), name
+        np.testing.assert_allclose(
+            got.to_numpy(dtype=float),
+            want.to_numpy(dtype=float),
+            atol=TOLERANCE,
+            err_msg=name,
+        )
+
+
+def test_vectorized_engine_keeps_label_order(crowdtruth_input):
+    data, config = crowdtruth_input
+    expected = compute_crowdtruth_metrics(copy.deepcopy(data), config)[0]
+    actual = compute_crowdtruth_metrics(
+        copy.deepcopy(data), config, metrics_engine="vectorized"
+    )[0].reindex(expected.index)
+
+    pd.testing.assert_series_equal(
+        actual["unit_annotation_score"].map(list),
+        expected["unit_annotation_score"].map(list),
+    )
@@ -0,0 +1,139 @@
+"""Selection of the top N workers per unit."""
+
+import numpy as np
+import pandas as pd
+
+from panli_crowdtruth.pipelines.selection.nodes import (
+    balance_number_of_workers,
+    rank_annotations,
+    rank_judgments_by_wqs,
+)
+
+
+def _facts():
+    rng = np.random.default_rng(0)
+    n = 40
+    return pd.DataFrame(
+        {
+            "unit": pd.Categorical(rng.integers(5, size=n)),
+            # Distinct scores, so the ranks do not depend on the order of ties
+            "wqs": rng.permutation(n) / n,
+        },
+        index=pd.Index([f"judgment_{i}" for i in range(n)], name="judgment"),
+    )
+
+
+def test_rank_by_position_matches_join():
+    facts = _facts()
+    annotations = pd.DataFrame({"judgment_id": facts.index.to_numpy()})
+    aligned = rank_annotations(rank_judgments_by_wqs(facts), annotations)
+
+    # Shuffled facts and an annotation without a fact take the join on the ids
+    annotations = pd.concat(
+        [annotations, pd.DataFrame({"judgment_id": ["judgment_new"]})],
+        ignore_index=True,
+    )
+    joined = rank_annotations(
+        rank_judgments_by_wqs(facts.sample(frac=1, random_state=0)), annotations
+    )
+
+    pd.testing.assert_series_equal(joined.iloc[:-1], aligned)
+    assert np.isnan(joined.iloc[-1])
+
+
+def _baseline_selection(judgments, crowdtruth_workers, annotations, workers, n):
+    # Selection before the judgment facts: one sort per unit
+    merged = judgments.reset_index().merge(
+        crowdtruth_workers.reset_index()[["worker", "wqs"]], on="worker", how="left"
+    )
+    to_drop = []
+    for _, unit_judgments in merged.groupby("unit"):
+        if len(unit_judgments) > n:
+            to_drop.extend(
+                unit_judgments.sort_values("wqs", ascending=False)
+                .iloc[n:]
+                .judgment.tolist()
+            )
+    selected = annotations[~annotations.judgment_id.isin(to_drop)]
+    return selected, workers[workers.worker_id.isin(selected.worker_id)]
+
+
+def _study(wqs):
+    rng = np.random.default_rng(1)
+    worker_ids = [f"worker_{i}" for i in range(15)]
+    # Every worker judges a unit at most once
+    pairs = [
+        (f"unit_{unit}", worker)
+        for unit in range(12)
+        for worker in rng.choice(worker_ids, size=rng.integers(2, 15), replace=False)
+    ]
+    pairs = [pairs[i] for i in rng.permutation(len(pairs))]
+    judgments = pd.DataFrame(
+        pairs,
+        columns=["unit", "worker"],
+        index=pd.Index([f"judgment_{i}" for i in range(len(pairs))], name="judgment"),
+    )
+    # The last workers have no WQS
+    crowdtruth_workers = pd.DataFrame(
+        {"wqs": wqs}, index=pd.Index(worker_ids[: len(wqs)], name="worker")
+    )
+    facts = pd.DataFrame(
+        {
+            "unit": pd.Categorical(judgments["unit"]),
+            "wqs": crowdtruth_workers["wqs"].reindex(judgments["worker"]).to_numpy(),
+        },
+        index=judgments.index,
+    )
+    # An annotation without a judgment fact is kept
+    annotations = pd.DataFrame(
+        {
+            "judgment_id": judgments.index.tolist() + ["judgment_new"],
+            "worker_id": judgments["worker"].tolist() + ["worker_new"],
+        }
+    )
+    workers = pd.DataFrame({"worker_id": worker_ids + ["worker_new"]})
+    return judgments, crowdtruth_workers, facts, annotations, workers
+
+
+def test_selection_with_missing_wqs_matches_baseline():
+    judgments, crowdtruth_workers, facts, annotations, workers = _study(
+        np.linspace(0.1, 0.9, 12)
+    )
+
+    for n_workers in [3, 8]:
+        selected, selected_workers = balance_number_of_workers(
+            facts, annotations, workers, n_workers
+        )
+        expected, expected_workers = _baseline_selection(
+            judgments, crowdtruth_workers, annotations, workers, n_workers
+        )
+        pd.testing.assert_frame_equal(selected, expected)
+        pd.testing.assert_frame_equal(selected_workers, expected_workers)
+        assert "judgment_new" in selected["judgment_id"].tolist()
+
+
+def test_selection_with_ties_keeps_the_earlier_judgments():
+    judgments, crowdtruth_workers, facts, annotations, workers = _study(
+        np.tile([0.2, 0.5, 0.8], 4)
+    )
+    n_workers = 5
+
+    selected, _ = balance_number_of_workers(facts, annotations, workers, n_workers)
+    expected, _ = _baseline_selection(
+        judgments, crowdtruth_workers, annotations, workers, n_workers
+    )
+
+    # The baseline breaks ties in the order of an unstable sort, so only the
+    # scores kept per unit are the same
+    def kept_scores(df):
+        kept = facts.reindex(df["judgment_id"]).dropna(subset=["unit"])
+        return kept.groupby("unit", observed=True)["wqs"].apply(
+            lambda wqs: sorted(wqs.fillna(-1))
+        )
+
+    pd.testing.assert_series_equal(kept_scores(selected), kept_scores(expected))
+
+    # Among tied judgments, the earlier ones are kept
+    kept = facts.index.isin(selected["judgment_id"])
+    for _, unit in facts.assign(kept=kept).groupby(["unit", "wqs"], observed=True):
+        assert not (unit["kept"].astype(int).diff() > 0).any()
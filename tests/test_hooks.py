@@ -0,0 +1,37 @@
+"""Timing and memory hooks."""
+
+import numpy as np
+
+from panli_crowdtruth.hooks import summary_table
+
+
+def test_summary_table_has_no_rate_for_instant_nodes():
+    records = [
+        {"kind": "load", "name": "a", "node": "slow", "wall_time": 0.5},
+        {
+            "kind": "node",
+            "name": "slow",
+            "node": "slow",
+            "wall_time": 2.0,
+            "cpu_time": 2.0,
+            "rows_in": 100,
+            "rows_out": 10,
+        },
+        {
+            "kind": "node",
+            "name": "instant",
+            "node": "instant",
+            "wall_time": 0.0,
+            "cpu_time": 0.0,
+            "rows_in": 100,
+            "rows_out": 100,
+        },
+        {"kind": "pipeline", "name": "run", "node": None, "wall_time": 3.0},
+    ]
+
+    table = summary_table(records)
+
+    assert table.loc["slow", "rows_per_s"] == 50
+    assert np.isnan(table.loc["instant", "rows_per_s"])
+    assert not np.isinf(table["rows_per_s"].astype(float)).any()
+    assert table.loc["TOTAL", "total_s"] == 2.5
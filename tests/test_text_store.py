@@ -0,0 +1,34 @@
+"""Deduplicated store of the unit texts."""
+
+import numpy as np
+import pandas as pd
+
+from panli_crowdtruth.text_store import TEXT_COLUMNS, join_texts, split_texts
+
+
+def test_join_texts_restores_split_texts():
+    rng = np.random.default_rng(0)
+    n = 50
+    sentences = [f"Sentence {i} ." for i in range(5)]
+    df = pd.DataFrame(
+        {
+            "unit": [f"unit_{i}" for i in range(n)],
+            "input.sentence": rng.choice(sentences, size=n),
+            # The same strings in several columns
+            "input.sentence_statement": rng.choice(sentences, size=n),
+            "input.statement": rng.choice([f"statement {i}" for i in range(7)], size=n),
+            "uqs": rng.random(n),
+        }
+    ).set_index("unit")
+    # Missing texts
+    df.loc[df.index[::6], "input.sentence_statement"] = np.nan
+
+    refs, texts = split_texts(df)
+
+    assert not set(TEXT_COLUMNS) & set(refs.columns)
+    assert texts["text"].is_unique
+    joined = join_texts(refs, texts)
+    text_columns = [col for col in TEXT_COLUMNS if col in df.columns]
+    pd.testing.assert_frame_equal(
+        joined.astype({col: object for col in text_columns}), df
+    )